@@ -0,0 +1,34 @@
+import pytest
+
+from treevalue import FastTreeValue
+
+_TREE_DATA = {'a': 1, 'x': {'b': 2, 'y': {'c': 3, 'z': {'d': 4}}}}
+_TREE = FastTreeValue(_TREE_DATA)
+
+
+def _attr_chain(t):
+    return t.x.y.z.d
+
+
+def _fresh_attr_chain(t):
+    # a new root has no cached child wrappers, so all the wrappers on the chain are created again
+    return _attr_chain(FastTreeValue(t))
+
+
+def _dict_chain(d):
+    return d['x']['y']['z']['d']
+
+
+@pytest.mark.benchmark(group='attribute-chain')
+class TestAttributeChain:
+    def test_dict_chain(self, benchmark):
+        benchmark(_dict_chain, _TREE_DATA)
+
+    def test_tv_chain_uncached(self, benchmark):
+        benchmark(_fresh_attr_chain, _TREE)
+
+    def test_tv_chain_cached(self, benchmark):
+        benchmark(_attr_chain, _TREE)
+
+    def test_tv_new_root(self, benchmark):
+        benchmark(FastTreeValue, _TREE)
@@ -78,6 +78,9 @@ class TestTreeStorageBenchmark:
     def test_copy(self, benchmark):
         benchmark(TreeStorage.copy, self.__setup_storage())
 
+    def test_cowcopy(self, benchmark):
+        benchmark(TreeStorage.cowcopy, self.__setup_storage())
+
     def test_deepcopy(self, benchmark):
         benchmark(TreeStorage.deepcopy, self.__setup_storage())
 
@@ -94,3 +97,12 @@ class TestTreeStorageBenchmark:
 
     def test_eq(self, benchmark):
         benchmark(__eq__, _TREE_STORAGE, _TREE_STORAGE_2)
+
+    def test_hash(self, benchmark):
+        benchmark(hash, create_storage({'a': 1, 'b': 2, 'd': {'x': 3, 'y': 4}}))
+
+    def test_frozen_hash(self, benchmark):
+        benchmark(hash, create_storage({'a': 1, 'b': 2, 'd': {'x': 3, 'y': 4}}).freeze())
+
+    def test_frozen_set_path(self, benchmark):
+        benchmark(_TREE_STORAGE.freeze().set_path, ('d', 'x'), 5)
@@ -1,6 +1,22 @@
+import asyncio
+import gc
+import pickle
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
 
-from treevalue.tree.common import DelayedProxy, delayed_partial
+from treevalue.tree.common import DelayedProxy, delayed_partial, DelayedAsyncProxy, async_undelay, \
+    enable_delay_stats, get_delay_stats, reset_delay_stats
+
+
+def _add(x, y):
+    return x + y * 2
+
+
+async def _async_add(x, y):
+    return x + y * 2
 
 
 @pytest.mark.unittest
@@ -66,3 +82,195 @@ class TestTreeDelay:
         assert pv.value() == 7
         assert cnt1 == 2
         assert cnt2 == 1
+
+    @pytest.mark.parametrize('args', [(), (1,)])
+    def test_delayed_partial_threads(self, args):
+        cnt = 0
+
+        def f(*args_):
+            nonlocal cnt
+            cnt += 1
+            time.sleep(0.05)
+            return 233 + len(args_)
+
+        pv = delayed_partial(f, *args)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: pv.value(), range(16)))
+
+        assert results == [233 + len(args)] * 16
+        assert cnt == 1
+
+    def test_delayed_partial_threads_error(self):
+        cnt = 0
+
+        def f():
+            nonlocal cnt
+            cnt += 1
+            time.sleep(0.05)
+            if cnt == 1:
+                raise ValueError('first call failed')
+            return 233
+
+        pv = delayed_partial(f)
+
+        def _get(_):
+            try:
+                return pv.value()
+            except ValueError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(_get, range(16)))
+
+        assert results.count(None) == 1
+        assert results.count(233) == 15
+        assert cnt == 2
+
+    def test_delayed_partial_release(self):
+        class _Value:
+            pass
+
+        pv = delayed_partial(lambda x, y: x + y, 2, y=3)
+        assert pv.value() == 5
+        assert pv.func is None
+        assert pv.args is None
+        assert pv.kwargs is None
+        assert pv.value() == 5
+
+        obj = _Value()
+        ref = weakref.ref(obj)
+        inner = delayed_partial(lambda x: x, obj)
+        outer = delayed_partial(lambda x: isinstance(x, _Value), inner)
+        del obj, inner
+        assert outer.value()
+        gc.collect()
+        assert ref() is None
+
+    def test_delayed_partial_pickle(self):
+        pv = delayed_partial(_add, delayed_partial(_add, 1, 2), y=3)
+        pv1 = pickle.loads(pickle.dumps(pv))
+        assert isinstance(pv1, DelayedProxy)
+        assert not pv1.calculated
+        assert pv1.value() == 11
+        assert not pv.calculated
+
+        assert pv.value() == 11
+        pv2 = pickle.loads(pickle.dumps(pv))
+        assert pv2.calculated
+        assert pv2.func is None
+        assert pv2.value() == 11
+
+        pv3 = pickle.loads(pickle.dumps(delayed_partial(int)))
+        assert pv3.value() == 0
+        pv4 = pickle.loads(pickle.dumps(pv3))
+        assert pv4.calculated
+        assert pv4.value() == 0
+
+        pa = pickle.loads(pickle.dumps(DelayedAsyncProxy(_async_add, (1,), {'y': 2})))
+        assert pa.value() == 5
+        assert pickle.loads(pickle.dumps(pa)).value() == 5
+
+    def test_delayed_async(self):
+        cnt = 0
+
+        async def f(x, y):
+            nonlocal cnt
+            cnt += 1
+            await asyncio.sleep(0.05)
+            return x + y * 2
+
+        pv = DelayedAsyncProxy(f, (delayed_partial(lambda: 1),), {'y': 3})
+        assert isinstance(pv, DelayedProxy)
+        assert cnt == 0
+
+        async def _gather():
+            return await asyncio.gather(*[async_undelay(pv) for _ in range(8)])
+
+        assert asyncio.run(_gather()) == [7] * 8
+        assert cnt == 1
+        assert pv.func is None
+        assert pv.value() == 7
+        assert asyncio.run(async_undelay(pv)) == 7
+        assert cnt == 1
+
+        assert asyncio.run(async_undelay(1)) == 1
+        pf = delayed_partial(lambda x: x * 2, DelayedAsyncProxy(f, (1, 2), {}))
+        assert asyncio.run(async_undelay(pf)) == 10
+        assert cnt == 2
+
+    def test_delayed_async_sync_value(self):
+        async def f(x):
+            await asyncio.sleep(0.01)
+            return x * 2
+
+        pv = DelayedAsyncProxy(f, (2,), {})
+        assert pv.value() == 4
+        assert pv.calculated
+
+        async def _get():
+            return DelayedAsyncProxy(f, (3,), {}).value()
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(_get())
+
+    def test_delayed_async_error(self):
+        cnt = 0
+
+        async def f():
+            nonlocal cnt
+            cnt += 1
+            await asyncio.sleep(0.01)
+            if cnt == 1:
+                raise ValueError('first call failed')
+            return 233
+
+        pv = DelayedAsyncProxy(f, (), {})
+        with pytest.raises(ValueError):
+            asyncio.run(async_undelay(pv))
+        assert not pv.calculated
+        assert asyncio.run(async_undelay(pv)) == 233
+        assert cnt == 2
+
+    def test_delay_stats(self):
+        def f(x):
+            time.sleep(0.01)
+            return x + 1
+
+        enable_delay_stats()
+        reset_delay_stats()
+        try:
+            p1 = delayed_partial(f, 1)
+            p2 = delayed_partial(f, p1)
+            _ = delayed_partial(lambda: 1)
+            stats = get_delay_stats()
+            assert stats['enabled']
+            assert stats['created'] == 3
+            assert stats['evaluated'] == 0
+            assert stats['unevaluated'] == 3
+
+            assert p2.value() == 3
+            assert p1.value() == 2
+            assert p2.value() == 3
+            stats = get_delay_stats()
+            assert stats['created'] == 3
+            assert stats['evaluated'] == 2
+            assert stats['unevaluated'] == 1
+            assert stats['hits'] == 2
+            assert stats['time'] >= 0.02
+            assert len(stats['functions']) == 1
+            (name, item), = stats['functions'].items()
+            assert 'f' in name
+            assert item['count'] == 2
+            assert item['time'] >= 0.02
+
+            reset_delay_stats()
+            enable_delay_stats(False)
+            assert delayed_partial(f, 1).value() == 2
+            stats = get_delay_stats()
+            assert not stats['enabled']
+            assert stats['created'] == 0
+            assert stats['evaluated'] == 0
+            assert stats['functions'] == {}
+        finally:
+            enable_delay_stats(False)
+            reset_delay_stats()
@@ -0,0 +1,44 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from treevalue.tree import TreeValue, mapping
+
+_ARRAY_SIZE = 1 << 20  # 8MB for each float64 array
+_LEAVES = 4
+_CHAIN_LENGTH = 16
+
+
+def _add_one(x):
+    return x + 1.0
+
+
+def _delayed_chain():
+    t = TreeValue({f'k{i}': np.zeros(_ARRAY_SIZE) for i in range(_LEAVES)})
+    for _ in range(_CHAIN_LENGTH):
+        t = mapping(t, _add_one, delayed=True)
+    return t
+
+
+def _evaluate_chain():
+    t = _delayed_chain()
+    tracemalloc.start()
+    try:
+        for v in t.values():
+            assert v[0] == _CHAIN_LENGTH
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+@pytest.mark.benchmark(group='delayed_memory')
+class TestDelayedMemoryBenchmark:
+    def test_delayed_chain(self, benchmark):
+        peak = benchmark.pedantic(_evaluate_chain, rounds=3, iterations=1)
+        benchmark.extra_info['peak_mb'] = peak / (1 << 20)
+
+        # intermediate arrays are released along the chain,
+        # so the peak is far below keeping all the chain alive
+        assert peak < _LEAVES * 4 * _ARRAY_SIZE * 8
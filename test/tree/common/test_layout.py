@@ -0,0 +1,80 @@
+import pickle
+
+import pytest
+
+from treevalue.tree.common import KeyLayout, get_layout, create_storage
+
+
+@pytest.mark.unittest
+class TestTreeLayout:
+    def test_get_layout(self):
+        l1 = get_layout(('a', 'b', 'c'))
+        assert isinstance(l1, KeyLayout)
+        assert l1.keys == ('a', 'b', 'c')
+        assert l1.keyset == {'a', 'b', 'c'}
+        assert len(l1) == 3
+        assert get_layout(('a', 'b', 'c')) is l1
+        assert get_layout(('c', 'b', 'a')) is not l1
+        assert get_layout(('c', 'b', 'a')).keyset == l1.keyset
+        assert repr(l1) == f"<KeyLayout at {hex(id(l1))}, keys: ('a', 'b', 'c')>"
+
+    def test_pickle(self):
+        l1 = get_layout(('a', 'b', 'c'))
+        assert pickle.loads(pickle.dumps(l1)) is l1
+
+    def test_storage_layout(self):
+        t1 = create_storage({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t2 = create_storage({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 44}})
+        assert t1.layout() is t2.layout()
+        assert t1.get('x').layout() is t2.get('x').layout()
+        assert t1.layout() is not t1.get('x').layout()
+        assert t1.layout().keys == ('a', 'b', 'x')
+
+        t1.set('a', 5)
+        assert t1.layout() is t2.layout()
+        t1.set('e', 5)
+        assert t1.layout().keys == ('a', 'b', 'x', 'e')
+        t1.del_('e')
+        assert t1.layout() is t2.layout()
+        t1.setdefault('f', 1)
+        assert t1.layout().keys == ('a', 'b', 'x', 'f')
+        t1.pop('f')
+        assert t1.layout() is t2.layout()
+        t1.pop_or_default('g', None)
+        assert t1.layout() is t2.layout()
+        t1.popitem()
+        assert t1.layout().keys == ('a', 'b')
+        t1.copy_from(t2)
+        assert t1.layout() is t2.layout()
+        assert t1.cowcopy().layout() is t2.layout()
+        t1.clear()
+        assert t1.layout().keys == ()
+
+    def test_storage_layout_detached(self):
+        t1 = create_storage({'a': 1, 'b': 2})
+        assert t1.layout().keys == ('a', 'b')
+
+        d = t1.detach()
+        del d['a']
+        d['c'] = 3
+        assert t1.layout().keys == ('b', 'c')
+        d['d'] = 4
+        assert t1.layout().keys == ('b', 'c', 'd')
+
+    def test_intersection(self):
+        l1 = get_layout(('a', 'b', 'x'))
+        l2 = get_layout(('x', 'c', 'a'))
+        assert l1.intersection(l1) is l1
+        assert l1.intersection(l2) is get_layout(('a', 'x'))
+        assert l1.intersection(l2) is l1.intersection(l2)
+        assert l2.intersection(l1) is get_layout(('x', 'a'))
+        assert l1.intersection(get_layout(())) is get_layout(())
+
+    def test_union(self):
+        l1 = get_layout(('a', 'b', 'x'))
+        l2 = get_layout(('x', 'c', 'a'))
+        assert l1.union(l1) is l1
+        assert l1.union(l2) is get_layout(('a', 'b', 'x', 'c'))
+        assert l1.union(l2) is l1.union(l2)
+        assert l2.union(l1) is get_layout(('x', 'c', 'a', 'b'))
+        assert l1.union(get_layout(())) is get_layout(('a', 'b', 'x'))
@@ -2,7 +2,7 @@ import pickle
 
 import pytest
 
-from treevalue.tree.common import create_storage, raw, TreeStorage, delayed_partial
+from treevalue.tree.common import create_storage, raw, TreeStorage, delayed_partial, FrozenTreeStorage
 
 try:
     _ = reversed({}.keys())
@@ -299,6 +299,66 @@ class TestTreeStorage:
         with pytest.raises(KeyError):
             t.del_('fff')
 
+    def test_get_many(self):
+        t = create_storage({
+            'a': 1, 'b': 2,
+            'x': {'c': 3, 'd': delayed_partial(lambda: 4), 'y': {'e': 5}},
+            'z': delayed_partial(lambda: create_storage({'f': 6})),
+        })
+        assert t.get_many([('a',), ('x', 'c'), ('x', 'd'), ('x', 'y', 'e'), ('b',), ('z', 'f')]) == \
+               [1, 3, 4, 5, 2, 6]
+        assert t.get_many(iter([('x', 'y'), ()])) == [t.get('x').get('y'), t]
+        assert t.get_many([]) == []
+
+        with pytest.raises(KeyError):
+            t.get_many([('a',), ('x', 'f')])
+        with pytest.raises(KeyError):
+            t.get_many([('a', 'f')])
+        with pytest.raises(KeyError):
+            t.get_many([('f', 'f')])
+
+    def test_set_many(self):
+        t = create_storage({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t.set_many({('a',): 11, ('x', 'c'): 33, ('x', 'y', 'e'): 5, ('x', 'y', 'f'): 6, ('z', 'g'): 7})
+        assert t == create_storage({
+            'a': 11, 'b': 2,
+            'x': {'c': 33, 'd': 4, 'y': {'e': 5, 'f': 6}},
+            'z': {'g': 7},
+        })
+        assert t.layout().keys == ('a', 'b', 'x', 'z')
+
+        t.set_many({('x', 'y', 'e'): 55, ('x',): 3, ('b',): 22})
+        assert t == create_storage({'a': 11, 'b': 22, 'x': 3, 'z': {'g': 7}})
+
+        with pytest.raises(TypeError):
+            t.set_many({('x', 'c'): 1})
+        with pytest.raises(ValueError):
+            t.set_many({(): 1})
+
+        t1 = create_storage({'a': 1, 'x': {'c': 3, 'd': 4}})
+        t2 = t1.cowcopy()
+        t2.set_many({('x', 'c'): 33, ('a',): 11})
+        assert t1 == create_storage({'a': 1, 'x': {'c': 3, 'd': 4}})
+        assert t2 == create_storage({'a': 11, 'x': {'c': 33, 'd': 4}})
+
+    def test_del_many(self):
+        t = create_storage({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4, 'y': {'e': 5}}})
+        t.del_many([('a',), ('x', 'c'), ('x', 'y', 'e')])
+        assert t == create_storage({'b': 2, 'x': {'d': 4, 'y': {}}})
+
+        with pytest.raises(KeyError):
+            t.del_many([('x', 'c')])
+        with pytest.raises(KeyError):
+            t.del_many([('b', 'c')])
+        with pytest.raises(ValueError):
+            t.del_many([()])
+
+        t1 = create_storage({'a': 1, 'x': {'c': 3, 'd': 4}})
+        t2 = t1.cowcopy()
+        t2.del_many([('x', 'c')])
+        assert t1 == create_storage({'a': 1, 'x': {'c': 3, 'd': 4}})
+        assert t2 == create_storage({'a': 1, 'x': {'d': 4}})
+
     def test_clear(self):
         t = create_storage({'a': 1, 'b': 2, 'c': raw({'x': 3, 'y': 4}), 'd': {'x': 3, 'y': 4}})
         t.clear()
@@ -414,6 +474,62 @@ class TestTreeStorage:
         assert t1.get('d').get('x') == 3
         assert t1.get('d').get('y') == 4
 
+    def test_cowcopy(self):
+        h1 = {'x': 3, 'y': 4}
+        h2 = {'x': 3, 'y': 4}
+        t = create_storage({'a': 1, 'b': 2, 'c': raw(h1), 'd': h2, 'e': {'f': {'g': 5}}})
+
+        t1 = t.cowcopy()
+        assert t1 == t
+        assert t1.get('a') == 1
+        assert t1.get('b') == 2
+        assert t1.get('c') is h1
+        assert t1.get('d').get('x') == 3
+        assert t1.get('d').get('y') == 4
+
+        t1.get('d').set('x', 30)
+        t1.get('e').get('f').set('h', 6)
+        t1.set('a', 10)
+        assert t1.get('a') == 10
+        assert t1.get('d').get('x') == 30
+        assert t1.get('e').get('f').get('h') == 6
+        assert t.get('a') == 1
+        assert t.get('d').get('x') == 3
+        assert not t.get('e').get('f').contains('h')
+
+        t2 = t.cowcopy()
+        d = t.get('d')
+        d.del_('y')
+        t.get('e').get('f').clear()
+        t.pop('b')
+        assert t.get('d') is d
+        assert not t.get('d').contains('y')
+        assert t.get('e').get('f').empty()
+        assert not t.contains('b')
+        assert t2 == create_storage({'a': 1, 'b': 2, 'c': raw(h1), 'd': h2, 'e': {'f': {'g': 5}}})
+
+        t3 = t2.cowcopy()
+        t3.get('e').copy_from(create_storage({'x': 1}))
+        t3.get('d').setdefault('z', 100)
+        assert t3.get('e') == create_storage({'x': 1})
+        assert t3.get('d').get('z') == 100
+        assert t2.get('e') == create_storage({'f': {'g': 5}})
+        assert not t2.get('d').contains('z')
+
+        t4 = t2.cowcopy()
+        for v in t4.iter_values():
+            if isinstance(v, TreeStorage):
+                v.set('new', 1)
+        for _, v in t4.iter_items():
+            if isinstance(v, TreeStorage):
+                assert v.get('new') == 1
+        assert not t2.get('d').contains('new')
+        assert not t2.get('e').contains('new')
+
+        t5 = pickle.loads(pickle.dumps(t2.cowcopy()))
+        t5.get('d').set('x', -1)
+        assert t2.get('d').get('x') == 3
+
     def test_deepcopy(self):
         h1 = {'x': 3, 'y': 4}
         h2 = {'x': 3, 'y': 4}
@@ -569,6 +685,25 @@ class TestTreeStorage:
         })
         assert t3 == t4
 
+    def test_deep_chain(self):
+        data = {'v': 0}
+        for i in range(10000):
+            data = {'x': data, 'v': i + 1}
+
+        t = create_storage(data)
+        d = t.jsondumpx(lambda x: x, False, False)
+        for i in range(10000):
+            assert d['v'] == 10000 - i
+            d = d['x']
+        assert d == {'v': 0}
+        assert t == create_storage(data)
+        assert t != create_storage({'x': data, 'v': 10000})
+
+        t1 = create_storage({})
+        t1.copy_from(t)
+        assert t1 == t
+        assert t1.get('x') is not t.get('x')
+
     def test_keys(self):
         h1 = {'x': 3, 'y': 4}
         h2 = {'x': 3, 'y': 4}
@@ -673,3 +808,125 @@ class TestTreeStorage:
         assert t1 in h
         assert h[t1] == 1
         assert t2 not in h
+
+
+# noinspection PyArgumentList,DuplicatedCode,PyTypeChecker
+@pytest.mark.unittest
+class TestFrozenTreeStorage:
+    def test_freeze(self):
+        h1 = {'x': 3, 'y': 4}
+        t = create_storage({'a': 1, 'b': delayed_partial(lambda: 2), 'c': raw(h1), 'd': {'x': 3, 'y': 4}})
+
+        ft = t.freeze()
+        assert isinstance(ft, FrozenTreeStorage)
+        assert ft.get('a') == 1
+        assert ft.get('b') == 2
+        assert ft.get('c') is h1
+        assert isinstance(ft.get('d'), FrozenTreeStorage)
+        assert ft.get('d').get('x') == 3
+        assert ft.get_or_default('e', 233) == 233
+        assert ft.contains('a')
+        assert not ft.contains('e')
+        assert ft.size() == 4
+        assert not ft.empty()
+        assert FrozenTreeStorage({}).empty()
+        with pytest.raises(KeyError):
+            _ = ft.get('e')
+
+        assert ft.thaw() == t
+        assert ft.jsondumpx(lambda x: x, False) == {'a': 1, 'b': 2, 'c': h1, 'd': {'x': 3, 'y': 4}}
+        assert list(ft.iter_keys()) == ['a', 'b', 'c', 'd']
+        assert list(ft.iter_values())[:3] == [1, 2, h1]
+        assert list(ft.iter_items())[:3] == [('a', 1), ('b', 2), ('c', h1)]
+        if _reversible:
+            assert list(ft.iter_rev_keys()) == ['d', 'c', 'b', 'a']
+            assert list(ft.iter_rev_values())[1:] == [h1, 2, 1]
+            assert list(ft.iter_rev_items())[1:] == [('c', h1), ('b', 2), ('a', 1)]
+
+    def test_set_and_del(self):
+        ft = create_storage({'a': 1, 'b': {'x': 2, 'y': {'z': 3}}, 'c': {'w': 4}}).freeze()
+
+        ft1 = ft.set('a', 10)
+        assert ft1.get('a') == 10
+        assert ft.get('a') == 1
+        assert ft1.get('b') is ft.get('b')
+
+        ft2 = ft.set('d', create_storage({'e': 5}))
+        assert isinstance(ft2.get('d'), FrozenTreeStorage)
+        assert ft2.get('d').get('e') == 5
+        assert not ft.contains('d')
+
+        ft3 = ft.del_('a')
+        assert not ft3.contains('a')
+        assert ft.contains('a')
+        with pytest.raises(KeyError):
+            _ = ft.del_('e')
+
+        ft4 = ft.set_path(('b', 'y', 'z'), 30)
+        assert ft4.get_path(('b', 'y', 'z')) == 30
+        assert ft.get_path(('b', 'y', 'z')) == 3
+        assert ft4.get('c') is ft.get('c')
+        assert ft4.get('b') is not ft.get('b')
+
+        ft5 = ft.set_path(('e', 'f', 'g'), delayed_partial(lambda: 6))
+        assert ft5.get_path(('e', 'f', 'g')) == 6
+        assert ft5.get('b') is ft.get('b')
+        with pytest.raises(TypeError):
+            _ = ft.set_path(('a', 'x'), 1)
+        with pytest.raises(ValueError):
+            _ = ft.set_path((), 1)
+
+        ft6 = ft.del_path(('b', 'y', 'z'))
+        assert ft6.get_path(('b', 'y')).empty()
+        assert ft.get_path(('b', 'y', 'z')) == 3
+        assert ft6.get('c') is ft.get('c')
+        with pytest.raises(KeyError):
+            _ = ft.del_path(('b', 'y', 'f'))
+        with pytest.raises(KeyError):
+            _ = ft.del_path(('a', 'x'))
+        with pytest.raises(ValueError):
+            _ = ft.del_path(())
+
+        assert ft.get_path(()) is ft
+        with pytest.raises(KeyError):
+            _ = ft.get_path(('a', 'x'))
+
+    def test_eq_and_hash(self):
+        ft = create_storage({'a': 1, 'b': {'x': 2, 'y': {'z': 3}}}).freeze()
+        ft1 = create_storage({'a': 1, 'b': {'x': 2, 'y': {'z': 3}}}).freeze()
+        ft2 = ft.set_path(('b', 'y', 'z'), 4)
+
+        assert ft == ft
+        assert ft == ft1
+        assert ft != ft2
+        assert ft != ft.del_('a')
+        assert ft != create_storage({'a': 1, 'b': {'x': 2, 'y': {'z': 3}}})
+        assert ft2.set_path(('b', 'y', 'z'), 3) == ft
+
+        h = {ft: 1}
+        assert h[ft1] == 1
+        assert ft2 not in h
+        assert hash(ft) == hash(ft1)
+        assert ft != ft2
+
+        assert pickle.loads(pickle.dumps(ft)) == ft
+        assert repr(ft) == f'<FrozenTreeStorage at {hex(id(ft))}, keys: (\'a\', \'b\')>'
+
+    def test_deep_chain(self):
+        data = {'v': 0}
+        for i in range(10000):
+            data = {'x': data, 'v': i + 1}
+
+        t = create_storage(data)
+        ft = t.freeze()
+        ft1 = create_storage(data).freeze()
+        assert ft == ft1
+        assert hash(ft) == hash(ft1)
+        assert ft != ft1.set_path(('x',) * 9999 + ('v',), -1)
+        assert ft.thaw() == t
+
+        d = ft.jsondumpx(lambda x: x, False)
+        for i in range(10000):
+            assert d['v'] == 10000 - i
+            d = d['x']
+        assert d == {'v': 0}
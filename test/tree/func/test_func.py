@@ -1,10 +1,27 @@
+import asyncio
+import inspect
+import numbers
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from operator import __mul__
 
+import numpy as np
 import pytest
 
 from treevalue import FastTreeValue
-from treevalue.tree import func_treelize, TreeValue, method_treelize, classmethod_treelize, delayed
+from treevalue.tree import func_treelize, TreeValue, method_treelize, classmethod_treelize, delayed, delayed_cse, \
+    fused, TreeExpression, LeafCache
+from treevalue.tree.func.cfunc import func_treelize as c_func_treelize
+
+
+@func_treelize()
+def _ssum(a, b):
+    """
+    Sum of a and b.
+    """
+    return a + b
 
 
 # noinspection DuplicatedCode
@@ -102,6 +119,44 @@ class TestTreeFuncFunc:
         with pytest.raises(TypeError):
             ssum8(t2, c=2, b=t1)
 
+    def test_treelized_object(self):
+        assert _ssum.__name__ == '_ssum'
+        assert 'Sum of a and b.' in _ssum.__doc__
+        assert list(inspect.signature(_ssum).parameters) == ['a', 'b']
+        assert pickle.loads(pickle.dumps(_ssum)) is _ssum
+        assert _ssum(TreeValue({'a': 1, 'x': {'b': 2}}), 10) == TreeValue({'a': 11, 'x': {'b': 12}})
+
+        class _MyTreeValue(TreeValue):
+            @method_treelize()
+            def plus(self, other):
+                return self + other
+
+            @method_treelize(self_copy=True)
+            def iplus(self, other):
+                return self + other
+
+        t = _MyTreeValue({'a': 1, 'x': {'b': 2}})
+        assert _MyTreeValue.__dict__['plus'].__get__(None, _MyTreeValue) is _MyTreeValue.__dict__['plus']
+        assert t.plus(1) == _MyTreeValue({'a': 2, 'x': {'b': 3}})
+        assert _MyTreeValue.plus(t, 2) == _MyTreeValue({'a': 3, 'x': {'b': 4}})
+
+        t_id = id(t)
+        t_res = t.iplus(t)
+        assert id(t_res) == t_id
+        assert t == _MyTreeValue({'a': 2, 'x': {'b': 4}})
+
+        with pytest.raises(TypeError):
+            pickle.dumps(c_func_treelize()(lambda x, y: x + y))
+
+    def test_detached_keys(self):
+        t = TreeValue({'a': 1, 'b': 2})
+        assert _ssum(t, t) == TreeValue({'a': 2, 'b': 4})
+
+        d = t._detach().detach()
+        del d['a']
+        d['c'] = 3
+        assert _ssum(t, t) == TreeValue({'b': 4, 'c': 6})
+
     def test_tree_value_type_none(self):
         @func_treelize(return_type=None)
         def ssum(*args):
@@ -428,3 +483,392 @@ class TestTreeFuncFunc:
                 }
             }
         })
+
+    def test_delayed_cse(self):
+        cnt_add, cnt_mul = 0, 0
+
+        @func_treelize(delayed=True)
+        def add(x, y):
+            nonlocal cnt_add
+            cnt_add += 1
+            return x + y
+
+        @func_treelize(delayed=True)
+        def mul(x, y):
+            nonlocal cnt_mul
+            cnt_mul += 1
+            return x * y
+
+        t1 = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t2 = TreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 44}})
+        with delayed_cse():
+            t3 = add(t1, t2)
+            t4 = mul(add(t1, t2), 3)
+            t5 = mul(add(t1, t2), 3)
+            t6 = mul(add(t1, y=t2), 3)
+            with delayed_cse():
+                t7 = add(t1, t2)
+
+        assert t3._detach().detach()['a'] is t7._detach().detach()['a']
+        assert t4._detach().detach()['a'] is t5._detach().detach()['a']
+        assert t4 == TreeValue({'a': 36, 'b': 72, 'x': {'c': 108, 'd': 144}})
+        assert t5 == TreeValue({'a': 36, 'b': 72, 'x': {'c': 108, 'd': 144}})
+        assert t3 == TreeValue({'a': 12, 'b': 24, 'x': {'c': 36, 'd': 48}})
+        assert cnt_add == 4
+        assert cnt_mul == 4
+
+        assert t6 == TreeValue({'a': 36, 'b': 72, 'x': {'c': 108, 'd': 144}})
+        assert cnt_add == 8
+        assert cnt_mul == 8
+
+        # not enabled outside the context
+        t8 = add(t1, t2)
+        assert t8._detach().detach()['a'] is not t3._detach().detach()['a']
+        assert t8 == t3
+        assert cnt_add == 12
+
+    def test_fused(self):
+        t1 = FastTreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t2 = FastTreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 44}})
+        t3 = FastTreeValue({'a': 5, 'b': 6, 'x': {'c': 7, 'd': 8}})
+        with fused():
+            e1 = t1 * t2 + t3 - 1
+            e2 = 2 - (-e1) * t2
+            e3 = t1 + e1
+
+        assert isinstance(e1, TreeExpression)
+        assert not e1.calculated
+        assert e1.type_ is FastTreeValue
+        assert e1.value() == FastTreeValue({'a': 15, 'b': 49, 'x': {'c': 105, 'd': 183}})
+        assert e1.calculated
+        assert e1.value() is e1.value()
+        assert e2.value() == 2 - (-(t1 * t2 + t3 - 1)) * t2
+        assert e3.value() == FastTreeValue({'a': 16, 'b': 51, 'x': {'c': 108, 'd': 187}})
+
+        # operators with expressions are recorded outside the context
+        e4 = (e1 + t1) ** 2
+        assert isinstance(e4, TreeExpression)
+        assert e4.value() == (t1 * t2 + t3 - 1 + t1) ** 2
+        assert isinstance(t1 * t2, FastTreeValue)
+
+        # expressions are calculated before passing to the other functions
+        assert func_treelize()(lambda x, y: x * y)(e1, 2) == TreeValue({'a': 30, 'b': 98, 'x': {'c': 210, 'd': 366}})
+        t4 = t1.clone()
+        t4 += e1
+        assert t4 == FastTreeValue({'a': 16, 'b': 51, 'x': {'c': 108, 'd': 187}})
+
+        with fused():
+            e5 = t1 + FastTreeValue({'a': 1, 'b': 2})
+        with pytest.raises(KeyError):
+            e5.value()
+        with pytest.raises(TypeError):
+            TreeExpression()
+
+    def test_fused_method(self):
+        cnt_add, cnt_mul = 0, 0
+
+        class MyTreeValue(TreeValue):
+            @method_treelize(fusible=True)
+            def add(self, other):
+                nonlocal cnt_add
+                cnt_add += 1
+                return self + other
+
+            @method_treelize(fusible=True)
+            def mul(self, other):
+                nonlocal cnt_mul
+                cnt_mul += 1
+                return self * other
+
+            @method_treelize(mode='outer', missing=0, fusible=True)
+            def outer_add(self, other):
+                return self + other
+
+        t1 = MyTreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t2 = MyTreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 44}})
+        with fused():
+            e1 = t1.add(t2)
+            e2 = MyTreeValue.mul(e1, e1)
+            e3 = MyTreeValue.add(e2, e1)
+
+        assert cnt_add == 0 and cnt_mul == 0
+        assert e3.type_ is MyTreeValue
+        assert e3.value() == MyTreeValue({'a': 156, 'b': 600, 'x': {'c': 1332, 'd': 2352}})
+        # the shared sub expression is calculated only once for each value
+        assert cnt_add == 8
+        assert cnt_mul == 4
+
+        with fused():
+            e4 = MyTreeValue.outer_add(MyTreeValue.add(t1, t2), MyTreeValue({'a': 100, 'y': 200}))
+        assert e4.value() == MyTreeValue({'a': 112, 'b': 24, 'x': {'c': 36, 'd': 48}, 'y': 200})
+        assert cnt_add == 12
+
+    def test_batched(self):
+        calls = []
+
+        @func_treelize(batched=True)
+        def scale(x, k, bias=0):
+            calls.append(x.shape if isinstance(x, np.ndarray) else x)
+            return x * k + bias
+
+        t1 = TreeValue({
+            'a': np.array([1, 2]), 'b': np.array([3, 4]),
+            'x': {'c': np.array([5, 6, 7]), 'd': 8, 'e': np.array([1.5, 2.5])},
+        })
+        t2 = scale(t1, 2)
+        # the single values in their groups are not stacked
+        assert sorted(calls, key=repr) == sorted([(2, 2), (3,), (2,), 8], key=repr)
+        assert (t2.a == np.array([2, 4])).all()
+        assert (t2.b == np.array([6, 8])).all()
+        assert (t2.x.c == np.array([10, 12, 14])).all()
+        assert t2.x.d == 16
+        assert (t2.x.e == np.array([3.0, 5.0])).all()
+
+        # the values are grouped with the other arguments
+        calls.clear()
+        t3 = scale(t1, TreeValue({'a': 1, 'b': 2, 'x': 1}), bias=t1)
+        assert len(calls) == 5
+        assert (t3.a == np.array([2, 4])).all()
+        assert (t3.b == np.array([9, 12])).all()
+        assert (t3.x.c == np.array([10, 12, 14])).all()
+
+        with pytest.raises(ValueError):
+            func_treelize(batched=True)(np.sum)(t1)
+        with pytest.raises(ValueError):
+            func_treelize(batched=True, delayed=True)(np.sum)
+        with ThreadPoolExecutor() as pool:
+            with pytest.raises(ValueError):
+                func_treelize(batched=True, executor=pool)(np.sum)
+
+    def test_executor(self):
+        def f(x, y):
+            time.sleep(0.1)
+            return x + y
+
+        t1 = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}, 'y': {'e': 5, 'f': 6, 'g': 7, 'h': 8}})
+        t2 = TreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 44}, 'y': {'e': 55, 'f': 66, 'g': 77}})
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ssum = func_treelize(mode='outer', missing=0, executor=pool)(f)
+            _start_time = time.time()
+            assert ssum(t1, t2) == TreeValue({
+                'a': 12, 'b': 24, 'x': {'c': 36, 'd': 48}, 'y': {'e': 60, 'f': 72, 'g': 84, 'h': 8},
+            })
+            assert time.time() - _start_time < 0.5
+            assert ssum(1, 2) == 3
+
+            fsum = FastTreeValue.func(executor=pool)(lambda x: FastTreeValue({'v': x}))
+            assert fsum(FastTreeValue({'a': 1, 'b': 2})) == FastTreeValue({'a': {'v': 1}, 'b': {'v': 2}})
+
+            fdiv = func_treelize(executor=pool)(lambda x: 1 // x)
+            with pytest.raises(ZeroDivisionError):
+                fdiv(TreeValue({'a': 1, 'b': 0}))
+
+            with pytest.raises(ValueError):
+                func_treelize(delayed=True, executor=pool)(f)
+
+    def test_coroutine(self):
+        running, max_running = 0, 0
+
+        @func_treelize(mode='outer', missing=0)
+        async def ssum(x, y):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.1)
+            running -= 1
+            return x + y
+
+        t1 = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t2 = TreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'e': 55}})
+        _start_time = time.time()
+        assert asyncio.run(ssum(t1, t2)) == TreeValue({'a': 12, 'b': 24, 'x': {'c': 36, 'd': 4, 'e': 55}})
+        assert time.time() - _start_time < 0.3
+        assert max_running == 5
+        assert asyncio.run(ssum(1, 2)) == 3
+
+        max_running = 0
+
+        @FastTreeValue.func(max_concurrency=2)
+        async def fdouble(x):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return FastTreeValue({'v': x * 2})
+
+        assert asyncio.run(fdouble(FastTreeValue({'a': 1, 'b': 2, 'x': {'c': 3}}))) == FastTreeValue({
+            'a': {'v': 2}, 'b': {'v': 4}, 'x': {'c': {'v': 6}},
+        })
+        assert max_running == 2
+
+        @func_treelize()
+        async def fdiv(x):
+            await asyncio.sleep(0.01)
+            return 1 // x
+
+        with pytest.raises(ZeroDivisionError):
+            asyncio.run(fdiv(TreeValue({'a': 1, 'b': 0})))
+        with pytest.raises(KeyError):
+            asyncio.run(fdiv(TreeValue({'a': 1}), TreeValue({'b': 1})))
+
+        with pytest.raises(ValueError):
+            func_treelize(delayed=True)(fdiv)
+
+    def test_dispatch(self):
+        @func_treelize(mode='outer', missing=0)
+        def double(x, y=0):
+            return ('default', x, y)
+
+        @double.register(np.ndarray)
+        def _(x, y=0):
+            return (x * 2 + y).tolist()
+
+        @double.register(numbers.Number)
+        def _(x, y=0):
+            return x * 2 + y
+
+        double.register(str, lambda x, y=0: x.upper())
+
+        t1 = TreeValue({'a': 1, 'b': 'b', 'x': {'c': np.array([1, 2]), 'd': 1.5, 'e': None}})
+        assert double(t1) == TreeValue({'a': 2, 'b': 'B', 'x': {'c': [2, 4], 'd': 3.0, 'e': ('default', None, 0)}})
+        assert double(t1, TreeValue({'a': 10, 'b': '', 'x': {'c': 1, 'f': 2}})) == TreeValue({
+            'a': 12, 'b': 'B', 'x': {'c': [3, 5], 'd': 3.0, 'e': ('default', None, 0), 'f': 2},
+        })
+        assert double(2) == 4
+        assert double(y=2, x='a') == ('default', 'a', 2)
+
+        assert double.dispatch(int) is double.dispatch(bool)
+        assert double.dispatch(np.ndarray)(np.array([1])) == [2]
+        assert double.dispatch(type(None))(None) == ('default', None, 0)
+        assert set(double.registry.keys()) == {object, np.ndarray, numbers.Number, str}
+        with pytest.raises(TypeError):
+            double.registry[int] = lambda x, y=0: x
+
+        # the cached selections are refreshed after registering
+        double.register(bool, lambda x, y=0: not x)
+        assert double(TreeValue({'a': True, 'b': 1})) == TreeValue({'a': False, 'b': 2})
+
+        # the most specific abstract class is selected, not the first registered one
+        double.register(numbers.Integral, lambda x, y=0: x * 3 + y)
+        assert double(TreeValue({'a': 2, 'b': 1.5, 'c': True})) == TreeValue({'a': 6, 'b': 3.0, 'c': False})
+        assert double.dispatch(np.int64)(np.int64(2)) == 6
+        assert double.dispatch(float) is double.dispatch(complex)
+        assert numbers.Integral in double.registry
+
+        @FastTreeValue.func(delayed=True)
+        def inc(x):
+            return x + 1
+
+        inc.register(str, lambda x: x + '1')
+        assert inc(FastTreeValue({'a': 1, 'b': 'b'})) == FastTreeValue({'a': 2, 'b': 'b1'})
+        assert func_treelize()(_ssum).dispatch(int) is _ssum
+
+        @func_treelize()
+        async def adouble(x):
+            return x * 2
+
+        @adouble.register(str)
+        async def _(x):
+            return x.upper()
+
+        assert asyncio.run(adouble(TreeValue({'a': 1, 'b': 'b'}))) == TreeValue({'a': 2, 'b': 'B'})
+        assert adouble.dispatch(str) is _
+        assert set(adouble.registry.keys()) == {object, str}
+        with pytest.raises(TypeError):
+            adouble.register(int, lambda x: x)
+        with pytest.raises(TypeError):
+            adouble.register('int')
+
+    def test_cache(self):
+        calls = []
+
+        @func_treelize(cache=3)
+        def double(x):
+            calls.append(x)
+            return x * 2
+
+        a, b = np.array([1, 2]), np.array([3, 4])
+        t1 = TreeValue({'a': a, 'x': {'b': b, 'c': 'c'}})
+        r1 = double(t1)
+        assert len(calls) == 3
+        r2 = double(TreeValue({'a': a, 'x': {'b': b, 'c': 'c'}, 'd': 'd'}))
+        assert len(calls) == 4
+        assert r2.a is r1.a and r2.x.b is r1.x.b
+        assert double.cache_info() == (3, 4, 1, 3, 3)
+        assert double.cache_info().hits == 3
+
+        # equal but not identical values are not hit
+        double(TreeValue({'a': a.copy()}))
+        assert len(calls) == 5
+
+        double.cache_clear()
+        assert double.cache_info() == (0, 0, 0, 3, 0)
+        assert func_treelize()(_ssum).cache_info() is None
+
+        cache = LeafCache(None, key=lambda v: v.tobytes() if isinstance(v, np.ndarray) else v)
+        f1 = func_treelize(cache=cache)(lambda x, y=0: x + y)
+        f2 = func_treelize(mode='outer', missing=0, cache=cache)(lambda x, y=0: x - y)
+        t2 = TreeValue({'a': np.array([1]), 'b': 1})
+        assert f1(t2, y=1) == TreeValue({'a': np.array([2]), 'b': 2})
+        assert f1(TreeValue({'a': np.array([1]), 'b': 1}), y=1) == TreeValue({'a': np.array([2]), 'b': 2})
+        assert f2(t2, y=1) == TreeValue({'a': np.array([0]), 'b': 0})
+        assert f2(t2, TreeValue({'c': 1})) == TreeValue({'a': np.array([1]), 'b': 1, 'c': -1})
+        assert cache.info() == (2, 7, 0, None, 7)
+        assert len(cache) == 7
+        assert 'hits: 2' in repr(cache)
+
+        assert func_treelize(cache=0)(_ssum)(TreeValue({'a': 1}), 2) == TreeValue({'a': 3})
+        assert func_treelize(cache=True)(_ssum).cache_info().maxsize == 128
+
+        @FastTreeValue.func(delayed=True, cache=8)
+        def inc(x):
+            calls.append(x)
+            return x + 1
+
+        calls.clear()
+        t3 = FastTreeValue({'a': 1, 'b': 'b'})
+        inc.register(str, lambda x: x + '1')
+        assert inc(t3) == FastTreeValue({'a': 2, 'b': 'b1'})
+        assert inc(t3) == FastTreeValue({'a': 2, 'b': 'b1'})
+        assert calls == [1]
+        assert inc.cache_info().hits == 2
+
+        class MyTreeValue(FastTreeValue):
+            @method_treelize(cache=4)
+            def scale(self_, k):
+                calls.append(self_)
+                return self_ * k
+
+            @method_treelize(self_copy=True, cache=4)
+            def iscale(self_, k):
+                calls.append(self_)
+                self_ *= k
+                return self_
+
+        calls.clear()
+        t4 = MyTreeValue({'a': 1, 'b': 2})
+        assert t4.scale(3) == MyTreeValue({'a': 3, 'b': 6})
+        assert t4.scale(3) == MyTreeValue({'a': 3, 'b': 6})
+        assert calls == [1, 2]
+
+        # the in-place results are not shared with the cache
+        arr = np.array([1, 2])
+        t5 = MyTreeValue({'a': arr})
+        t6 = MyTreeValue({'a': arr})
+        t5.iscale(2)
+        t6.iscale(2)
+        assert len(calls) == 4
+        assert (arr == [4, 8]).all()
+        assert MyTreeValue.iscale.cache_info().currsize == 0
+
+        with pytest.raises(ValueError):
+            LeafCache(-1)
+        with pytest.raises(TypeError):
+            func_treelize(cache='yes')(_ssum)
+        with pytest.raises(ValueError):
+            func_treelize(batched=True, cache=True)(_ssum)
+        with pytest.raises(ValueError):
+            @func_treelize(cache=True)
+            async def _(x):
+                return x
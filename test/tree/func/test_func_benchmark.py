@@ -0,0 +1,180 @@
+import numpy as np
+import pytest
+
+from treevalue import FastTreeValue, func_treelize, fused, MISSING_DROP, MISSING_PASS
+
+
+def _make_tree(n: int, offset: int = 0) -> FastTreeValue:
+    return FastTreeValue({f'k{i}': i for i in range(offset, n + offset)})
+
+
+def _make_nested_tree(n: int, m: int) -> FastTreeValue:
+    return FastTreeValue({f'k{i}': {f'j{j}': i * m + j for j in range(m)} for i in range(n)})
+
+
+def _make_func(mode: str):
+    if mode == 'strict':
+        return func_treelize(mode)(lambda x, y: x + y)
+    else:
+        return func_treelize(mode, missing=0)(lambda x, y: x + y)
+
+
+@pytest.mark.benchmark(group='func_treelize_mode')
+class TestTreeFuncBenchmark:
+    @pytest.mark.parametrize('mode', ['strict', 'inner', 'outer', 'left'])
+    def test_same_keys(self, benchmark, mode):
+        f = _make_func(mode)
+        t1, t2 = _make_tree(100), _make_tree(100)
+        benchmark(f, t1, t2)
+
+    @pytest.mark.parametrize('mode', ['inner', 'outer', 'left'])
+    def test_partial_keys(self, benchmark, mode):
+        f = _make_func(mode)
+        t1, t2 = _make_tree(100), _make_tree(100, 50)
+        benchmark(f, t1, t2)
+
+    @pytest.mark.parametrize('mode', ['strict', 'outer'])
+    def test_nested_100_leaves(self, benchmark, mode):
+        f = _make_func(mode)
+        t1, t2 = _make_nested_tree(10, 10), _make_nested_tree(10, 10)
+        benchmark(f, t1, t2)
+
+
+@pytest.mark.benchmark(group='func_treelize_dispatch')
+class TestTreeFuncDispatchBenchmark:
+    @pytest.mark.parametrize('n', [1, 4])
+    def test_small_add(self, benchmark, n):
+        t1, t2 = _make_tree(n), _make_tree(n)
+        benchmark(lambda: t1 + t2)
+
+    def test_small_nested_add(self, benchmark):
+        t1, t2 = _make_nested_tree(2, 2), _make_nested_tree(2, 2)
+        benchmark(lambda: t1 + t2)
+
+
+def _fused_expr(a, b, c, d):
+    with fused():
+        e = a * b + c - d
+    return e.value()
+
+
+@pytest.mark.benchmark(group='func_treelize_fused')
+class TestTreeFuncFusedBenchmark:
+    @pytest.mark.parametrize('fuse', [False, True])
+    def test_nested_100_leaves(self, benchmark, fuse):
+        a, b, c, d = [_make_nested_tree(10, 10) for _ in range(4)]
+        if fuse:
+            benchmark(_fused_expr, a, b, c, d)
+        else:
+            benchmark(lambda: a * b + c - d)
+
+
+@pytest.mark.benchmark(group='func_treelize_inplace')
+class TestTreeFuncInplaceBenchmark:
+    def test_nested_100_leaves_iadd(self, benchmark):
+        t1, t2 = _make_nested_tree(10, 10), _make_nested_tree(10, 10)
+
+        def _iadd():
+            nonlocal t1
+            t1 += t2
+
+        benchmark(_iadd)
+
+    def test_nested_100_leaves_iadd_numpy(self, benchmark):
+        t1 = FastTreeValue({f'k{i}': {f'j{j}': np.zeros(16) for j in range(10)} for i in range(10)})
+        t2 = FastTreeValue({f'k{i}': {f'j{j}': np.ones(16) for j in range(10)} for i in range(10)})
+
+        def _iadd():
+            nonlocal t1
+            t1 += t2
+
+        benchmark(_iadd)
+
+
+@pytest.mark.benchmark(group='func_treelize_batched')
+class TestTreeFuncBatchedBenchmark:
+    @pytest.mark.parametrize('batched', [False, True])
+    def test_nested_100_arrays(self, benchmark, batched):
+        t = FastTreeValue({f'k{i}': {f'j{j}': np.random.randn(16) for j in range(10)} for i in range(10)})
+        f = func_treelize(batched=batched)(lambda x: np.clip(x, -1.0, 1.0))
+        benchmark(f, t)
+
+
+def _make_shifted_trees(n: int, count: int, shift: int, tag: str = ''):
+    return [FastTreeValue({f'k{tag}{i}': i for i in range(j * shift, j * shift + n)}) for j in range(count)]
+
+
+@pytest.mark.benchmark(group='func_treelize_align')
+class TestTreeFuncAlignBenchmark:
+    @pytest.mark.parametrize('mode', ['inner', 'outer', 'left'])
+    def test_1k_keys_4_trees(self, benchmark, mode):
+        f = func_treelize(mode, missing=0)(lambda a, b, c, d: a)
+        trees = _make_shifted_trees(1000, 4, 100)
+        benchmark(f, *trees)
+
+    @pytest.mark.parametrize('mode', ['inner', 'outer', 'left'])
+    def test_1k_keys_4_trees_new_layouts(self, benchmark, mode):
+        f = func_treelize(mode, missing=0)(lambda a, b, c, d: a)
+        rounds = iter(range(1000000))
+
+        def _setup():
+            # new keys in each round, so the plans can not be reused
+            return tuple(_make_shifted_trees(1000, 4, 100, tag=f'r{next(rounds)}_')), {}
+
+        benchmark.pedantic(f, setup=_setup, rounds=30)
+
+
+def _make_mixed_tree(n: int, m: int) -> FastTreeValue:
+    values = [lambda x: x, float, str, lambda x: np.array([x, x])]
+    return FastTreeValue({f'k{i}': {f'j{j}': values[j % 4](i * m + j) for j in range(m)} for i in range(n)})
+
+
+def _branch_double(x):
+    if isinstance(x, np.ndarray):
+        return x * 2
+    elif isinstance(x, str):
+        return x + x
+    elif isinstance(x, float):
+        return x * 2.0
+    else:
+        return x * 2
+
+
+def _make_dispatched_double():
+    f = func_treelize()(lambda x: x * 2)
+    f.register(np.ndarray, lambda x: x * 2)
+    f.register(str, lambda x: x + x)
+    f.register(float, lambda x: x * 2.0)
+    return f
+
+
+@pytest.mark.benchmark(group='func_treelize_leaf_dispatch')
+class TestTreeFuncLeafDispatchBenchmark:
+    @pytest.mark.parametrize('registered', [False, True])
+    def test_mixed_100_leaves(self, benchmark, registered):
+        f = _make_dispatched_double() if registered else func_treelize()(_branch_double)
+        t = _make_mixed_tree(10, 10)
+        benchmark(f, t)
+
+
+@pytest.mark.benchmark(group='func_treelize_cache')
+class TestTreeFuncCacheBenchmark:
+    @pytest.mark.parametrize('cache', [None, 256])
+    def test_nested_100_arrays_unchanged(self, benchmark, cache):
+        f = func_treelize(cache=cache)(lambda x, y: np.tanh(x) @ y)
+        t = FastTreeValue({f'k{i}': {f'j{j}': np.full((32, 32), i * 10 + j) for j in range(10)} for i in range(10)})
+        benchmark(f, t, t)
+
+
+def _make_sparse_trees(count: int, present: int):
+    return [FastTreeValue({f'k{i}': i for i in range(j * present, (j + 1) * present)}) for j in range(count)]
+
+
+@pytest.mark.benchmark(group='func_treelize_sparse')
+class TestTreeFuncSparseBenchmark:
+    @pytest.mark.parametrize('missing', ['zero', 'drop', 'pass'])
+    def test_4_trees_sparse(self, benchmark, missing):
+        f = func_treelize('outer', missing={'zero': 0, 'drop': MISSING_DROP, 'pass': MISSING_PASS}[missing])(
+            lambda *xs: sum(xs))
+        trees = _make_sparse_trees(4, 50)
+        benchmark(f, *trees)
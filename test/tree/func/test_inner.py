@@ -23,6 +23,7 @@ class TestTreeFuncInner:
         assert ssum(t1, t2, t3) == TreeValue({'a': 23, 'b': 46, 'x': {'c': 69, 'd': 92}})
         assert ssum(t2, t3) == TreeValue({'a': 22, 'b': 44, 'x': {'c': 66, 'd': 88}})
         assert ssum(t3, t1, t2) == TreeValue({'a': 23, 'b': 46, 'x': {'c': 69, 'd': 92}})
+        assert list(ssum(t3, t1, t2).keys()) == ['a', 'b', 'x']
 
     def test_inner_inherit(self):
         @func_treelize('inner', )
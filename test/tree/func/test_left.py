@@ -1,6 +1,6 @@
 import pytest
 
-from treevalue.tree import func_treelize, TreeValue
+from treevalue.tree import func_treelize, TreeValue, FastTreeValue, MISSING_PASS
 
 
 # noinspection DuplicatedCode
@@ -44,3 +44,34 @@ class TestTreeFuncLeft:
         t2 = TreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 44}})
         t3 = TreeValue({'a': 11, 'b': 22, 'c': 33, 'x': {'c': 33, 'd': 44, 'e': 550}})
         assert ssum(t3, t1, t2, -10) == TreeValue({'a': 13, 'b': 36, 'c': 23, 'x': {'c': 59, 'd': 82, 'e': 540}})
+
+    def test_left_sparse(self):
+        calls = []
+
+        @func_treelize('left', missing=MISSING_PASS)
+        def ssum(*args):
+            calls.append(len(args))
+            return sum(args)
+
+        t1 = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}, 'y': {'e': 5}})
+        t2 = TreeValue({'a': 11, 'x': {'c': 33}, 'z': 1})
+        assert ssum(t1, t2) == TreeValue({'a': 12, 'b': 2, 'x': {'c': 36, 'd': 4}, 'y': {'e': 5}})
+        assert calls == [2, 2]
+
+        class MyTreeValue(FastTreeValue):
+            pass
+
+        t3 = MyTreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t4 = MyTreeValue({'a': 10, 'x': {'d': 40}})
+        iadd = MyTreeValue.func('left', missing=MISSING_PASS)(lambda *xs: sum(xs))
+        assert iadd(t3, t4) == MyTreeValue({'a': 11, 'b': 2, 'x': {'c': 3, 'd': 44}})
+
+    def test_left_plan_keywords(self):
+        f = func_treelize('left', missing=0)(lambda x, y: x + y)
+        t1 = TreeValue({'a': 1, 'b': 2})
+        t2 = TreeValue({'a': 10})
+        assert f(x=t1, y=t2) == TreeValue({'a': 11, 'b': 2})
+        # the same layouts with the other names, the left tree is changed
+        assert f(y=t1, x=t2) == TreeValue({'a': 11})
+        assert f(t1, y=t2) == TreeValue({'a': 11, 'b': 2})
+        assert f(t2, y=t1) == TreeValue({'a': 11})
@@ -1,6 +1,6 @@
 import pytest
 
-from treevalue.tree import func_treelize, TreeValue
+from treevalue.tree import func_treelize, TreeValue, MISSING_DROP, MISSING_PASS
 
 
 # noinspection DuplicatedCode
@@ -16,6 +16,8 @@ class TestTreeFuncOuter:
         assert ssum(1, 2, 3) == 6
         assert ssum(t1, t2) == TreeValue({'a': 12, 'b': 24, 'f': 344, 'x': {'c': 36, 'd': 48, 'p': 76, 'e': 45}})
         assert ssum(t1.x, t2.x) == TreeValue({'c': 36, 'd': 48, 'p': 76, 'e': 45})
+        assert list(ssum(t1, t2).keys()) == ['a', 'b', 'x', 'f']
+        assert list(ssum(t1, t2).x.keys()) == ['c', 'd', 'p', 'e']
 
         t3 = TreeValue({'a': 11, 'b': 22, 'c': 33, 'x': {'c': 33, 'd': 44, 'e': 550, 'v': -100}})
         assert ssum(t1, t2, t3) == TreeValue({
@@ -81,3 +83,62 @@ class TestTreeFuncOuter:
             'a': 12, 'b': 23, 'x': {'c': 38, 'd': 4}
         })
         assert cnt_1 == 4
+
+    def test_outer_plan_reuse(self):
+        @func_treelize('outer', missing=lambda: 0)
+        def ssum(x, y):
+            return x + y
+
+        t1 = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        t2 = TreeValue({'a': 11, 'x': {'c': 33, 'e': 55}})
+        t3 = TreeValue({'b': 22, 'x': {'d': 44, 'e': 55}})
+        for _ in range(3):
+            assert ssum(t1, t2) == TreeValue({'a': 12, 'b': 2, 'x': {'c': 36, 'd': 4, 'e': 55}})
+            assert ssum(t1, y=t3) == TreeValue({'a': 1, 'b': 24, 'x': {'c': 3, 'd': 48, 'e': 55}})
+            assert ssum(t2, t3) == TreeValue({'a': 11, 'x': {'c': 33, 'e': 110, 'd': 44}, 'b': 22})
+            assert list(ssum(t2, t3).keys()) == ['a', 'x', 'b']
+            assert list(ssum(t2, t3).x.keys()) == ['c', 'e', 'd']
+
+        t1.x.f = 6
+        assert ssum(t1, t2) == TreeValue({'a': 12, 'b': 2, 'x': {'c': 36, 'd': 4, 'f': 6, 'e': 55}})
+
+    def test_outer_sparse(self):
+        calls = []
+
+        @func_treelize('outer', missing=MISSING_DROP)
+        def ssum(*args, **kwargs):
+            calls.append(len(args) + len(kwargs))
+            return sum(args) + sum(kwargs.values())
+
+        t1 = TreeValue({'a': 1, 'x': {'c': 3, 'd': 4}})
+        t2 = TreeValue({'a': 11, 'b': 22, 'x': {'c': 33}})
+        t3 = TreeValue({'b': 100, 'y': {'e': 5}})
+        assert ssum(t1, t2, t3) == TreeValue({'a': 12, 'x': {'c': 36, 'd': 4}, 'b': 122, 'y': {'e': 5}})
+        assert sorted(calls) == [1, 1, 2, 2, 2]
+        assert ssum(t1, y=t3) == TreeValue({'a': 1, 'x': {'c': 3, 'd': 4}, 'b': 100, 'y': {'e': 5}})
+
+        calls.clear()
+        psum = func_treelize('outer', missing=MISSING_PASS)(ssum.__wrapped__)
+        t4 = psum(t1, t2, t3)
+        assert t4 == TreeValue({'a': 12, 'x': {'c': 36, 'd': 4}, 'b': 122, 'y': {'e': 5}})
+        assert sorted(calls) == [2, 2, 2]
+        # the passed sub trees are not shared with the arguments
+        t4.y.e = 50
+        assert t3.y.e == 5
+
+        calls.clear()
+        assert psum(t1, t2, 1000) == TreeValue({'a': 1012, 'x': {'c': 1036, 'd': 1004}, 'b': 1022})
+        assert sorted(calls) == [2, 2, 3, 3]
+
+        # the passed sub trees are copied, the source trees are not changed
+        t5 = TreeValue({'a': {'y': {'z': 1}}})
+        ya = t5.a.y
+        t6 = psum(t5, TreeValue({'b': 1}))
+        ya.z = 7
+        assert t6.a.y.z == 1
+        assert t5.a.y.z == 7
+        t6.a.y.z = 8
+        assert ya.z == 7
+
+        dsum = func_treelize('outer', missing=MISSING_PASS, delayed=True)(ssum.__wrapped__)
+        assert dsum(t1, b=t3) == TreeValue({'a': 1, 'x': {'c': 3, 'd': 4}, 'b': 100, 'y': {'e': 5}})
@@ -1,3 +1,4 @@
+import asyncio
 import collections.abc
 import unittest
 from functools import reduce
@@ -311,6 +312,45 @@ def get_fasttreevalue_test(treevalue_class: Type[FastTreeValue]):
             assert id(t2._detach()) == original_id
             assert id(t2.x._detach()) == original_id_x
 
+        def test_numeric_inplace(self):
+            arr = np.zeros(3)
+            t1 = treevalue_class({'a': 1, 'b': 2, 'x': {'c': 3, 'd': arr}})
+            t1_x = t1.x
+            t1 += 1
+            assert t1.x is t1_x
+            assert t1.x.d is arr
+            assert (arr == 1).all()
+            assert t1.a == 2 and t1.x.c == 4
+
+            # the copy-on-write clone is not changed
+            t2 = t1.clone(cow=True)
+            t1 *= treevalue_class({'a': 10, 'b': 10, 'x': 10})
+            assert t1.a == 20 and t1.b == 30 and t1.x.c == 40
+            assert t2.a == 2 and t2.b == 3 and t2.x.c == 4
+
+            # leaf of self is replaced by the subtree of the other
+            t3 = treevalue_class({'a': 1, 'b': 2})
+            t3 += treevalue_class({'a': {'c': 1, 'd': 2}, 'b': 3})
+            assert t3 == treevalue_class({'a': {'c': 2, 'd': 3}, 'b': 5})
+
+            with pytest.raises(KeyError):
+                t3 -= treevalue_class({'a': 1})
+            assert t3 == treevalue_class({'a': {'c': 2, 'd': 3}, 'b': 5})
+
+            # the shared subtree is calculated with the original values
+            s = treevalue_class({'v': 1})
+            t4 = treevalue_class({'a': s, 'b': s})
+            t4_a = t4.a
+            t4 += 1
+            assert t4.a.v == 2 and t4.b.v == 2
+            assert t4.a is t4_a
+
+            # nothing is changed when error occurs
+            t5 = treevalue_class({'a': 1, 'x': {'b': 2, 'c': 'str'}})
+            with pytest.raises(TypeError):
+                t5 += 1
+            assert t5 == treevalue_class({'a': 1, 'x': {'b': 2, 'c': 'str'}})
+
         def test_numeric_pos(self):
             t1 = treevalue_class({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
             assert +t1 == treevalue_class({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
@@ -487,6 +527,28 @@ def get_fasttreevalue_test(treevalue_class: Type[FastTreeValue]):
             assert t4.a == 3
             assert cnt == 4
 
+        def test_vmap(self):
+            cnt = 0
+
+            def f(x):
+                nonlocal cnt
+                cnt += 1
+                return np.clip(x, 2, 4)
+
+            t1 = treevalue_class({
+                'a': np.array([1, 2]), 'b': np.array([3, 5]),
+                'x': {'c': np.array([5]), 'd': 1, 'e': np.array([0.0, 9.0])},
+            })
+            t2 = t1.vmap(f)
+            assert cnt == 4
+            assert isinstance(t2, treevalue_class)
+            assert (t2.a == np.array([2, 2])).all()
+            assert (t2.b == np.array([3, 4])).all()
+            assert (t2.x.c == np.array([4])).all()
+            assert t2.x.d == 2
+            assert t2.x.e.dtype == np.float64
+            assert (t2.x.e == np.array([2.0, 4.0])).all()
+
         def test_type(self):
             t1 = treevalue_class({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
             assert t1.type(TreeValue) == TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
@@ -732,6 +794,22 @@ def get_fasttreevalue_test(treevalue_class: Type[FastTreeValue]):
                 ('c', 'y'): 3,
             }
 
+        def test_materialize(self):
+            tv1 = treevalue_class({'a': delayed(lambda: 1), 'c': {'x': delayed(lambda: 2), 'y': 3}})
+            assert tv1.materialize() is tv1
+            assert tv1._detach().detach()['a'] == 1
+            assert tv1 == treevalue_class({'a': 1, 'c': {'x': 2, 'y': 3}})
+
+        def test_materialize_async(self):
+            async def f(x):
+                await asyncio.sleep(0.01)
+                return x
+
+            tv1 = treevalue_class({'a': delayed(f, 1), 'c': {'x': delayed(f, 2), 'y': 3}})
+            assert asyncio.run(tv1.materialize_async()) is tv1
+            assert tv1._detach().detach()['a'] == 1
+            assert tv1 == treevalue_class({'a': 1, 'c': {'x': 2, 'y': 3}})
+
         def test_tree_value_operate_with_item(self):
             tv1 = treevalue_class({'a': 1, 'b': 2, 'c': {'x': 2, 'y': 3}})
             tv2 = treevalue_class(tv1)
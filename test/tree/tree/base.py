@@ -176,6 +176,71 @@ def get_treevalue_test(treevalue_class: Type[TreeValue]):
             assert tv1.fff == {'x': 1, 'y': 2}
 
         # noinspection PyTypeChecker
+        def test_child_wrapper_cache(self):
+            t = treevalue_class({'a': 1, 'x': {'c': 3, 'y': {'d': 4}}})
+            x = t.x
+            assert t.x is x
+            assert t['x'] is x
+            assert t.get('x') is x
+            assert t.x.y is x.y
+
+            t.x = {'c': 5}
+            assert t.x == {'c': 5}
+            t.x = treevalue_class({'c': 3})
+            assert t.x is not x
+            assert t.x == treevalue_class({'c': 3})
+
+            x = t.x
+            t._detach().set('x', treevalue_class({'c': 4})._detach())
+            assert t.x is not x
+            assert t.x.c == 4
+
+            x = t.x
+            assert t.pop('x') is x
+            t.x = x
+            assert t.x is not x
+            assert t.x == x
+
+            del t.x
+            with pytest.raises(AttributeError):
+                _ = t.x
+
+        def test_get_many(self):
+            t = treevalue_class({'a': 1, 'b': 2, 'x': {'c': 3, 'd': delayed(lambda: 4), 'y': {'e': 5}}})
+            assert t.get_many([('a',), ('x', 'c'), ('x', 'd'), ('x', 'y', 'e')]) == [1, 3, 4, 5]
+
+            x, y = t.get_many(iter([('x',), ('x', 'y')]))
+            assert isinstance(x, treevalue_class)
+            assert x == t.x
+            assert y == treevalue_class({'e': 5})
+            assert t.get_many([()]) == [t]
+
+            with pytest.raises(KeyError):
+                t.get_many([('x', 'f')])
+
+        def test_set_many(self):
+            t = treevalue_class({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+            t.set_many({
+                ('a',): 11, ('x', 'c'): 33, ('x', 'y', 'e'): 5,
+                ('z',): treevalue_class({'f': 6}), ('w',): {'g': 7},
+            })
+            assert t == treevalue_class({
+                'a': 11, 'b': 2,
+                'x': {'c': 33, 'd': 4, 'y': {'e': 5}},
+                'z': {'f': 6}, 'w': raw({'g': 7}),
+            })
+
+            with pytest.raises(TypeError):
+                t.set_many({('a', 'c'): 1})
+
+        def test_del_many(self):
+            t = treevalue_class({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+            t.del_many([('a',), ('x', 'c')])
+            assert t == treevalue_class({'b': 2, 'x': {'d': 4}})
+
+            with pytest.raises(KeyError):
+                t.del_many([('x', 'c')])
+
         def test_setdefault(self):
             t = treevalue_class({})
             assert t.setdefault('a', 1) == 1
@@ -265,6 +330,9 @@ def get_treevalue_test(treevalue_class: Type[TreeValue]):
             assert f"'c' --> <{treevalue_class.__name__}" in repr(tv2)
             assert "(The same address as <root>)" in repr(tv2)
 
+            tv2.c.w = tv2.c
+            assert "(The same address as <root>.c)" in repr(tv2)
+
             tv3 = treevalue_class({
                 'a': delayed(lambda: tv1.a),
                 'b': delayed(lambda: tv1.b),
@@ -650,6 +718,11 @@ def get_treevalue_test(treevalue_class: Type[TreeValue]):
             assert t1b.y == pytest.approx(7.7)
             assert t1b.constraint.equiv([object, {'x': [cleaf(), str], 'y': float}])
 
+            t1a, t1b, t1bx = t1.get_many([('a',), ('b',), ('b', 'x')])
+            assert t1a == 21
+            assert t1bx == 'f-49'
+            assert t1b.constraint.equiv([object, {'x': [cleaf(), str], 'y': float}])
+
         # noinspection PyTypeChecker
         def test_constraint_pop(self):
             t1 = get_demo_constraint_tree()
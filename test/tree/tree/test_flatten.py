@@ -82,6 +82,17 @@ class TestTreeTreeFlatten:
             ('e',),
         ]
 
+    def test_flatten_deep(self):
+        data = {'v': 0}
+        for _ in range(10000):
+            data = {'x': data}
+        t = TreeValue(data)
+
+        path = ('x',) * 10000 + ('v',)
+        assert flatten(t) == [(path, 0)]
+        assert flatten_keys(t) == [path]
+        assert flatten_values(t) == [0]
+
     def test_unflatten(self):
         flatted = [
             (('a',), 1),
@@ -35,6 +35,19 @@ class TestTreeTreeFunctional:
             'a': 3, 'b': 4, 'c': {'x': 4, 'y': 5}
         }})
 
+    def test_mapping_deep(self):
+        data = {'v': 1}
+        for _ in range(10000):
+            data = {'x': data}
+        t = TreeValue(data)
+
+        t1 = mapping(t, lambda x, p: (x + 1, len(p)))
+        t2 = mapping(t, lambda x: x + 1, delayed=True)
+        for _ in range(10000):
+            t, t1, t2 = t.x, t1.x, t2.x
+        assert t1.v == (2, 10001)
+        assert t2.v == 2
+
     def test_mapping_delayed(self):
         tv1 = TreeValue({'a': 1, 'b': 2, 'c': {'x': 2, 'y': 3}})
         tv8 = TreeValue({'v': delayed(lambda: tv1)})
@@ -83,6 +96,67 @@ class TestTreeTreeFunctional:
         assert cnt_v == 1
         assert cnt_f == 2
 
+    def test_mapping_delayed_fused(self):
+        cnt = 0
+
+        def f(x):
+            nonlocal cnt
+            cnt += 1
+            return x + 1
+
+        t = TreeValue({'a': 1, 'b': delayed(lambda: 2), 'x': {'c': 3}})
+        t1 = t
+        for _ in range(10):
+            t1 = mapping(t1, f, delayed=True)
+        assert cnt == 0
+
+        pa = t1._detach().detach()['a']
+        assert len(pa.args[1]) == 10
+        assert t1 == TreeValue({'a': 11, 'b': 12, 'x': {'c': 13}})
+        assert cnt == 30
+
+        t2 = mapping(t, f, delayed=True)
+        assert t2.a == 2
+        t3 = mapping(mapping(t2, f, delayed=True), f, delayed=True)
+        assert len(t3._detach().detach()['a'].args[1]) == 2
+        assert len(t3._detach().detach()['b'].args[1]) == 3
+        assert t3 == TreeValue({'a': 4, 'b': 5, 'x': {'c': 6}})
+
+        t4 = mapping(t, lambda x: TreeValue({'p': x, 'q': x * 2}), delayed=True)
+        t5 = mapping(mapping(t4, lambda x: x + 1, delayed=True), lambda x, p: (x, p), delayed=True)
+        assert t5 == TreeValue({
+            'a': {'p': (2, ('a', 'p')), 'q': (3, ('a', 'q'))},
+            'b': {'p': (3, ('b', 'p')), 'q': (5, ('b', 'q'))},
+            'x': {'c': {'p': (4, ('x', 'c', 'p')), 'q': (7, ('x', 'c', 'q'))}},
+        })
+
+        # the fused stages keep their own paths when mapping the sub tree
+        t6 = mapping(mapping(t, lambda x, p: (x, p), delayed=True).x, lambda x, p: (x, p), delayed=True)
+        assert len(t6._detach().detach()['c'].args[1]) == 2
+        assert t6 == TreeValue({'c': ((3, ('x', 'c')), ('c',))})
+        t7 = mapping(mapping(t4, lambda x, p: (x, p), delayed=True).x, lambda x, p: (x, p), delayed=True)
+        assert t7 == TreeValue({'c': {
+            'p': ((3, ('x', 'c', 'p')), ('c', 'p')),
+            'q': ((6, ('x', 'c', 'q')), ('c', 'q')),
+        }})
+
+        # the calculated intermediate values are reused
+        cnt = 0
+        t8 = mapping(t, f, delayed=True)
+        t9 = mapping(mapping(t8, f, delayed=True), f, delayed=True)
+        assert t8 == TreeValue({'a': 2, 'b': 3, 'x': {'c': 4}})
+        assert cnt == 3
+        assert t9 == TreeValue({'a': 4, 'b': 5, 'x': {'c': 6}})
+        assert cnt == 9
+
+        cnt = 0
+        t10 = mapping(mapping(t, f, delayed=True), f, delayed=True)
+        t11 = mapping(mapping(t10, f, delayed=True), f, delayed=True)
+        assert t10.a == 3
+        assert cnt == 2
+        assert t11.a == 5
+        assert cnt == 4
+
     def test_mask(self):
         class MyTreeValue(TreeValue):
             pass
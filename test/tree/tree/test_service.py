@@ -1,6 +1,15 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
 import pytest
 
-from treevalue.tree import jsonify, TreeValue, clone, typetrans, raw, walk, delayed
+from treevalue.tree import jsonify, TreeValue, clone, typetrans, raw, walk, delayed, materialize, \
+    materialize_async
+
+
+def _double(x):
+    return x * 2
 
 
 # noinspection DuplicatedCode
@@ -68,6 +77,39 @@ class TestTreeTreeService:
         assert tv4.x.c is tv3.x.c
         assert tv4.x.d is tv3.x.d
 
+        tv6 = clone(tv1, cow=True)
+        assert tv6 == tv1
+        tv6.c.a = 70
+        tv6.b = 40
+        assert jsonify(tv6) == {
+            'a': 3, 'b': 40, 'c': {'a': 70, 'b': 4}
+        }
+        assert jsonify(tv1) == {
+            'a': 3, 'b': 4, 'c': {'a': 7, 'b': 4}
+        }
+        tv1.c.b = 400
+        assert tv6.c.b == 4
+
+        # the child references held before are still connected to the original tree only
+        t = TreeValue({'a': {'x': 1, 'y': {'z': 1}}, 'b': 2})
+        a, ay = t.a, t.a.y
+        c = clone(t, cow=True)
+        a.x = 5
+        ay.z = 6
+        assert c.a.x == 1 and c.a.y.z == 1
+        assert t.a.x == 5 and t.a.y.z == 6
+        c.a.x = 7
+        a.w = 8
+        assert t.a.x == 5 and t.a.w == 8 and 'w' not in c.a
+
+        # the detached maps are not shared
+        c._detach().detach()['a'] = 5
+        assert isinstance(t.a, TreeValue)
+        t._detach().detach()['b'] = 20
+        assert c.b == 2
+        with pytest.raises(ValueError):
+            _ = clone(tv1, copy_value=True, cow=True)
+
         tv5 = clone(tv3, copy_value=True)
         assert tv5 == tv3
         assert tv5.a is not tv3.a
@@ -126,3 +168,101 @@ class TestTreeTreeService:
             ('c', 'x',): 2,
             ('c', 'y',): 3,
         }
+
+    @pytest.mark.parametrize('use_pool', [False, True])
+    def test_materialize(self, use_pool):
+        cnt = 0
+
+        def f(x):
+            nonlocal cnt
+            cnt += 1
+            return x * 2
+
+        d = delayed(f, 10)
+        tv1 = TreeValue({
+            'a': delayed(f, 1), 'b': 2,
+            'c': {'x': delayed(f, 3), 'y': d},
+            'd': d,
+            'e': delayed(lambda: TreeValue({'p': delayed(f, 4), 'q': 5})),
+        })
+
+        if use_pool:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                assert materialize(tv1, pool) is tv1
+        else:
+            assert materialize(tv1) is tv1
+
+        assert cnt == 4
+        st = tv1._detach()
+        assert st.detach()['a'] == 2
+        assert st.detach()['c'].detach() == {'x': 6, 'y': 20}
+        assert st.detach()['d'] == 20
+        assert st.detach()['e'].detach() == {'p': 8, 'q': 5}
+        assert tv1 == TreeValue({'a': 2, 'b': 2, 'c': {'x': 6, 'y': 20}, 'd': 20, 'e': {'p': 8, 'q': 5}})
+        assert cnt == 4
+
+    def test_materialize_process_pool(self):
+        d = delayed(_double, 10)
+        tv1 = TreeValue({
+            'a': delayed(_double, 1), 'b': 2,
+            'c': {'x': delayed(_double, delayed(_double, 3)), 'y': d},
+            'd': d,
+        })
+        with ProcessPoolExecutor(max_workers=2) as pool:
+            assert materialize(tv1, pool) is tv1
+
+        st = tv1._detach()
+        assert st.detach()['a'] == 2
+        assert st.detach()['c'].detach() == {'x': 12, 'y': 20}
+        assert st.detach()['d'] == 20
+        assert tv1 == TreeValue({'a': 2, 'b': 2, 'c': {'x': 12, 'y': 20}, 'd': 20})
+
+    def test_materialize_error(self):
+        def f():
+            raise ValueError('error')
+
+        tv1 = TreeValue({'a': delayed(lambda: 1), 'b': delayed(f)})
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            with pytest.raises(ValueError):
+                materialize(tv1, pool)
+
+    def test_materialize_async(self):
+        cnt = 0
+
+        async def f(x):
+            nonlocal cnt
+            cnt += 1
+            await asyncio.sleep(0.1)
+            return x * 2
+
+        d = delayed(f, 10)
+        tv1 = TreeValue({
+            'a': delayed(f, 1), 'b': 2,
+            'c': {'x': delayed(f, 3), 'y': d},
+            'd': d,
+            'e': delayed(lambda: TreeValue({'p': delayed(f, 4), 'q': 5})),
+            'f': delayed(lambda x: x + 1, 7),
+        })
+
+        _start_time = time.time()
+        assert asyncio.run(materialize_async(tv1)) is tv1
+        assert time.time() - _start_time < 0.3  # the leaves are awaited concurrently
+
+        assert cnt == 4
+        st = tv1._detach()
+        assert st.detach()['a'] == 2
+        assert st.detach()['c'].detach() == {'x': 6, 'y': 20}
+        assert st.detach()['d'] == 20
+        assert st.detach()['e'].detach() == {'p': 8, 'q': 5}
+        assert tv1 == TreeValue({
+            'a': 2, 'b': 2, 'c': {'x': 6, 'y': 20}, 'd': 20, 'e': {'p': 8, 'q': 5}, 'f': 8,
+        })
+        assert cnt == 4
+
+    def test_materialize_async_error(self):
+        async def f():
+            raise ValueError('error')
+
+        tv1 = TreeValue({'a': delayed(lambda: 1), 'b': delayed(f)})
+        with pytest.raises(ValueError):
+            asyncio.run(materialize_async(tv1))
@@ -67,6 +67,20 @@ class TestTreeValueBenchmark:
     def test_setattr(self, benchmark, key, data):
         benchmark(setattr, self.__setup_tree(), key, data)
 
+    def test_setattr_nested(self, benchmark):
+        def set_nested(t: TreeValue):
+            t.d.x = 5
+            t.d.y = 6
+            t.a = 7
+
+        benchmark(set_nested, self.__setup_tree())
+
+    def test_set_many(self, benchmark):
+        benchmark(TreeValue.set_many, self.__setup_tree(), {('d', 'x'): 5, ('d', 'y'): 6, ('a',): 7})
+
+    def test_get_many(self, benchmark):
+        benchmark(TreeValue.get_many, self.__setup_tree(), [('d', 'x'), ('d', 'y'), ('a',)])
+
     @pytest.mark.parametrize('key', ['a'])
     def test_delattr_after_setattr(self, benchmark, key):
         def set_and_del(t: TreeValue, k: str):
@@ -58,6 +58,15 @@ class TestTreeUtilsBenchmark:
     def test_reduce(self, benchmark):
         benchmark(reduce_, _TREE_4, lambda **kwargs: sum(kwargs.values()))
 
+    def test_mapping_delayed_chain(self, benchmark):
+        def _chain():
+            t = self.__setup_tree()
+            for _ in range(10):
+                t = mapping(t, _mapping_func_2, delayed=True)
+            return jsonify(t)
+
+        benchmark(_chain)
+
     def test_jsonify(self, benchmark):
         benchmark(jsonify, self.__setup_tree())
 
@@ -115,3 +124,35 @@ class TestTreeUtilsBenchmark:
         }
         tk = subside(original1)
         benchmark(rise, tk)
+
+
+def _deep_chain(depth: int) -> dict:
+    data = {'v': 0}
+    for _ in range(depth):
+        data = {'x': data}
+    return data
+
+
+_DEEP_DATA = _deep_chain(10000)
+_DEEP_TREE = TreeValue(_DEEP_DATA)
+
+
+@pytest.mark.benchmark(group='treevalue_deep')
+class TestTreeDeepBenchmark:
+    def test_init(self, benchmark):
+        benchmark(TreeValue, _DEEP_DATA)
+
+    def test_flatten(self, benchmark):
+        benchmark(flatten, _DEEP_TREE)
+
+    def test_mapping(self, benchmark):
+        benchmark(mapping, _DEEP_TREE, _mapping_func_3)
+
+    def test_jsonify(self, benchmark):
+        benchmark(jsonify, _DEEP_TREE)
+
+    def test_clone(self, benchmark):
+        benchmark(clone, _DEEP_TREE)
+
+    def test_eq(self, benchmark):
+        benchmark(TreeValue.__eq__, _DEEP_TREE, TreeValue(_DEEP_DATA))
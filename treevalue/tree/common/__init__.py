@@ -1,3 +1,5 @@
 from .base import raw, unraw, RawWrapper
-from .delay import DelayedProxy, delayed_partial, undelay, DelayedValueProxy, DelayedFuncProxy
-from .storage import TreeStorage, create_storage
+from .delay import DelayedProxy, delayed_partial, undelay, DelayedValueProxy, DelayedFuncProxy, DelayedAsyncProxy, \
+    async_undelay, enable_delay_stats, get_delay_stats, reset_delay_stats
+from .layout import KeyLayout, get_layout
+from .storage import TreeStorage, FrozenTreeStorage, create_storage
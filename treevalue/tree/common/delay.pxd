@@ -4,6 +4,15 @@
 from libcpp cimport bool
 
 cdef class DelayedProxy:
+    cdef bool _running
+    cdef unsigned long _owner
+    cdef int _waiters
+    cdef object _future
+
+    cdef bool _c_enter(self) except *
+    cdef void _c_exit(self) except *
+    cdef object _c_async_run(self, object calc)
+
     cpdef object value(self)
     cpdef object fvalue(self)
 
@@ -23,5 +32,14 @@ cdef class DelayedFuncProxy(DelayedProxy):
 
     cpdef object value(self)
 
+cdef class DelayedAsyncProxy(DelayedProxy):
+    cdef readonly object func
+    cdef readonly tuple args
+    cdef readonly dict kwargs
+    cdef readonly bool calculated
+    cdef object val
+
+    cpdef object value(self)
+
 cdef DelayedProxy _c_delayed_partial(func, args, kwargs)
 cpdef object undelay(object p, bool is_final= *)
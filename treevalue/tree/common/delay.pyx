@@ -1,14 +1,193 @@
 # distutils:language=c++
 # cython:language_level=3
 
+import asyncio
+from threading import Condition
+from time import perf_counter
+
 import cython
+from cpython.pythread cimport PyThread_get_thread_ident
 from libcpp cimport bool
 
+_CONDITION = Condition()
+
+# statistics of the delayed proxies, only recorded when enabled
+cdef bool _stats_enabled = False
+cdef unsigned long long _stats_created = 0
+cdef unsigned long long _stats_evaluated = 0
+cdef unsigned long long _stats_hits = 0
+cdef double _stats_time = 0.0
+cdef dict _stats_funcs = {}
+
+cdef inline object _c_func_key(object f):
+    # code objects are used as keys, so the closures will not be kept alive
+    try:
+        return f.__code__
+    except AttributeError:
+        return type(f)
+
+cdef inline str _c_func_name(object key):
+    if isinstance(key, type):
+        return f'{key.__module__}.{key.__qualname__}'
+    else:
+        return f'{getattr(key, "co_qualname", key.co_name)} ({key.co_filename}:{key.co_firstlineno})'
+
+cdef inline void _c_stats_record(object f, double t) except *:
+    global _stats_evaluated, _stats_time
+    _stats_evaluated += 1
+    _stats_time += t
+
+    cdef object key = _c_func_key(f)
+    cdef list item = _stats_funcs.get(key)
+    if item is None:
+        _stats_funcs[key] = [1, t]
+    else:
+        item[0] += 1
+        item[1] += t
+
+cdef inline void _c_stats_created():
+    global _stats_created
+    _stats_created += 1
+
+cdef inline void _c_stats_hit():
+    global _stats_hits
+    _stats_hits += 1
+
+cdef object _c_timed_call(object f, tuple args, dict kwargs):
+    cdef double start = perf_counter()
+    cdef object res = f(*args, **kwargs)
+    _c_stats_record(f, perf_counter() - start)
+    return res
+
+async def _a_timed_call(object f, tuple args, dict kwargs):
+    cdef double start = perf_counter()
+    cdef object res = await f(*args, **kwargs)
+    _c_stats_record(f, perf_counter() - start)
+    return res
+
+@cython.binding(True)
+def enable_delay_stats(bool enabled=True):
+    """
+    Overview:
+        Enable or disable the statistics of the delayed proxies. It is disabled by default.
+
+    Arguments:
+        - enabled (:obj:`bool`): Enable or not, default is ``True``.
+
+    .. note::
+        Only the proxies created when it is enabled are counted in ``created``, \
+        and only the calculations run when it is enabled are counted in ``evaluated``.
+    """
+    global _stats_enabled
+    _stats_enabled = enabled
+
+@cython.binding(True)
+def reset_delay_stats():
+    """
+    Overview:
+        Reset the statistics of the delayed proxies to zero.
+    """
+    global _stats_created, _stats_evaluated, _stats_hits, _stats_time, _stats_funcs
+    _stats_created = 0
+    _stats_evaluated = 0
+    _stats_hits = 0
+    _stats_time = 0.0
+    _stats_funcs = {}
+
+@cython.binding(True)
+def get_delay_stats():
+    """
+    Overview:
+        Get the statistics of the delayed proxies.
+
+    Returns:
+        - stats (:obj:`dict`): Statistics, including
+
+            - ``enabled``: The statistics is enabled or not.
+            - ``created``: Count of the created delayed proxies.
+            - ``evaluated``: Count of the calculated delayed proxies.
+            - ``unevaluated``: Count of the created proxies which are not calculated yet.
+            - ``hits``: Count of the value accesses on the already calculated proxies.
+            - ``time``: Total calculation time in seconds.
+            - ``functions``: Calculation count and time of each function, \
+                in the format of ``{name: {'count': count, 'time': time}}``. The python functions are \
+                named with their qualified names and source positions, the other callable objects are \
+                named with their types.
+
+    Examples:
+        >>> from treevalue import TreeValue, delayed
+        >>> from treevalue.tree.common import enable_delay_stats, get_delay_stats
+        >>> enable_delay_stats()
+        >>> t = TreeValue({'a': delayed(lambda: 1), 'b': delayed(lambda: 2)})
+        >>> t.a
+        1
+        >>> get_delay_stats()['evaluated'], get_delay_stats()['unevaluated']
+        (1, 1)
+    """
+    cdef dict funcs = {}
+    cdef object key
+    cdef list item
+    for key, item in _stats_funcs.items():
+        funcs[_c_func_name(key)] = {'count': item[0], 'time': item[1]}
+
+    return {
+        'enabled': _stats_enabled,
+        'created': _stats_created,
+        'evaluated': _stats_evaluated,
+        'unevaluated': _stats_created - _stats_evaluated if _stats_created > _stats_evaluated else 0,
+        'hits': _stats_hits,
+        'time': _stats_time,
+        'functions': funcs,
+    }
+
 cdef class DelayedProxy:
     """
     Overview:
         Base class of all the delayed proxy class.
+
+    .. note::
+        The calculation of the delayed proxies in this module is exactly-once, even when they are \
+        accessed from multiple threads. Only one thread will run the calculation, the others will \
+        wait for its result. No lock is held after the value is calculated.
+
+    .. note::
+        The delayed proxies can also be calculated in the event loop with \
+        :func:`treevalue.tree.common.async_undelay`, the coroutines awaiting the same proxy \
+        will share one calculation.
     """
+    cdef inline bool _c_enter(self) except *:
+        # return true when the calculation should be done by current thread,
+        # otherwise wait until the calculation in other thread is ended
+        cdef unsigned long ident = PyThread_get_thread_ident()
+        if not self._running:
+            self._running = True
+            self._owner = ident
+            return True
+        elif self._owner == ident:  # re-entered in the same thread
+            return True
+        else:
+            self._waiters += 1
+            try:
+                with _CONDITION:
+                    while self._running:
+                        _CONDITION.wait()
+            finally:
+                self._waiters -= 1
+            return False
+
+    cdef inline void _c_exit(self) except *:
+        self._running = False
+        if self._waiters:
+            with _CONDITION:
+                _CONDITION.notify_all()
+
+    cdef object _c_async_run(self, object calc):
+        # share the running calculation between the coroutines,
+        # the ``calc`` coroutine function should reset ``_future`` when it is ended
+        if self._future is None:
+            self._future = asyncio.ensure_future(calc())
+        return asyncio.shield(self._future)
+
     cpdef object value(self):
         r"""
         Overview:
@@ -32,6 +211,30 @@ cdef class DelayedProxy:
         """
         return self.value()
 
+    async def avalue(self):
+        r"""
+        Overview:
+            Get value of the delayed proxy in the event loop.
+            Can be accessed in :func:`treevalue.tree.common.async_undelay` when ``is_final`` is ``False``.
+            The synchronous :meth:`value` is used by default.
+
+        Returns:
+            - value (:obj:`object`): Calculation result.
+        """
+        return self.value()
+
+    async def afvalue(self):
+        r"""
+        Overview:
+            Get value of the delayed proxy in the event loop.
+            Can be accessed in :func:`treevalue.tree.common.async_undelay` when ``is_final`` is ``True``.
+
+        Returns:
+            - value (:obj:`object`): Calculation result.
+        """
+        await self.avalue()
+        return self.fvalue()
+
 cdef class DelayedValueProxy(DelayedProxy):
     """
     Overview:
@@ -45,19 +248,66 @@ cdef class DelayedValueProxy(DelayedProxy):
         Arguments:
             - func (:obj:`object`): Function to be called, which can be called without arguments. \
                 Delayed proxy is supported.
+
+        .. note::
+            The reference of ``func`` will be released after the value is calculated.
         """
         self.func = func
         self.calculated = False
         self.val = None
+        if _stats_enabled:
+            _c_stats_created()
 
     cpdef object value(self):
         cdef object f
+        if _stats_enabled and self.calculated:
+            _c_stats_hit()
+        while not self.calculated:
+            if self._c_enter():
+                try:
+                    f = undelay(self.func, False)
+                    if _stats_enabled:
+                        self.val = _c_timed_call(f, (), {})
+                    else:
+                        self.val = f()
+                    self.calculated = True
+                    self.func = None
+                finally:
+                    self._c_exit()
+
+        return self.val
+
+    async def avalue(self):
         if not self.calculated:
-            f = undelay(self.func, False)
-            self.val = f()
+            await self._c_async_run(self._acalc)
+        elif _stats_enabled:
+            _c_stats_hit()
+        return self.val
+
+    async def _acalc(self):
+        cdef object f
+        try:
+            f = await async_undelay(self.func, False)
+            if _stats_enabled:
+                self.val = _c_timed_call(f, (), {})
+            else:
+                self.val = f()
             self.calculated = True
+            self.func = None
+        finally:
+            self._future = None
 
-        return self.val
+    def __reduce__(self):
+        if self.calculated:
+            return type(self), (None,), (self.val,)
+        else:
+            return type(self), (self.func,)
+
+    def __setstate__(self, tuple state):
+        # only the calculated proxy has state
+        self.val, = state
+        self.calculated = True
+        self.func = None
 
 cdef class DelayedFuncProxy(DelayedProxy):
     """
@@ -74,12 +324,17 @@ cdef class DelayedFuncProxy(DelayedProxy):
                 Delayed proxy is supported.
             - args (:obj:`tuple`): Positional arguments to be used, delayed proxy is supported.
             - kwargs (:obj:`dict`): Key-word arguments to be used, delayed proxy is supported.
+
+        .. note::
+            The references of ``func``, ``args`` and ``kwargs`` will be released after the value is calculated.
         """
         self.func = func
         self.args = args
         self.kwargs = kwargs
         self.calculated = False
         self.val = None
+        if _stats_enabled:
+            _c_stats_created()
 
     cpdef object value(self):
         cdef list pas
@@ -87,20 +342,170 @@ cdef class DelayedFuncProxy(DelayedProxy):
         cdef str key
         cdef object item
         cdef object f
+        if _stats_enabled and self.calculated:
+            _c_stats_hit()
+        while not self.calculated:
+            if self._c_enter():
+                try:
+                    pas = []
+                    pks = {}
+                    f = undelay(self.func, False)
+                    for item in self.args:
+                        pas.append(undelay(item, False))
+                    for key, item in self.kwargs.items():
+                        pks[key] = undelay(item, False)
+
+                    if _stats_enabled:
+                        self.val = _c_timed_call(f, tuple(pas), pks)
+                    else:
+                        self.val = f(*pas, **pks)
+                    self.calculated = True
+                    # release the arguments, so the intermediate values can be collected
+                    self.func = None
+                    self.args = None
+                    self.kwargs = None
+                finally:
+                    self._c_exit()
+
+        return self.val
+
+    async def avalue(self):
         if not self.calculated:
-            pas = []
-            pks = {}
-            f = undelay(self.func, False)
+            await self._c_async_run(self._acalc)
+        elif _stats_enabled:
+            _c_stats_hit()
+        return self.val
+
+    async def _acalc(self):
+        cdef list pas = []
+        cdef dict pks = {}
+        cdef str key
+        cdef object item
+        cdef object f
+        try:
+            f = await async_undelay(self.func, False)
             for item in self.args:
-                pas.append(undelay(item, False))
+                pas.append(await async_undelay(item, False))
             for key, item in self.kwargs.items():
-                pks[key] = undelay(item, False)
+                pks[key] = await async_undelay(item, False)
 
-            self.val = f(*pas, **pks)
+            if _stats_enabled:
+                self.val = _c_timed_call(f, tuple(pas), pks)
+            else:
+                self.val = f(*pas, **pks)
             self.calculated = True
+            self.func = None
+            self.args = None
+            self.kwargs = None
+        finally:
+            self._future = None
+
+    def __reduce__(self):
+        if self.calculated:
+            return type(self), (None, (), {}), (self.val,)
+        else:
+            return type(self), (self.func, self.args, self.kwargs)
+
+    def __setstate__(self, tuple state):
+        # only the calculated proxy has state
+        self.val, = state
+        self.calculated = True
+        self.func = None
+        self.args = None
+        self.kwargs = None
+
+cdef class DelayedAsyncProxy(DelayedProxy):
+    """
+    Overview:
+        Coroutine function delayed proxy.
+    """
+    def __cinit__(self, object func, tuple args, dict kwargs):
+        """
+        Overview:
+            Constructor of class :class:`treevalue.tree.common.DelayedAsyncProxy`.
+
+        Arguments:
+            - func (:obj:`object`): Coroutine function to be called, which can be called with given arguments. \
+                Delayed proxy is supported.
+            - args (:obj:`tuple`): Positional arguments to be used, delayed proxy is supported.
+            - kwargs (:obj:`dict`): Key-word arguments to be used, delayed proxy is supported.
+
+        .. note::
+            When :meth:`value` is used, the coroutine will be run in a new event loop, so it can not be \
+            used when there is a running event loop in current thread. Please use \
+            :func:`treevalue.tree.common.async_undelay` instead in that case.
+
+        .. note::
+            The references of ``func``, ``args`` and ``kwargs`` will be released after the value is calculated.
+        """
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.calculated = False
+        self.val = None
+        if _stats_enabled:
+            _c_stats_created()
 
+    cpdef object value(self):
+        if _stats_enabled and self.calculated:
+            _c_stats_hit()
+        while not self.calculated:
+            if self._c_enter():
+                try:
+                    if asyncio._get_running_loop() is not None:
+                        raise RuntimeError('Async delayed proxy can not be calculated synchronously '
+                                           'in a running event loop, async_undelay should be used.')
+                    asyncio.run(self.avalue())
+                finally:
+                    self._c_exit()
+
+        return self.val
+
+    async def avalue(self):
+        if not self.calculated:
+            await self._c_async_run(self._acalc)
+        elif _stats_enabled:
+            _c_stats_hit()
         return self.val
 
+    async def _acalc(self):
+        cdef list pas = []
+        cdef dict pks = {}
+        cdef str key
+        cdef object item
+        cdef object f
+        try:
+            f = await async_undelay(self.func, False)
+            for item in self.args:
+                pas.append(await async_undelay(item, False))
+            for key, item in self.kwargs.items():
+                pks[key] = await async_undelay(item, False)
+
+            if _stats_enabled:
+                self.val = await _a_timed_call(f, tuple(pas), pks)
+            else:
+                self.val = await f(*pas, **pks)
+            self.calculated = True
+            self.func = None
+            self.args = None
+            self.kwargs = None
+        finally:
+            self._future = None
+
+    def __reduce__(self):
+        if self.calculated:
+            return type(self), (None, (), {}), (self.val,)
+        else:
+            return type(self), (self.func, self.args, self.kwargs)
+
+    def __setstate__(self, tuple state):
+        # only the calculated proxy has state
+        self.val, = state
+        self.calculated = True
+        self.func = None
+        self.args = None
+        self.kwargs = None
+
 cdef inline DelayedProxy _c_delayed_partial(func, args, kwargs):
     if args or kwargs:
         return DelayedFuncProxy(func, args, kwargs)
@@ -140,3 +545,35 @@ cpdef inline object undelay(object p, bool is_final=True):
             return p.value()
     else:
         return p
+
+@cython.binding(True)
+async def async_undelay(object p, bool is_final=True):
+    r"""
+    Overview:
+        Get the value of a given object in the event loop, it can be a delayed proxy, a simple object or \
+            a nested delayed proxy. The coroutine functions in :class:`DelayedAsyncProxy` are awaited \
+            without blocking the event loop.
+
+    Arguments:
+        - p (:obj:`object`): Given object to be undelay.
+        - is_final (:obj:`bool`): Is final value getting or not, default is ``True``.
+
+    Returns:
+        - value (:obj:`object): Actual value of the given ``p``.
+
+    Examples:
+        >>> import asyncio
+        >>> from treevalue.tree.common import DelayedAsyncProxy, async_undelay
+        >>> async def f(x):
+        ...     await asyncio.sleep(0.1)
+        ...     return x * 2
+        >>> asyncio.run(async_undelay(DelayedAsyncProxy(f, (2,), {})))
+        4
+    """
+    if isinstance(p, DelayedProxy):
+        if is_final:
+            return await p.afvalue()
+        else:
+            return await p.avalue()
+    else:
+        return p
@@ -0,0 +1,18 @@
+# distutils:language=c++
+# cython:language_level=3
+
+cimport cython
+
+@cython.final
+cdef class KeyLayout:
+    cdef readonly tuple keys
+    cdef frozenset _keyset
+    cdef dict _intersection_cache
+    cdef dict _union_cache
+    cdef object __weakref__
+
+    cdef frozenset _c_get_keyset(self)
+    cpdef public KeyLayout intersection(self, KeyLayout other)
+    cpdef public KeyLayout union(self, KeyLayout other)
+
+cpdef public KeyLayout get_layout(tuple keys)
@@ -0,0 +1,123 @@
+# distutils:language=c++
+# cython:language_level=3
+
+from weakref import WeakValueDictionary
+
+import cython
+
+_LAYOUTS = WeakValueDictionary()
+cdef int _CACHE_SIZE = 64
+
+@cython.final
+cdef class KeyLayout:
+    """
+    Overview:
+        Interned key layout of storages.
+        The storages with the same keys (in the same order) share one layout object, \
+        so their key sets can be compared by identity.
+
+    .. note::
+        Please use :func:`get_layout` to get the layout object, do not instantiate it directly.
+    """
+
+    def __cinit__(self, tuple keys):
+        self.keys = keys
+        self._keyset = None
+        self._intersection_cache = {}
+        self._union_cache = {}
+
+    cdef frozenset _c_get_keyset(self):
+        # the key set is only built when needed, for most of the layouts it is never used
+        if self._keyset is None:
+            self._keyset = frozenset(self.keys)
+        return self._keyset
+
+    @property
+    def keyset(self):
+        """
+        Overview:
+            Set of the keys, built on first access.
+        """
+        return self._c_get_keyset()
+
+    cpdef public KeyLayout intersection(self, KeyLayout other):
+        """
+        Overview:
+            Get the layout of the common keys, in the order of current layout.
+            The result is cached, so it will not be calculated again for the same layouts.
+
+        Arguments:
+            - other (:obj:`KeyLayout`): Another layout.
+
+        Returns:
+            - layout (:obj:`KeyLayout`): Intersection layout.
+        """
+        if other is self:
+            return self
+
+        cdef KeyLayout result
+        cdef object key
+        try:
+            return self._intersection_cache[other]
+        except KeyError:
+            result = get_layout(tuple([key for key in self.keys if key in other._c_get_keyset()]))
+            if len(self._intersection_cache) >= _CACHE_SIZE:
+                self._intersection_cache.clear()
+            self._intersection_cache[other] = result
+            return result
+
+    cpdef public KeyLayout union(self, KeyLayout other):
+        """
+        Overview:
+            Get the layout of all the keys, the keys of current layout are placed first, \
+            followed by the other keys in the order of ``other``.
+            The result is cached, so it will not be calculated again for the same layouts.
+
+        Arguments:
+            - other (:obj:`KeyLayout`): Another layout.
+
+        Returns:
+            - layout (:obj:`KeyLayout`): Union layout.
+        """
+        if other is self:
+            return self
+
+        cdef KeyLayout result
+        cdef object key
+        try:
+            return self._union_cache[other]
+        except KeyError:
+            result = get_layout(self.keys + tuple([key for key in other.keys if key not in self._c_get_keyset()]))
+            if len(self._union_cache) >= _CACHE_SIZE:
+                self._union_cache.clear()
+            self._union_cache[other] = result
+            return result
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} at {hex(id(self))}, keys: {self.keys!r}>'
+
+    def __reduce__(self):
+        return get_layout, (self.keys,)
+
+@cython.binding(True)
+cpdef inline KeyLayout get_layout(tuple keys):
+    """
+    Overview:
+        Get the interned layout of the given keys.
+
+    Arguments:
+        - keys (:obj:`tuple`): Keys in order.
+
+    Returns:
+        - layout (:obj:`KeyLayout`): Layout object, the same object will be returned for the same keys.
+    """
+    cdef KeyLayout layout
+    try:
+        return _LAYOUTS[keys]
+    except KeyError:
+        layout = KeyLayout(keys)
+        _LAYOUTS[keys] = layout
+        return layout
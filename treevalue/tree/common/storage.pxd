@@ -2,14 +2,22 @@
 # cython:language_level=3
 
 from libcpp cimport bool
+from libcpp.vector cimport vector
 cimport cython
 
+from .layout cimport KeyLayout
+
 ctypedef unsigned char boolean
 ctypedef unsigned int uint
 
+cdef class FrozenTreeStorage
+
 @cython.final
 cdef class TreeStorage:
     cdef readonly dict map
+    cdef KeyLayout _layout
+
+    cdef TreeStorage _c_fork(self)
 
     cpdef public void set(self, str key, object value) except *
     cpdef public object setdefault(self, str key, object default)
@@ -19,6 +27,9 @@ cdef class TreeStorage:
     cpdef public object pop_or_default(self, str key, object default)
     cpdef public tuple popitem(self)
     cpdef public void del_(self, str key) except *
+    cpdef public list get_many(self, object paths)
+    cpdef public void set_many(self, dict values) except *
+    cpdef public void del_many(self, object paths) except *
     cpdef public void clear(self)
     cpdef public boolean contains(self, str key)
     cpdef public uint size(self)
@@ -28,14 +39,60 @@ cdef class TreeStorage:
     cpdef public dict deepdumpx(self, copy_func)
     cpdef public dict jsondumpx(self, copy_func, bool need_raw, bool allow_delayed)
     cpdef public TreeStorage copy(self)
+    cpdef public TreeStorage cowcopy(self)
     cpdef public TreeStorage deepcopy(self)
     cpdef public TreeStorage deepcopyx(self, copy_func, bool allow_delayed)
     cpdef public dict detach(self)
+    cpdef public KeyLayout layout(self)
     cpdef public void copy_from(self, TreeStorage ts)
     cpdef public void deepcopy_from(self, TreeStorage ts)
     cpdef public void deepcopyx_from(self, TreeStorage ts, copy_func, bool allow_delayed)
+    cpdef public FrozenTreeStorage freeze(self)
+
+@cython.final
+cdef class FrozenTreeStorage:
+    cdef readonly dict map
+    cdef object _hash
+
+    cpdef public FrozenTreeStorage set(self, str key, object value)
+    cpdef public FrozenTreeStorage del_(self, str key)
+    cpdef public object get(self, str key)
+    cpdef public object get_or_default(self, str key, object default)
+    cpdef public boolean contains(self, str key)
+    cpdef public uint size(self)
+    cpdef public boolean empty(self)
+    cpdef public FrozenTreeStorage set_path(self, tuple path, object value)
+    cpdef public FrozenTreeStorage del_path(self, tuple path)
+    cpdef public object get_path(self, tuple path)
+    cpdef public dict jsondumpx(self, copy_func, bool need_raw)
+    cpdef public TreeStorage thaw(self)
+
+ctypedef enum _e_walk_event:
+    WALK_END
+    WALK_ENTER
+    WALK_LEAF
+    WALK_EXIT
+
+@cython.final
+cdef class StorageWalker:
+    cdef list _datas
+    cdef list _keys
+    cdef vector[Py_ssize_t] _poses
+    cdef list _path
+    cdef bool _undelay
+    cdef bool _sort
+    cdef TreeStorage _pending
+    cdef readonly str key
+    cdef readonly object value
+
+    cdef void _c_push(self, dict data) except *
+    cdef _e_walk_event c_next(self) except *
+    cdef void c_skip(self)
+    cdef tuple c_path(self)
 
 cpdef public object create_storage(dict value)
+cdef TreeStorage _c_path_parent(list nodes, list prefix, tuple path, bool create)
+cdef object _c_frozen_value(object value)
 cdef object _c_undelay_data(dict data, object k, object v)
 cdef object _c_undelay_not_none_data(dict data, object k, object v)
 cdef object _c_undelay_check_data(dict data, object k, object v)
@@ -2,12 +2,17 @@
 # cython:language_level=3
 
 from copy import deepcopy
+from operator import itemgetter
+
 cimport cython
+from cpython.dict cimport PyDict_Next
+from cpython.object cimport PyObject
 
 from libcpp cimport bool
 
 from .base cimport raw, unraw
 from .delay cimport undelay
+from .layout cimport KeyLayout, get_layout
 
 cdef inline object _keep_object(object obj):
     return obj
@@ -16,10 +21,35 @@ cdef inline object _keep_object(object obj):
 cdef class TreeStorage:
     def __cinit__(self, dict map_):
         self.map = map_
+        self._layout = None
 
     def __getnewargs_ex__(self):  # for __cinit__, when pickle.loads
         return ({},), {}
 
+    cdef TreeStorage _c_fork(self):
+        # the nodes are copied and the values are shared, the original storages are not changed,
+        # so the child storages held before are still connected to the original tree
+        cdef TreeStorage root = TreeStorage(self.map.copy())
+        root._layout = self._layout
+
+        cdef list stack = [root]
+        cdef TreeStorage node, child
+        cdef dict _map
+        cdef str k
+        cdef object v
+        while stack:
+            node = stack.pop()
+            _map = node.map
+            for k, v in _map.items():
+                if isinstance(v, TreeStorage):
+                    child = TreeStorage((<TreeStorage>v).map.copy())
+                    child._layout = (<TreeStorage>v)._layout
+                    # only the value is replaced, the size of the map is not changed
+                    _map[k] = child
+                    stack.append(child)
+
+        return root
+
     cpdef public inline void set(self, str key, object value) except *:
         """
         Set value of given ``key`` in this storage object.
@@ -28,6 +58,8 @@ cdef class TreeStorage:
         :param value: Value of the target item, should be a native object, raw wrapped object or \\
             a delayed object.
         """
+        if self._layout is not None and key not in self.map:
+            self._layout = None
         self.map[key] = unraw(value)
 
     cpdef public inline object setdefault(self, str key, object default):
@@ -45,6 +77,7 @@ cdef class TreeStorage:
         except KeyError:
             df = unraw(default)
             self.map[key] = df
+            self._layout = None
             return _c_undelay_data(self.map, key, df)
 
     # get and get_or_default is designed separately due to the consideration of performance
@@ -82,6 +115,7 @@ cdef class TreeStorage:
         :return: Value of the item.
         :raise KeyError: When ``key`` is not exist, raise ``KeyError``.
         """
+        self._layout = None
         return undelay(self.map.pop(key))
 
     cpdef public inline object pop_or_default(self, str key, object default):
@@ -92,6 +126,8 @@ cdef class TreeStorage:
         :param default: Default value of the item.
         :return: Value of the item if ``key`` is exist, otherwise return ``default``.
         """
+        if key in self.map:
+            self._layout = None
         return undelay(self.map.pop(key, default))
 
     cpdef public inline tuple popitem(self):
@@ -104,6 +140,7 @@ cdef class TreeStorage:
         cdef str k
         cdef object v
         k, v = self.map.popitem()
+        self._layout = None
         return k, undelay(v)
 
     cpdef public inline void del_(self, str key) except *:
@@ -114,12 +151,88 @@ cdef class TreeStorage:
         :raise KeyError: When ``key`` is not exist, raise ``KeyError``.
         """
         del self.map[key]
+        self._layout = None
+
+    cpdef public list get_many(self, object paths):
+        """
+        Get values of the given ``paths``.
+        The nodes on the common prefixes of the adjacent paths are only located once, \\
+        so it is recommended to put the paths with the same prefix together.
+
+        :param paths: Paths of the items, should be an iterable object of tuples of strings.
+        :return: List of the values, in the order of ``paths``.
+        :raise KeyError: When any of the paths is not exist, raise ``KeyError``.
+        """
+        cdef list result = []
+        cdef list nodes = [self]
+        cdef list prefix = []
+
+        cdef tuple path
+        cdef TreeStorage node
+        for path in paths:
+            if not path:
+                result.append(self)
+                continue
+
+            node = _c_path_parent(nodes, prefix, path, False)
+            if path[-1] not in node.map:
+                raise KeyError(path)
+            result.append(node.get(path[-1]))
+
+        return result
+
+    cpdef public void set_many(self, dict values) except *:
+        """
+        Set values of multiple paths, the missing nodes on the paths will be created.
+        The nodes on the common prefixes of the adjacent paths are only located once, \\
+        so it is recommended to put the paths with the same prefix together.
+
+        :param values: Dict of the paths and values, the paths should be non-empty tuples of strings.
+        :raise TypeError: When there is a non-storage value on the paths, raise ``TypeError``.
+        """
+        cdef list nodes = [self]
+        cdef list prefix = []
+
+        cdef tuple path
+        cdef object value
+        cdef TreeStorage node
+        for path, value in values.items():
+            if not path:
+                raise ValueError('Path should not be empty.')
+
+            node = _c_path_parent(nodes, prefix, path, True)
+            node.set(path[-1], value)
+
+    cpdef public void del_many(self, object paths) except *:
+        """
+        Delete the items of the given ``paths``.
+        The nodes on the common prefixes of the adjacent paths are only located once, \\
+        so it is recommended to put the paths with the same prefix together.
+
+        :param paths: Paths of the items, should be an iterable object of non-empty tuples of strings.
+        :raise KeyError: When any of the paths is not exist, raise ``KeyError``. \\
+            The items before it will still be deleted.
+        """
+        cdef list nodes = [self]
+        cdef list prefix = []
+
+        cdef tuple path
+        cdef TreeStorage node
+        for path in paths:
+            if not path:
+                raise ValueError('Path should not be empty.')
+
+            node = _c_path_parent(nodes, prefix, path, False)
+            if path[-1] not in node.map:
+                raise KeyError(path)
+            node.del_(path[-1])
 
     cpdef public inline void clear(self):
         """
         Clear all the items in current storage.
         """
         self.map.clear()
+        self._layout = None
 
     cpdef public inline boolean contains(self, str key):
         """
@@ -157,25 +270,49 @@ cdef class TreeStorage:
 
     cpdef public dict jsondumpx(self, copy_func, bool need_raw, bool allow_delayed):
         cdef dict result = {}
-        cdef str k
-        cdef object v, obj, nv
-        for k, v in self.map.items():
-            if not allow_delayed:
-                v = _c_undelay_data(self.map, k, v)
-
-            if isinstance(v, TreeStorage):
-                result[k] = v.jsondumpx(copy_func, need_raw, allow_delayed)
-            else:
-                obj = copy_func(v) if not allow_delayed else v
+        cdef dict current = result
+        cdef dict child
+        cdef list stack = []
+        cdef StorageWalker walker = StorageWalker(self, not allow_delayed, False, ())
+
+        cdef _e_walk_event event
+        cdef object obj
+        while True:
+            event = walker.c_next()
+            if event == WALK_LEAF:
+                obj = copy_func(walker.value) if not allow_delayed else walker.value
                 if need_raw:
                     obj = raw(obj)
-                result[k] = obj
+                current[walker.key] = obj
+            elif event == WALK_ENTER:
+                child = {}
+                current[walker.key] = child
+                stack.append(current)
+                current = child
+            elif event == WALK_EXIT:
+                current = stack.pop()
+            else:
+                break
 
         return result
 
     cpdef public TreeStorage copy(self):
         return self.deepcopyx(_keep_object, True)
 
+    cpdef public TreeStorage cowcopy(self):
+        """
+        Create a structural copy of current storage.
+        Only the nodes are copied, the values (including the delayed ones) are shared without \\
+        being dumped and rebuilt, so it is much faster than :meth:`copy` on large trees.
+
+        :return: Copied storage, the values will not be copied, just like :meth:`copy`.
+
+        .. note::
+            The original storage is not changed, the child storages held before are still \\
+            connected to the original tree, and the modifications of them are not visible in the copy.
+        """
+        return self._c_fork()
+
     cpdef public TreeStorage deepcopy(self):
         return self.deepcopyx(deepcopy, False)
 
@@ -185,6 +322,33 @@ cdef class TreeStorage:
     cpdef public dict detach(self):
         return self.map
 
+    cpdef public KeyLayout layout(self):
+        """
+        Get the key layout of current storage.
+        The layout is interned and cached, the storages with the same keys share one layout object.
+
+        :return: A :class:`treevalue.tree.common.KeyLayout` object.
+
+        .. note::
+            The cached layout is checked against the current keys, \\
+            so it is still correct after the keys of the dict returned by :meth:`detach` are changed.
+        """
+        cdef tuple keys
+        cdef Py_ssize_t i
+        if self._layout is not None:
+            keys = self._layout.keys
+            if len(keys) == len(self.map):
+                i = 0
+                for k in self.map:
+                    if k != keys[i]:
+                        break
+                    i += 1
+                else:
+                    return self._layout
+
+        self._layout = get_layout(tuple(self.map.keys()))
+        return self._layout
+
     cpdef public void copy_from(self, TreeStorage ts):
         self.deepcopyx_from(ts, _keep_object, True)
 
@@ -192,38 +356,79 @@ cdef class TreeStorage:
         self.deepcopyx_from(ts, deepcopy, False)
 
     cpdef public void deepcopyx_from(self, TreeStorage ts, copy_func, bool allow_delayed):
-        cdef dict detached = ts.detach()
-        cdef set keys = set(self.map.keys()) | set(detached.keys())
+        # pairs of (target, source), the nodes are independent of each other, so the order does not matter
+        cdef list stack = [(self, ts)]
 
+        cdef TreeStorage dst, src
+        cdef dict detached
+        cdef set keys
         cdef str k
-        cdef object v, nv
+        cdef object v
         cdef TreeStorage newv
-        for k in keys:
-            if k in detached:
-                v = detached[k]
-                if not allow_delayed:
-                    v = _c_undelay_data(detached, k, v)
-
-                if isinstance(v, TreeStorage):
-                    if k in self.map and isinstance(self.map[k], TreeStorage):
-                        self.map[k].deepcopyx_from(v, copy_func, allow_delayed)
-                    else:
-                        newv = TreeStorage({})
-                        newv.deepcopyx_from(v, copy_func, allow_delayed)
-                        self.map[k] = newv
-                else:
+        while stack:
+            dst, src = stack.pop()
+            dst._layout = None
+
+            detached = src.map
+            keys = set(dst.map.keys()) | set(detached.keys())
+            for k in keys:
+                if k in detached:
+                    v = detached[k]
                     if not allow_delayed:
-                        self.map[k] = copy_func(v)
+                        v = _c_undelay_data(detached, k, v)
+
+                    if isinstance(v, TreeStorage):
+                        if k in dst.map and isinstance(dst.map[k], TreeStorage):
+                            newv = dst.map[k]
+                        else:
+                            newv = TreeStorage({})
+                            dst.map[k] = newv
+                        stack.append((newv, v))
                     else:
-                        self.map[k] = v
+                        if not allow_delayed:
+                            dst.map[k] = copy_func(v)
+                        else:
+                            dst.map[k] = v
+                else:
+                    del dst.map[k]
+
+    cpdef public FrozenTreeStorage freeze(self):
+        """
+        Get the frozen (immutable) copy of current storage.
+        The delayed values will be calculated when freezing.
+
+        :return: A :class:`FrozenTreeStorage` object.
+        """
+        cdef dict result = {}
+        cdef dict current = result
+        cdef dict child
+        cdef list stack = []
+        cdef StorageWalker walker = StorageWalker(self, True, False, ())
+
+        cdef _e_walk_event event
+        while True:
+            event = walker.c_next()
+            if event == WALK_LEAF:
+                current[walker.key] = walker.value
+            elif event == WALK_ENTER:
+                # the hash value is calculated lazily, so the frozen child can be filled after created
+                child = {}
+                current[walker.key] = FrozenTreeStorage(child)
+                stack.append(current)
+                current = child
+            elif event == WALK_EXIT:
+                current = stack.pop()
             else:
-                del self.map[k]
+                break
+
+        return FrozenTreeStorage(result)
 
     def __getstate__(self):
         return self.map
 
     def __setstate__(self, state):
         self.map = state
+        self._layout = None
 
     def __repr__(self):
         cdef tuple keys = tuple(sorted(self.map.keys()))
@@ -236,26 +441,35 @@ cdef class TreeStorage:
         if type(self) != type(other):
             return False
 
-        cdef list self_keys = sorted(self.map.keys())
-        cdef dict other_map = other.detach()
-        cdef list other_keys = sorted(other.detach().keys())
+        cdef list stack = [(self.map, (<TreeStorage>other).map)]
+        cdef dict self_map, other_map
+        cdef list self_keys, other_keys
 
         cdef str key
-        cdef object self_v, self_nv
-        cdef object other_v, other_nv
-        if self_keys == other_keys:
+        cdef object self_v, other_v
+        while stack:
+            self_map, other_map = stack.pop()
+            self_keys = sorted(self_map.keys())
+            other_keys = sorted(other_map.keys())
+            if self_keys != other_keys:
+                return False
+
             for key in self_keys:
-                self_v = self.map[key]
-                self_v = _c_undelay_data(self.map, key, self_v)
+                self_v = self_map[key]
+                self_v = _c_undelay_data(self_map, key, self_v)
 
                 other_v = other_map[key]
                 other_v = _c_undelay_data(other_map, key, other_v)
 
-                if self_v != other_v:
+                if isinstance(self_v, TreeStorage) and isinstance(other_v, TreeStorage):
+                    if self_v is not other_v:
+                        stack.append(((<TreeStorage>self_v).map, (<TreeStorage>other_v).map))
+                elif isinstance(self_v, TreeStorage) or isinstance(other_v, TreeStorage):
+                    return False
+                elif self_v != other_v:
                     return False
-            return True
-        else:
-            return False
+
+        return True
 
     def __hash__(self):
         cdef str k
@@ -327,17 +541,489 @@ cdef class TreeStorage:
             yield k, _c_undelay_data(self.map, k, v)
 
 
+@cython.final
+cdef class FrozenTreeStorage:
+    """
+    Immutable version of :class:`TreeStorage`.
+    The updating methods return new storages, in which the unchanged child storages are shared \\
+    with the original one, and the hash value is calculated only once.
+    """
+
+    def __cinit__(self, dict map_):
+        self.map = map_
+        self._hash = None
+
+    def __reduce__(self):
+        return FrozenTreeStorage, (self.map,)
+
+    cpdef public FrozenTreeStorage set(self, str key, object value):
+        """
+        Get a new storage with value of given ``key`` replaced.
+
+        :param key: Key of the target item, should be a string.
+        :param value: Value of the target item, :class:`TreeStorage` object will be frozen, and delayed \\
+            object will be calculated.
+        :return: New storage object, current storage will not be changed.
+        """
+        cdef dict _map = self.map.copy()
+        _map[key] = _c_frozen_value(value)
+        return FrozenTreeStorage(_map)
+
+    cpdef public FrozenTreeStorage del_(self, str key):
+        """
+        Get a new storage with the item of given ``key`` deleted.
+
+        :param key: Key of the item.
+        :return: New storage object, current storage will not be changed.
+        :raise KeyError: When ``key`` is not exist, raise ``KeyError``.
+        """
+        cdef dict _map = self.map.copy()
+        del _map[key]
+        return FrozenTreeStorage(_map)
+
+    cpdef public object get(self, str key):
+        """
+        Get value of the given ``key``.
+
+        :param key: Key of the item.
+        :return: Value of the item.
+        :raise KeyError: When ``key`` is not exist, raise ``KeyError``.
+        """
+        return self.map[key]
+
+    cpdef public object get_or_default(self, str key, object default):
+        """
+        Get value of the given ``key``, return ``default`` when not exist.
+
+        :param key: Key of the item.
+        :param default: Default value of the item.
+        :return: Value of the item if ``key`` is exist, otherwise return ``default``.
+        """
+        return self.map.get(key, default)
+
+    cpdef public boolean contains(self, str key):
+        """
+        Return true if ``key`` is exist in current storage, otherwise return false.
+
+        :param key: Key.
+        :return: ``key`` is exist or not.
+        """
+        return key in self.map
+
+    cpdef public uint size(self):
+        """
+        Return the size of the current storage.
+
+        :return: Size of current storage.
+        """
+        return len(self.map)
+
+    cpdef public boolean empty(self):
+        """
+        Return true if current storage is empty (size is 0), otherwise return false.
+
+        :return: Empty or not.
+        """
+        return not self.map
+
+    cpdef public FrozenTreeStorage set_path(self, tuple path, object value):
+        """
+        Get a new storage with the value on given ``path`` replaced. Only the nodes on the ``path`` \\
+        will be copied, the missing nodes will be created.
+
+        :param path: Path of the item, should be a non-empty tuple of strings.
+        :param value: Value of the item, similar to ``value`` in method :meth:`set`.
+        :return: New storage object, current storage will not be changed.
+        :raise TypeError: When there is a non-storage value on the ``path``, raise ``TypeError``.
+        """
+        if not path:
+            raise ValueError('Path should not be empty.')
+
+        cdef list nodes = []
+        cdef FrozenTreeStorage node = self
+        cdef int i
+        cdef object child
+        for i in range(len(path) - 1):
+            nodes.append(node)
+            if path[i] in node.map:
+                child = node.map[path[i]]
+                if not isinstance(child, FrozenTreeStorage):
+                    raise TypeError(f'Storage expected at {path[:i + 1]!r}, but {type(child).__name__!r} found.')
+                node = child
+            else:
+                node = FrozenTreeStorage({})
+        nodes.append(node)
+
+        cdef object result = _c_frozen_value(value)
+        cdef dict _map
+        for i in range(len(path) - 1, -1, -1):
+            _map = (<FrozenTreeStorage>nodes[i]).map.copy()
+            _map[path[i]] = result
+            result = FrozenTreeStorage(_map)
+
+        return result
+
+    cpdef public FrozenTreeStorage del_path(self, tuple path):
+        """
+        Get a new storage with the item on given ``path`` deleted. Only the nodes on the ``path`` \\
+        will be copied.
+
+        :param path: Path of the item, should be a non-empty tuple of strings.
+        :return: New storage object, current storage will not be changed.
+        :raise KeyError: When ``path`` is not exist, raise ``KeyError``.
+        """
+        if not path:
+            raise ValueError('Path should not be empty.')
+
+        cdef list nodes = []
+        cdef object node = self
+        cdef int i
+        for i in range(len(path)):
+            if not isinstance(node, FrozenTreeStorage) or path[i] not in (<FrozenTreeStorage>node).map:
+                raise KeyError(path)
+            nodes.append(node)
+            node = (<FrozenTreeStorage>node).map[path[i]]
+
+        cdef dict _map = (<FrozenTreeStorage>nodes[-1]).map.copy()
+        del _map[path[-1]]
+        cdef object result = FrozenTreeStorage(_map)
+        for i in range(len(path) - 2, -1, -1):
+            _map = (<FrozenTreeStorage>nodes[i]).map.copy()
+            _map[path[i]] = result
+            result = FrozenTreeStorage(_map)
+
+        return result
+
+    cpdef public object get_path(self, tuple path):
+        """
+        Get value on the given ``path``.
+
+        :param path: Path of the item, should be a tuple of strings.
+        :return: Value of the item.
+        :raise KeyError: When ``path`` is not exist, raise ``KeyError``.
+        """
+        cdef object node = self
+        cdef str key
+        for key in path:
+            if not isinstance(node, FrozenTreeStorage) or key not in (<FrozenTreeStorage>node).map:
+                raise KeyError(path)
+            node = (<FrozenTreeStorage>node).map[key]
+
+        return node
+
+    cpdef public dict jsondumpx(self, copy_func, bool need_raw):
+        cdef dict result = {}
+        # pairs of (source map, target dict), the child dicts are placed before filled to keep the order
+        cdef list stack = [(self.map, result)]
+
+        cdef dict src, dst, newmap
+        cdef str k
+        cdef object v, obj
+        while stack:
+            src, dst = stack.pop()
+            for k, v in src.items():
+                if isinstance(v, FrozenTreeStorage):
+                    newmap = {}
+                    dst[k] = newmap
+                    stack.append(((<FrozenTreeStorage>v).map, newmap))
+                else:
+                    obj = copy_func(v)
+                    if need_raw:
+                        obj = raw(obj)
+                    dst[k] = obj
+
+        return result
+
+    cpdef public TreeStorage thaw(self):
+        """
+        Get the mutable copy of current storage.
+
+        :return: A :class:`TreeStorage` object.
+        """
+        cdef dict _map = {}
+        cdef TreeStorage result = TreeStorage(_map)
+        # pairs of (source map, target map), the child storages are placed before filled to keep the order
+        cdef list stack = [(self.map, _map)]
+
+        cdef dict src, dst, newmap
+        cdef str k
+        cdef object v
+        while stack:
+            src, dst = stack.pop()
+            for k, v in src.items():
+                if isinstance(v, FrozenTreeStorage):
+                    newmap = {}
+                    dst[k] = TreeStorage(newmap)
+                    stack.append(((<FrozenTreeStorage>v).map, newmap))
+                else:
+                    dst[k] = v
+
+        return result
+
+    def __repr__(self):
+        cdef tuple keys = tuple(sorted(self.map.keys()))
+        cdef str clsname = self.__class__.__name__
+        return f'<{clsname} at {hex(id(self))}, keys: {repr(keys)}>'
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if type(self) != type(other):
+            return False
+
+        cdef list stack = [(self, other)]
+        cdef FrozenTreeStorage fself, fother
+        cdef str key
+        cdef object self_v, other_v
+        while stack:
+            fself, fother = stack.pop()
+            if fself._hash is not None and fother._hash is not None and fself._hash != fother._hash:
+                return False
+            if fself.map.keys() != fother.map.keys():
+                return False
+
+            for key, self_v in fself.map.items():
+                other_v = fother.map[key]
+                if self_v is other_v:
+                    continue
+                elif isinstance(self_v, FrozenTreeStorage) and isinstance(other_v, FrozenTreeStorage):
+                    stack.append((self_v, other_v))
+                elif isinstance(self_v, FrozenTreeStorage) or isinstance(other_v, FrozenTreeStorage):
+                    return False
+                elif self_v != other_v:
+                    return False
+
+        return True
+
+    def __hash__(self):
+        if self._hash is not None:
+            return self._hash
+
+        # the hash values of the child storages are calculated first, so the deep trees need no recursion
+        cdef list stack = [(self, False)]
+        cdef FrozenTreeStorage node
+        cdef bool ready
+        cdef object v
+        while stack:
+            node, ready = stack.pop()
+            if ready:
+                node._hash = hash(tuple(sorted(node.map.items(), key=itemgetter(0))))
+            elif node._hash is None:
+                stack.append((node, True))
+                for v in node.map.values():
+                    if isinstance(v, FrozenTreeStorage) and (<FrozenTreeStorage>v)._hash is None:
+                        stack.append((v, False))
+
+        return self._hash
+
+    def iter_keys(self):
+        """
+        Iterate keys in current storage.
+
+        :return: Iterator of current keys in normal order.
+        """
+        return self.map.keys()
+
+    def iter_rev_keys(self):
+        """
+        Reversely iterate keys in current storage.
+
+        :return: Iterator of current keys in reversed order.
+        """
+        return reversed(self.map.keys())
+
+    def iter_values(self):
+        """
+        Iterate values in current storage.
+
+        :return: Iterator of current values in normal order.
+        """
+        return self.map.values()
+
+    def iter_rev_values(self):
+        """
+        Reversely iterate values in current storage.
+
+        :return: Iterator of current values in reversed order.
+        """
+        return reversed(self.map.values())
+
+    def iter_items(self):
+        """
+        Iterate items in current storage.
+
+        :return: Iterator of current items in normal order.
+        """
+        return self.map.items()
+
+    def iter_rev_items(self):
+        """
+        Reversely iterate items in current storage.
+
+        :return: Iterator of current items in reversed order.
+        """
+        return reversed(self.map.items())
+
+cdef inline TreeStorage _c_path_parent(list nodes, list prefix, tuple path, bool create):
+    # nodes[i] is the storage on prefix[:i], the common prefix of the previous path and current path is reused
+    cdef Py_ssize_t n = len(path) - 1
+    cdef Py_ssize_t i = 0
+    cdef Py_ssize_t m = len(prefix)
+    if m > n:
+        m = n
+    while i < m and prefix[i] == path[i]:
+        i += 1
+    if i < len(prefix):
+        del prefix[i:]
+        del nodes[i + 1:]
+
+    cdef TreeStorage node = nodes[-1]
+    cdef str key
+    cdef object child
+    while i < n:
+        key = path[i]
+        if key in node.map:
+            child = node.get(key)
+            if not isinstance(child, TreeStorage):
+                if create:
+                    raise TypeError(f'Storage expected at {path[:i + 1]!r}, but {type(child).__name__!r} found.')
+                else:
+                    raise KeyError(path)
+        elif create:
+            child = TreeStorage({})
+            node.set(key, child)
+        else:
+            raise KeyError(path)
+
+        node = child
+        nodes.append(node)
+        prefix.append(key)
+        i += 1
+
+    return node
+
+cdef inline object _c_frozen_value(object value):
+    cdef object v = unraw(undelay(value))
+    if isinstance(v, TreeStorage):
+        return v.freeze()
+    else:
+        return v
+
+@cython.final
+cdef class StorageWalker:
+    """
+    Iterative depth-first walker of storages, used as the traversal core instead of recursion.
+    The nodes are visited in the same order as the recursive traversal, so the deep trees \\
+    can be processed without the limit of recursion, and the path is maintained in one buffer \\
+    instead of being copied on each level.
+    """
+
+    def __cinit__(self, TreeStorage root, bool undelay, bool sort, tuple path):
+        self._datas = []
+        self._keys = [] if sort else None
+        self._path = list(path)
+        self._undelay = undelay
+        self._sort = sort
+        self._pending = None
+        self.key = None
+        self.value = None
+        self._c_push(root.map)
+
+    cdef inline void _c_push(self, dict data) except *:
+        self._datas.append(data)
+        if self._sort:
+            self._keys.append(sorted(data.keys()))
+        self._poses.push_back(0)
+
+    cdef _e_walk_event c_next(self) except *:
+        # enter the pending child storage first, unless it is skipped
+        if self._pending is not None:
+            self._path.append(self.key)
+            self._c_push(self._pending.map)
+            self._pending = None
+
+        cdef dict data
+        cdef list keys
+        cdef Py_ssize_t pos
+        cdef PyObject *pk
+        cdef PyObject *pv
+        cdef str k
+        cdef object v
+        cdef bool found
+        while not self._poses.empty():
+            data = self._datas[-1]
+            pos = self._poses.back()
+            found = False
+            if self._sort:
+                keys = self._keys[-1]
+                if pos < len(keys):
+                    k = keys[pos]
+                    v = data[k]
+                    pos += 1
+                    found = True
+            elif PyDict_Next(data, &pos, &pk, &pv):
+                k = <str>pk
+                v = <object>pv
+                found = True
+
+            if found:
+                self._poses[self._poses.size() - 1] = pos
+                if self._undelay:
+                    v = _c_undelay_data(data, k, v)
+                self.key = k
+                self.value = v
+                if isinstance(v, TreeStorage):
+                    self._pending = v
+                    return WALK_ENTER
+                else:
+                    return WALK_LEAF
+
+            else:
+                self._datas.pop()
+                if self._sort:
+                    self._keys.pop()
+                self._poses.pop_back()
+                if self._poses.empty():
+                    self.key = None
+                    self.value = None
+                    return WALK_END
+                else:
+                    self.key = self._path.pop()
+                    self.value = None
+                    return WALK_EXIT
+
+        return WALK_END
+
+    cdef inline void c_skip(self):
+        self._pending = None
+
+    cdef inline tuple c_path(self):
+        cdef tuple path
+        self._path.append(self.key)
+        path = tuple(self._path)
+        self._path.pop()
+        return path
+
 cpdef inline object create_storage(dict value):
     cdef dict _map = {}
+    cdef TreeStorage result = TreeStorage(_map)
+    # pairs of (source dict, target map), the child storages are placed before filled to keep the order
+    cdef list stack = [(value, _map)]
+
+    cdef dict src, dst, newmap
     cdef str k
     cdef object v
-    for k, v in value.items():
-        if isinstance(v, dict):
-            _map[k] = create_storage(v)
-        else:
-            _map[k] = unraw(v)
+    while stack:
+        src, dst = stack.pop()
+        for k, v in src.items():
+            if isinstance(v, dict):
+                newmap = {}
+                dst[k] = TreeStorage(newmap)
+                stack.append((v, newmap))
+            else:
+                dst[k] = unraw(v)
 
-    return TreeStorage(_map)
+    return result
 
 cdef inline object _c_undelay_data(dict data, object k, object v):
     cdef object nv = undelay(v)
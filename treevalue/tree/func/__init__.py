@@ -1 +1,3 @@
-from .func import func_treelize, MISSING_NOT_ALLOW, AUTO_DETECT_RETURN_TYPE, method_treelize, classmethod_treelize
+from .cfunc import delayed_cse, fused, TreeExpression, LeafCache
+from .func import func_treelize, MISSING_NOT_ALLOW, MISSING_DROP, MISSING_PASS, AUTO_DETECT_RETURN_TYPE, \
+    method_treelize, classmethod_treelize
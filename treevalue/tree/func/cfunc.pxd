@@ -1,18 +1,140 @@
 # distutils:language=c++
 # cython:language_level=3
 
+cimport cython
 from libcpp cimport bool
 
 from .modes cimport _e_tree_mode
+from ..common.layout cimport KeyLayout
+from ..common.storage cimport TreeStorage
 
+@cython.final
+cdef class _FuncPlan:
+    cdef readonly KeyLayout layout
+    cdef readonly tuple masks
+
+cdef tuple _c_outer_plan(list trees)
+cdef _FuncPlan _c_build_plan(_e_tree_mode mode, bool allow_missing, list args, dict kwargs, list trees)
+cdef _FuncPlan _c_get_plan(tuple key, _e_tree_mode mode, bool allow_missing,
+                           list args, dict kwargs, list trees)
+cdef void _c_fill_missing(list args, dict kwargs, object missing_func) except *
+cdef object _c_leaf_call(object func, list args, dict kwargs, bool allow_missing, object missing_func)
+
+@cython.final
+cdef class _FuncPool:
+    cdef object executor
+    cdef bool batched
+    cdef list futures
+
+    cdef void _c_submit(self, dict data, str key, object func, list args, dict kwargs) except *
+    cdef void _c_wait(self) except *
+    cdef void _c_run_batched(self) except *
+    cdef void _c_cancel(self)
+
+cdef object _c_delayed_func_treelize_run(object func, list args, dict kwargs, _e_tree_mode mode, bool inherit,
+                                         bool allow_missing, object missing_func)
 cdef object _c_wrap_func_treelize_run(object func, list args, dict kwargs, _e_tree_mode mode, bool inherit,
                                       bool allow_missing, object missing_func, bool delayed)
+cdef tuple _c_batch_backend(type type_)
+cdef object _c_batch_sig(object v)
+cdef object _c_batch_key(list args, dict kwargs)
+cdef object _c_batch_result(object v)
+cdef void _c_batch_call(list calls) except *
+
 cdef object _c_func_treelize_run(object func, list args, dict kwargs, _e_tree_mode mode, bool inherit,
-                                 bool allow_missing, object missing_func, bool delayed)
+                                 bool allow_missing, object missing_func, bool delayed, _FuncPool pool= *,
+                                 TreeStorage target= *, list writes= *)
+
+@cython.final
+cdef class LeafCache:
+    cdef readonly object maxsize
+    cdef readonly object key
+    cdef readonly Py_ssize_t hits
+    cdef readonly Py_ssize_t misses
+    cdef readonly Py_ssize_t evictions
+    cdef object data
+
+    cdef object _c_value_key(self, object v)
+    cdef object _c_call(self, object func, tuple args, dict kwargs)
+
+@cython.final
+cdef class _CachedFunc:
+    cdef object func
+    cdef LeafCache cache
+
+cdef LeafCache _c_cache_process(object cache)
+
+@cython.final
+cdef class _LeafDispatcher:
+    cdef object default
+    cdef dict registry
+    cdef dict cache
+    cdef object _dispatch
+
+    cdef void _c_refresh(self)
+    cdef object _c_resolve(self, object type_)
+
+@cython.final
+cdef class _TreelizedFunc:
+    cdef object func
+    cdef _LeafDispatcher dispatcher
+    cdef dict _registry
+    cdef LeafCache cache
+    cdef object leaf_func
+    cdef _e_tree_mode mode
+    cdef object return_type
+    cdef bool inherit
+    cdef bool allow_missing
+    cdef object missing_func
+    cdef bool delayed
+    cdef object subside
+    cdef object rise
+    cdef object executor
+    cdef object max_concurrency
+    cdef bool self_copy
+    cdef bool is_async
+    cdef bool batched
+    cdef bool fusible
+    cdef dict __dict__
+
+    cdef object _c_call(self, tuple args, dict kwargs)
+    cdef void _c_update_leaf_func(self)
+
+@cython.final
+cdef class _ExprProgram:
+    cdef list funcs
+    cdef list args
+    cdef list kwargs
+
+@cython.final
+cdef class TreeExpression:
+    cdef _TreelizedFunc func
+    cdef tuple args
+    cdef dict kwargs
+    cdef readonly object type_
+    cdef readonly bool calculated
+    cdef object val
+
+    cpdef object value(self)
+
+cdef bool _c_has_expression(tuple args, dict kwargs)
+cdef TreeExpression _c_new_expression(_TreelizedFunc func, tuple args, dict kwargs)
+cdef Py_ssize_t _c_expression_operand(object v, bool inherit, _ExprProgram program,
+                                      list values, dict value_ids, dict step_ids)
+cdef Py_ssize_t _c_expression_compile(TreeExpression expr, bool inherit, _ExprProgram program,
+                                      list values, dict value_ids, dict step_ids)
+cdef object _c_expression_value(TreeExpression expr)
+cdef object _c_expression_op(TreeExpression self, str name, tuple args)
+cdef object _c_arg_value(object item)
 
 cpdef object _d_func_treelize(object func, object mode, object return_type, bool inherit, object missing,
-                              bool delayed, object subside, object rise)
+                              bool delayed, object subside, object rise, object executor= *,
+                              object max_concurrency= *, bool self_copy= *, bool fusible= *,
+                              bool batched= *, object cache= *)
+cdef tuple _c_prepare_args(tuple args, dict kwargs, object subside, bool delayed)
+cdef object _c_wrap_result(object _st_res, tuple args, object return_type, object rise)
 cdef object _c_common_value(object item)
 cdef tuple _c_missing_process(object missing)
 cpdef object func_treelize(object mode= *, object return_type= *, bool inherit= *, object missing= *,
-                           bool delayed= *, object subside= *, object rise= *)
+                           bool delayed= *, object subside= *, object rise= *, object executor= *,
+                           object max_concurrency= *, bool batched= *, object cache= *)
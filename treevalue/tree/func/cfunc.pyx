@@ -1,23 +1,129 @@
 # distutils:language=c++
 # cython:language_level=3
 
-from functools import partial
+import asyncio
+import sys
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, singledispatch
+from inspect import iscoroutinefunction
+from types import MethodType, MappingProxyType
 
 import cython
 from hbutils.design import SingletonMark
 from libcpp cimport bool
 
-from .modes cimport _e_tree_mode, _c_keyset, _c_load_mode, _c_check
+from .modes cimport _e_tree_mode, STRICT, OUTER, LEFT, _c_keyset, _c_load_mode, _c_check
 from ..common.delay import delayed_partial
 from ..common.delay cimport undelay
+from ..common.layout cimport KeyLayout, get_layout
 from ..common.storage cimport TreeStorage, _c_undelay_not_none_data, _c_undelay_data
 from ..tree.structural cimport _c_subside, _c_rise
 from ..tree.tree cimport TreeValue
 
 _VALUE_IS_MISSING = SingletonMark('value_is_missing')
 MISSING_NOT_ALLOW = SingletonMark("missing_not_allow")
+#: Value of the ``missing`` arguments, which means the missing arguments are dropped, \
+#: and the function is called with the present arguments only.
+MISSING_DROP = SingletonMark("missing_drop")
+#: Value of the ``missing`` arguments, which means the value is passed through without calling \
+#: when only one argument is present, otherwise the missing arguments are dropped like ``MISSING_DROP``.
+MISSING_PASS = SingletonMark("missing_pass")
 
+# cache of the delayed proxies, only enabled inside delayed_cse
+_CSE_CACHE = ContextVar('_CSE_CACHE', default=None)
 
+@cython.binding(True)
+@contextmanager
+def delayed_cse():
+    """
+    Overview:
+        Enable common sub-expression elimination for the delayed calculations of the tree-supported \
+        functions inside this context. When the same function is called with the same arguments \
+        (in the sense of identity) more than once, the existing delayed proxy will be reused, \
+        so the repeated sub-expressions in lazy pipelines will be calculated only once.
+
+    .. note::
+        The values are compared by identity, so please do not modify the values in place inside this context. \
+        The references of the arguments are kept until the context is exited.
+
+    Example:
+        >>> from treevalue import FastTreeValue
+        >>> from treevalue.tree.func import delayed_cse
+        >>> t1 = FastTreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        >>> t2 = FastTreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 5}})
+        >>> add = FastTreeValue.func(delayed=True)(lambda x, y: x + y)
+        >>> with delayed_cse():
+        ...     t3 = add(t1, t2)
+        ...     t4 = add(t1, t2) * 3  # the additions are shared with t3
+    """
+    cdef dict cache = _CSE_CACHE.get()
+    token = _CSE_CACHE.set(cache if cache is not None else {})
+    try:
+        yield
+    finally:
+        _CSE_CACHE.reset(token)
+
+# the fusible tree-supported functions are recorded as expressions inside fused
+_FUSED = ContextVar('_FUSED', default=False)
+cdef object _c_fused_get = _FUSED.get
+
+@cython.binding(True)
+@contextmanager
+def fused():
+    """
+    Overview:
+        Record the fusible tree-supported functions (such as the operators of \
+        :class:`treevalue.tree.general.FastTreeValue`) inside this context as lazy :class:`TreeExpression` \
+        objects, so the chained operators can be calculated in one traversal of the trees with \
+        :meth:`TreeExpression.value`, without the intermediate trees.
+
+    Example:
+        >>> from treevalue import FastTreeValue
+        >>> from treevalue.tree.func import fused
+        >>> t1 = FastTreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+        >>> t2 = FastTreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 5}})
+        >>> with fused():
+        ...     expr = t1 * t2 + t1 - 1  # TreeExpression, not calculated
+        >>> expr.value()  # FastTreeValue({'a': 11, 'b': 45, 'x': {'c': 101, 'd': 23}})
+    """
+    token = _FUSED.set(True)
+    try:
+        yield
+    finally:
+        _FUSED.reset(token)
+
+cdef object _c_delayed_func_treelize_run(object func, list args, dict kwargs, _e_tree_mode mode, bool inherit,
+                                         bool allow_missing, object missing_func):
+    cdef dict cache = _CSE_CACHE.get()
+    if cache is None:
+        return delayed_partial(_c_wrap_func_treelize_run, func, args, kwargs,
+                               mode, inherit, allow_missing, missing_func, True)
+
+    # the arguments are kept in the cache, so their ids will not be reused
+    cdef list objs = [func, missing_func]
+    cdef list key = [id(func), mode, inherit, allow_missing, id(missing_func)]
+    cdef str ak
+    cdef object av, k, v
+    for av, k, v in args:
+        objs.append(v)
+        key.append(id(v))
+    for ak, (av, k, v) in kwargs.items():
+        objs.append(v)
+        key.append(ak)
+        key.append(id(v))
+
+    cdef tuple tkey = tuple(key)
+    cdef tuple entry = cache.get(tkey)
+    cdef object proxy
+    if entry is None:
+        proxy = delayed_partial(_c_wrap_func_treelize_run, func, args, kwargs,
+                                mode, inherit, allow_missing, missing_func, True)
+        cache[tkey] = (objs, proxy)
+        return proxy
+    else:
+        return entry[1]
 
 cdef inline object _c_wrap_func_treelize_run(object func, list args, dict kwargs, _e_tree_mode mode, bool inherit,
                                              bool allow_missing, object missing_func, bool delayed):
@@ -34,129 +140,503 @@ cdef inline object _c_wrap_func_treelize_run(object func, list args, dict kwargs
     return _c_func_treelize_run(func, _l_args, _d_kwargs,
                                 mode, inherit, allow_missing, missing_func, delayed)
 
+@cython.final
+cdef class _FuncPlan:
+    # execution plan of one tree level, the keys to be visited and
+    # the presence masks of the tree arguments (None means all present)
+    def __cinit__(self, KeyLayout layout, tuple masks):
+        self.layout = layout
+        self.masks = masks
+
+# plans are cached by (mode, allow_missing, layouts of the tree arguments)
+_PLANS = {}
+cdef int _PLAN_CACHE_SIZE = 1024
+
+cdef tuple _c_outer_plan(list trees):
+    # merge the keys of all the trees in one pass, the keys of the former trees are placed first,
+    # and the positions of the keys of each tree are recorded for the masks
+    cdef dict index = {}
+    cdef list keys = []
+    cdef list positions = []
+    cdef list pos
+    cdef dict av
+    cdef KeyLayout curlayout
+    cdef object k, i
+    for av, curlayout in trees:
+        pos = []
+        for k in curlayout.keys:
+            i = index.get(k)
+            if i is None:
+                i = len(keys)
+                index[k] = i
+                keys.append(k)
+            pos.append(i)
+        positions.append(pos)
+
+    cdef Py_ssize_t n = len(keys)
+    cdef list masks = []
+    cdef bytearray mask
+    for pos in positions:
+        if len(pos) == n:
+            masks.append(None)
+        else:
+            mask = bytearray(n)
+            for i in pos:
+                mask[i] = 1
+            masks.append(bytes(mask))
+
+    return get_layout(tuple(keys)), masks
+
+cdef _FuncPlan _c_build_plan(_e_tree_mode mode, bool allow_missing, list args, dict kwargs, list trees):
+    cdef KeyLayout layout
+    cdef list masks
+    cdef dict av
+    cdef KeyLayout curlayout
+    cdef object k
+    cdef bytearray mask
+    cdef Py_ssize_t i
+    if mode == OUTER:
+        layout, masks = _c_outer_plan(trees)
+    else:
+        layout = _c_keyset(mode, args, kwargs)
+        masks = []
+        for av, curlayout in trees:
+            if curlayout is layout:
+                masks.append(None)
+            else:
+                # check the keys against the storage itself, no key set is needed
+                mask = bytearray(len(layout.keys))
+                for i, k in enumerate(layout.keys):
+                    if k in av:
+                        mask[i] = 1
+                masks.append(None if mask.find(0) < 0 else bytes(mask))
+
+    cdef object mk
+    cdef Py_ssize_t first = -1
+    cdef dict first_av = None
+    if not allow_missing:
+        # raise for the first missing key, with the same order of the calculation
+        for (av, curlayout), mk in zip(trees, masks):
+            if mk is not None:
+                i = (<bytes>mk).find(0)
+                if i >= 0 and (first < 0 or i < first):
+                    first, first_av = i, av
+        if first >= 0:
+            raise KeyError("Missing is off, key {key} not found in {item}.".format(
+                key=repr(layout.keys[first]), item=repr(first_av),
+            ))
+
+    return _FuncPlan(layout, tuple(masks))
+
+cdef inline _FuncPlan _c_get_plan(tuple key, _e_tree_mode mode, bool allow_missing,
+                                  list args, dict kwargs, list trees):
+    cdef _FuncPlan plan
+    try:
+        return _PLANS[key]
+    except KeyError:
+        plan = _c_build_plan(mode, allow_missing, args, kwargs, trees)
+        if len(_PLANS) >= _PLAN_CACHE_SIZE:
+            _PLANS.clear()
+        _PLANS[key] = plan
+        return plan
+
+cdef inline void _c_fill_missing(list args, dict kwargs, object missing_func) except *:
+    cdef Py_ssize_t i
+    cdef str k
+    cdef object v
+    for i in range(len(args)):
+        if args[i] is _VALUE_IS_MISSING:
+            args[i] = missing_func()
+    for k, v in kwargs.items():
+        if v is _VALUE_IS_MISSING:
+            kwargs[k] = missing_func()
+
+cdef inline object _c_leaf_call(object func, list args, dict kwargs, bool allow_missing, object missing_func):
+    if allow_missing:
+        _c_fill_missing(args, kwargs, missing_func)
+
+    cdef object _a_ret = func(*args, **kwargs)
+    if isinstance(_a_ret, TreeValue):
+        return _a_ret._detach()
+    else:
+        return _a_ret
+
+async def _a_limited_call(object semaphore, object coro):
+    async with semaphore:
+        return await coro
+
+@cython.final
+cdef class _FuncPool:
+    # leaf calls submitted to the executor, the results are filled
+    # into the result storages after the whole structure is built,
+    # when executor is None, the coroutines of the leaves are collected,
+    # in batched mode, the calls are collected and run by groups when waiting
+    def __cinit__(self, object executor, bool batched=False):
+        self.executor = executor
+        self.batched = batched
+        self.futures = []
+
+    cdef inline void _c_submit(self, dict data, str key, object func, list args, dict kwargs) except *:
+        if self.batched:
+            self.futures.append((data, key, (func, args, kwargs)))
+        elif self.executor is None:
+            self.futures.append((data, key, func(*args, **kwargs)))
+        else:
+            self.futures.append((data, key, self.executor.submit(func, *args, **kwargs)))
+
+    cdef void _c_wait(self) except *:
+        if self.batched:
+            self._c_run_batched()
+            return
+
+        cdef dict data
+        cdef str key
+        cdef object future, v
+        try:
+            for data, key, future in self.futures:
+                v = future.result()
+                if isinstance(v, TreeValue):
+                    v = v._detach()
+                data[key] = v
+        except BaseException:
+            self._c_cancel()
+            raise
+
+    cdef void _c_run_batched(self) except *:
+        cdef dict groups = {}
+        cdef dict data
+        cdef str key
+        cdef object call, group_key
+        cdef list calls
+        for data, key, call in self.futures:
+            group_key = _c_batch_key(<list>call[1], <dict>call[2])
+            if group_key is None:
+                data[key] = _c_batch_result(call[0](*call[1], **call[2]))
+            else:
+                calls = groups.get(group_key)
+                if calls is None:
+                    calls = []
+                    groups[group_key] = calls
+                calls.append((data, key, call))
+
+        for calls in groups.values():
+            _c_batch_call(calls)
+
+    cdef void _c_cancel(self):
+        if self.batched:
+            return
+
+        cdef dict data
+        cdef str key
+        cdef object item
+        for data, key, item in self.futures:
+            if self.executor is None:
+                item.close()
+            else:
+                item.cancel()
+
+    async def _a_wait(self, object max_concurrency):
+        cdef list tasks = []
+        cdef object semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        cdef dict data
+        cdef str key
+        cdef object coro, v
+        for data, key, coro in self.futures:
+            if semaphore is not None:
+                coro = _a_limited_call(semaphore, coro)
+            tasks.append(asyncio.ensure_future(coro))
+
+        cdef list results
+        try:
+            results = await asyncio.gather(*tasks)
+        except BaseException:
+            for coro in tasks:
+                coro.cancel()
+            raise
+
+        cdef Py_ssize_t i
+        for i, (data, key, coro) in enumerate(self.futures):
+            v = results[i]
+            if isinstance(v, TreeValue):
+                v = v._detach()
+            data[key] = v
+
+# stack and split functions of the array types, resolved lazily, so the array libraries are not required
+_BATCH_BACKENDS = {}
+
+cdef tuple _c_batch_backend(type type_):
+    cdef tuple backend
+    try:
+        return _BATCH_BACKENDS[type_]
+    except KeyError:
+        pass
+
+    np = sys.modules.get('numpy')
+    torch = sys.modules.get('torch')
+    if np is not None and type_ is np.ndarray:
+        backend = (np.stack,)
+    elif torch is not None and issubclass(type_, torch.Tensor):
+        backend = (torch.stack,)
+    else:
+        backend = None
+
+    _BATCH_BACKENDS[type_] = backend
+    return backend
+
+cdef inline object _c_batch_sig(object v):
+    # arrays with the same type, dtype, shape and device can be stacked,
+    # the other values should be the same object in one group
+    if _c_batch_backend(type(v)) is not None:
+        return type(v), v.dtype, tuple(v.shape), getattr(v, 'device', None)
+    else:
+        return id(v)
+
+cdef object _c_batch_key(list args, dict kwargs):
+    cdef list sigs = []
+    cdef bool has_array = False
+    cdef object v, sig
+    cdef str k
+    for v in args:
+        sig = _c_batch_sig(v)
+        if isinstance(sig, tuple):
+            has_array = True
+        sigs.append(sig)
+    for k, v in kwargs.items():
+        sig = _c_batch_sig(v)
+        if isinstance(sig, tuple):
+            has_array = True
+        sigs.append((k, sig))
+
+    if has_array:
+        return tuple(sigs)
+    else:
+        return None
+
+cdef inline object _c_batch_result(object v):
+    if isinstance(v, TreeValue):
+        return v._detach()
+    else:
+        return v
+
+cdef void _c_batch_call(list calls) except *:
+    cdef dict data
+    cdef str key
+    cdef object call, func, v
+    if len(calls) == 1:
+        data, key, call = calls[0]
+        data[key] = _c_batch_result(call[0](*call[1], **call[2]))
+        return
+
+    cdef tuple first = calls[0][2]
+    func = first[0]
+    cdef list f_args = first[1]
+    cdef dict f_kwargs = first[2]
+
+    cdef list _l_args = []
+    cdef dict _d_kwargs = {}
+    cdef Py_ssize_t i
+    cdef str k
+    cdef tuple backend
+    cdef list items
+    for i, v in enumerate(f_args):
+        backend = _c_batch_backend(type(v))
+        if backend is not None:
+            items = []
+            for data, key, call in calls:
+                items.append((<list>call[1])[i])
+            _l_args.append(backend[0](items))
+        else:
+            _l_args.append(v)
+    for k, v in f_kwargs.items():
+        backend = _c_batch_backend(type(v))
+        if backend is not None:
+            items = []
+            for data, key, call in calls:
+                items.append((<dict>call[2])[k])
+            _d_kwargs[k] = backend[0](items)
+        else:
+            _d_kwargs[k] = v
+
+    cdef object result = func(*_l_args, **_d_kwargs)
+    if _c_batch_backend(type(result)) is None or len(result) != len(calls):
+        raise ValueError(f'Batched result with the first dimension of {len(calls)} expected, '
+                         f'but {result!r} found.')
+
+    for i, v in enumerate(result):
+        data, key, call = calls[i]
+        data[key] = v
+
 cdef object _c_func_treelize_run(object func, list args, dict kwargs, _e_tree_mode mode, bool inherit,
-                                 bool allow_missing, object missing_func, bool delayed):
+                                 bool allow_missing, object missing_func, bool delayed, _FuncPool pool=None,
+                                 TreeStorage target=None, list writes=None):
+    # when target is given, it should be the first argument, and the writes of the results into it are
+    # collected in writes, they are applied after all the calculations, so the target is not partly updated
+    # when error occurs, and the shared storages in the target are calculated with the original values
     cdef list ck_args = []
     cdef list ck_kwargs = []
-    cdef bool has_tree = False
+    cdef list trees = []
+    cdef list plan_key = [mode, allow_missing]
 
     cdef str k
     cdef object v, nv
-    for v in args:
+    cdef KeyLayout curlayout
+    cdef Py_ssize_t pos
+    # the positions and names of the trees are in the key, the key set of left mode depends on them
+    for pos, v in enumerate(args):
         if isinstance(v, TreeStorage):
-            ck_args.append((v.detach(), True))
-            has_tree = True
+            curlayout = (<TreeStorage>v).layout()
+            ck_args.append(((<TreeStorage>v).map, True))
+            trees.append(((<TreeStorage>v).map, curlayout))
+            plan_key.append((pos, curlayout))
         else:
             ck_args.append((v, False))
     for k, v in kwargs.items():
         if isinstance(v, TreeStorage):
-            ck_kwargs.append((k, v.detach(), True))
-            has_tree = True
+            curlayout = (<TreeStorage>v).layout()
+            ck_kwargs.append((k, (<TreeStorage>v).map, True))
+            trees.append(((<TreeStorage>v).map, curlayout))
+            plan_key.append((k, curlayout))
         else:
             ck_kwargs.append((k, v, False))
 
-    cdef list _a_args
-    cdef dict _a_kwargs
-    cdef object _a_ret
-    if not has_tree:
-        _a_args = []
-        for v in args:
-            if v is not _VALUE_IS_MISSING:
-                _a_args.append(v)
-            else:
-                _a_args.append(missing_func())
+    if not trees:
+        return _c_leaf_call(func, args, kwargs, True, missing_func)
 
-        _a_kwargs = {}
-        for k, v in kwargs.items():
-            if v is not _VALUE_IS_MISSING:
-                _a_kwargs[k] = v
-            else:
-                _a_kwargs[k] = missing_func()
+    cdef _FuncPlan plan = _c_get_plan(tuple(plan_key), mode, allow_missing, args, kwargs, trees)
+    cdef tuple keys = plan.layout.keys
+    cdef tuple masks = plan.masks
 
-        _a_ret = func(*_a_args, **_a_kwargs)
-        if isinstance(_a_ret, TreeValue):
-            return _a_ret._detach()
-        else:
-            return _a_ret
-
-    cdef dict _d_res = {}
     cdef str ak
     cdef object av
     cdef bool at
+    cdef int i
+    if keys:
+        for i, (av, at) in enumerate(ck_args):
+            if not at:
+                if not inherit:
+                    raise TypeError("Inherit is off, tree value expected but {type} found in args {index}.".format(
+                        type=repr(type(av).__name__), index=repr(i),
+                    ))
+                elif not delayed:
+                    ck_args[i] = (undelay(av), False)
+        for i, (ak, av, at) in enumerate(ck_kwargs):
+            if not at:
+                if not inherit:
+                    raise TypeError("Inherit is off, tree value expected but {type} found in args {index}.".format(
+                        type=repr(type(av).__name__), index=repr(ak),
+                    ))
+                elif not delayed:
+                    ck_kwargs[i] = (ak, undelay(av), False)
+
+    cdef dict _d_res = target.map if target is not None else {}
+    cdef object res
     cdef list _l_args
     cdef dict _d_kwargs
-    cdef int i
-    for k in _c_keyset(mode, args, kwargs):
+    cdef object mask
+    cdef Py_ssize_t j, s, n_missing
+    cdef bool has_sub
+    # in sparse modes, the missing arguments are dropped instead of filled
+    cdef bool sparse = allow_missing and (missing_func is MISSING_DROP or missing_func is MISSING_PASS)
+    cdef bool fill = allow_missing and not sparse
+    for j in range(len(keys)):
+        k = keys[j]
+        s = 0
+        n_missing = 0
+        has_sub = False
+
         _l_args = []
-        for i, (av, at) in enumerate(ck_args):
+        for av, at in ck_args:
             if at:
-                try:
-                    v = av[k]
+                mask = masks[s]
+                s += 1
+                if mask is None or (<bytes>mask)[j]:
+                    v = (<dict>av)[k]
                     if delayed:
                         _l_args.append((av, k, v))
                     else:
                         v = _c_undelay_data(av, k, v)
+                        if isinstance(v, TreeStorage):
+                            has_sub = True
                         _l_args.append(v)
-                except KeyError:
-                    if allow_missing:
-                        if delayed:
-                            _l_args.append((None, None, _VALUE_IS_MISSING))
-                        else:
-                            _l_args.append(_VALUE_IS_MISSING)
-                    else:
-                        raise KeyError("Missing is off, key {key} not found in {item}.".format(
-                            key=repr(k), item=repr(av),
-                        ))
-            else:
-                if inherit:
-                    if delayed:
-                        _l_args.append((None, None, av))
-                    else:
-                        _l_args.append(undelay(av))
+                elif sparse:
+                    n_missing += 1
+                elif delayed:
+                    _l_args.append((None, None, _VALUE_IS_MISSING))
                 else:
-                    raise TypeError("Inherit is off, tree value expected but {type} found in args {index}.".format(
-                        type=repr(type(av).__name__), index=repr(i),
-                    ))
+                    _l_args.append(_VALUE_IS_MISSING)
+            elif delayed:
+                _l_args.append((None, None, av))
+            else:
+                _l_args.append(av)
 
         _d_kwargs = {}
         for ak, av, at in ck_kwargs:
             if at:
-                try:
-                    v = av[k]
+                mask = masks[s]
+                s += 1
+                if mask is None or (<bytes>mask)[j]:
+                    v = (<dict>av)[k]
                     if delayed:
                         _d_kwargs[ak] = (av, k, v)
                     else:
                         v = _c_undelay_data(av, k, v)
+                        if isinstance(v, TreeStorage):
+                            has_sub = True
                         _d_kwargs[ak] = v
-                except KeyError:
-                    if allow_missing:
-                        if delayed:
-                            _d_kwargs[ak] = (None, None, _VALUE_IS_MISSING)
-                        else:
-                            _d_kwargs[ak] = _VALUE_IS_MISSING
-                    else:
-                        raise KeyError("Missing is off, key {key} not found in {item}.".format(
-                            key=repr(k), item=repr(av),
-                        ))
-            else:
-                if inherit:
-                    if delayed:
-                        _d_kwargs[ak] = (None, None, av)
-                    else:
-                        _d_kwargs[ak] = undelay(av)
+                elif sparse:
+                    n_missing += 1
+                elif delayed:
+                    _d_kwargs[ak] = (None, None, _VALUE_IS_MISSING)
                 else:
-                    raise TypeError("Inherit is off, tree value expected but {type} found in args {index}.".format(
-                        type=repr(type(av).__name__), index=repr(ak),
-                    ))
+                    _d_kwargs[ak] = _VALUE_IS_MISSING
+            elif delayed:
+                _d_kwargs[ak] = (None, None, av)
+            else:
+                _d_kwargs[ak] = av
 
-        if delayed:
-            _d_res[k] = delayed_partial(_c_wrap_func_treelize_run, func, _l_args, _d_kwargs,
-                                        mode, inherit, allow_missing, missing_func, delayed)
-        else:
+        if n_missing and missing_func is MISSING_PASS and len(_l_args) + len(_d_kwargs) == 1:
+            # only one value is present, so it is passed through without calling,
+            # the sub tree is copied without changing the source storage
+            if target is None:
+                v = _l_args[0] if _l_args else next(iter(_d_kwargs.values()))
+                if delayed:
+                    v = v[2]
+                _d_res[k] = (<TreeStorage>v)._c_fork() if isinstance(v, TreeStorage) else v
+        elif delayed:
+            _d_res[k] = _c_delayed_func_treelize_run(func, _l_args, _d_kwargs,
+                                                     mode, inherit, allow_missing, missing_func)
+        elif target is not None:
+            if has_sub and isinstance(_l_args[0], TreeStorage):
+                # the results are written into the sub tree of target
+                _c_func_treelize_run(func, _l_args, _d_kwargs, mode, inherit, allow_missing, missing_func,
+                                     False, None, _l_args[0], writes)
+            else:
+                if has_sub:
+                    res = _c_func_treelize_run(func, _l_args, _d_kwargs,
+                                               mode, inherit, allow_missing, missing_func, False)
+                else:
+                    res = _c_leaf_call(func, _l_args, _d_kwargs, fill, missing_func)
+                writes.append((_d_res, k, res))
+        elif has_sub:
             _d_res[k] = _c_func_treelize_run(func, _l_args, _d_kwargs,
-                                             mode, inherit, allow_missing, missing_func, delayed)
+                                             mode, inherit, allow_missing, missing_func, delayed, pool)
+        elif pool is not None:
+            if fill:
+                _c_fill_missing(_l_args, _d_kwargs, missing_func)
+            _d_res[k] = None
+            pool._c_submit(_d_res, k, func, _l_args, _d_kwargs)
+        else:
+            # all the values are leaves, so call the function directly
+            _d_res[k] = _c_leaf_call(func, _l_args, _d_kwargs, fill, missing_func)
 
-    return TreeStorage(_d_res)
+    if target is not None:
+        # the keys of target are not changed
+        return target
+
+    cdef TreeStorage _st_res = TreeStorage(_d_res)
+    # all the keys of the layout are filled in order, so the result shares the layout
+    _st_res._layout = plan.layout
+    return _st_res
 
 def _w_subside_func(object value, bool dict_=True, bool list_=True, bool tuple_=True, bool inherit=True,
                     object mode='strict', object missing=MISSING_NOT_ALLOW, bool delayed=False):
@@ -165,39 +645,691 @@ def _w_subside_func(object value, bool dict_=True, bool list_=True, bool tuple_=
 def _w_rise_func(object tree, bool dict_=True, bool list_=True, bool tuple_=True, object template=None):
     return _c_rise(tree, dict_, list_, tuple_, template)
 
-# runtime function
-def _w_func_treelize_run(*args, object __w_func, _e_tree_mode __w_mode, object __w_return_type,
-                         bool __w_inherit, bool __w_allow_missing, object __w_missing_func,
-                         bool __w_delayed, object __w_subside, object __w_rise, **kwargs):
-    cdef list _a_args = [(item._detach() if isinstance(item, TreeValue) else item) for item in args]
-    cdef dict _a_kwargs = {k: (v._detach() if isinstance(v, TreeValue) else v) for k, v in kwargs.items()}
+cdef tuple _c_prepare_args(tuple args, dict kwargs, object subside, bool delayed):
+    cdef list _a_args = [(item._detach() if isinstance(item, TreeValue) else _c_arg_value(item)) for item in args]
+    cdef dict _a_kwargs = {k: (v._detach() if isinstance(v, TreeValue) else _c_arg_value(v))
+                           for k, v in kwargs.items()}
 
     cdef dict _w_subside_cfg
-    if __w_subside is not None:
-        _w_subside_cfg = {'delayed': __w_delayed, **__w_subside}
+    if subside is not None:
+        _w_subside_cfg = {'delayed': delayed, **subside}
         _a_args = [_w_subside_func(item, **_w_subside_cfg) for item in _a_args]
         _a_kwargs = {key: _w_subside_func(value, **_w_subside_cfg) for key, value in _a_kwargs.items()}
 
-    cdef object _st_res = _c_func_treelize_run(__w_func, _a_args, _a_kwargs, __w_mode,
-                                               __w_inherit, __w_allow_missing, __w_missing_func, __w_delayed)
+    return _a_args, _a_kwargs
 
+cdef object _c_wrap_result(object _st_res, tuple args, object return_type, object rise):
     cdef object _o_res
-    if __w_return_type is not None:
+    if return_type is not None:
         if isinstance(_st_res, TreeStorage):
-            if isinstance(__w_return_type, type) and issubclass(__w_return_type, TreeValue):
-                _o_res = __w_return_type(_st_res)
+            if isinstance(return_type, type) and issubclass(return_type, TreeValue):
+                _o_res = return_type(_st_res)
             else:
-                _o_res = __w_return_type(args[0])(_st_res)
+                _o_res = return_type(args[0])(_st_res)
         else:
             _o_res = _st_res
 
-        if __w_rise is not None:
-            _o_res = _w_rise_func(_o_res, **__w_rise)
+        if rise is not None:
+            _o_res = _w_rise_func(_o_res, **rise)
 
         return _o_res
     else:
         return None
 
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'evictions', 'maxsize', 'currsize'])
+
+@cython.final
+cdef class LeafCache:
+    """
+    Overview:
+        LRU cache of the results of the values, used by the ``cache`` option of :func:`func_treelize` \
+        and :func:`method_treelize`. The results are keyed by the function and the identities \
+        of the arguments of each value (or the keys given by ``key``), so the unchanged values \
+        will not be calculated again.
+
+    .. note::
+        When the identities are used, the arguments of the cached results are kept alive until \
+        evicted (so please set a proper ``maxsize`` for the large values), and the values should \
+        not be modified in-place.
+
+    .. note::
+        The cached result objects are shared by all the trees returned on hits, so the mutable results \
+        (such as ``numpy.ndarray``) should not be modified in-place (e.g. ``r1 += 1``), otherwise the \
+        other results and the cache will be changed too. Please copy them before that. The cache is not \
+        used by the methods in self copy mode, which replace the values of ``self`` in-place.
+    """
+
+    def __init__(self, object maxsize=128, object key=None):
+        """
+        Overview:
+            Constructor of :class:`LeafCache`.
+
+        Arguments:
+            - maxsize (:obj:`Optional[int]`): Max count of the cached results, the least recently used \
+                results are evicted when exceeded. ``None`` means no limit, default is ``128``.
+            - key (:obj:`Optional[Callable]`): Key function of the arguments, default is ``None`` \
+                which means the identities of the arguments are used.
+        """
+        if maxsize is not None and maxsize < 0:
+            raise ValueError(f'Non-negative max size expected but {maxsize!r} found.')
+        self.maxsize = maxsize
+        self.key = key
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    cdef inline object _c_value_key(self, object v):
+        if self.key is None:
+            return id(v)
+        else:
+            return self.key(v)
+
+    cdef object _c_call(self, object func, tuple args, dict kwargs):
+        cdef list key = [id(func)]
+        cdef object v
+        cdef str k
+        for v in args:
+            key.append(self._c_value_key(v))
+        for k, v in kwargs.items():
+            key.append(k)
+            key.append(self._c_value_key(v))
+
+        cdef tuple tkey = tuple(key)
+        cdef tuple entry = self.data.get(tkey)
+        if entry is not None:
+            self.hits += 1
+            try:
+                self.data.move_to_end(tkey)
+            except KeyError:  # pragma: no cover
+                pass
+            return entry[1]
+
+        self.misses += 1
+        cdef object result = func(*args, **kwargs)
+        if self.maxsize is None or self.maxsize > 0:
+            # the arguments are kept, so their identities will not be reused
+            self.data[tkey] = ((func, args, kwargs), result)
+            while self.maxsize is not None and len(self.data) > self.maxsize:
+                try:
+                    self.data.popitem(last=False)
+                except KeyError:  # pragma: no cover
+                    break
+                self.evictions += 1
+
+        return result
+
+    def info(self):
+        """
+        Overview:
+            Get the statistics of this cache.
+
+        Returns:
+            - info: Named tuple of ``hits``, ``misses``, ``evictions``, ``maxsize`` and ``currsize``.
+        """
+        return CacheInfo(self.hits, self.misses, self.evictions, self.maxsize, len(self.data))
+
+    def clear(self):
+        """
+        Overview:
+            Clear the cached results and the statistics.
+        """
+        self.data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} size: {len(self.data)}, maxsize: {self.maxsize!r}, ' \
+               f'hits: {self.hits}, misses: {self.misses}>'
+
+@cython.final
+cdef class _CachedFunc:
+    """
+    Overview:
+        Function of the values with the results cached in :class:`LeafCache`.
+    """
+
+    def __cinit__(self, object func, LeafCache cache):
+        self.func = func
+        self.cache = cache
+
+    def __call__(self, *args, **kwargs):
+        return self.cache._c_call(self.func, args, kwargs)
+
+cdef inline LeafCache _c_cache_process(object cache):
+    if cache is None or cache is False:
+        return None
+    elif cache is True:
+        return LeafCache()
+    elif isinstance(cache, LeafCache):
+        return cache
+    elif isinstance(cache, int):
+        return LeafCache(cache)
+    else:
+        raise TypeError(f'Invalid cache option, bool, int or {LeafCache.__name__} expected but {cache!r} found.')
+
+@cython.final
+cdef class _LeafDispatcher:
+    """
+    Overview:
+        Dispatcher of the values, the implementation is selected by the type of the first positional argument, \
+        and the selection is cached for each exact type.
+    """
+
+    def __cinit__(self, object default, dict registry):
+        self.default = default
+        self.registry = registry
+        self.cache = {}
+        self._dispatch = None
+
+    cdef void _c_refresh(self):
+        # the selections may be changed by the new registered types
+        self.cache.clear()
+        self._dispatch = None
+
+    cdef object _c_resolve(self, object type_):
+        cdef object impl = self.cache.get(type_)
+        if impl is not None:
+            return impl
+
+        cdef object dispatcher
+        if self._dispatch is None:
+            # the most specific implementation (including the abstract classes) is selected by singledispatch
+            dispatcher = singledispatch(self.default)
+            for t, f in self.registry.items():
+                if t is not object:
+                    dispatcher.register(t, f)
+            self._dispatch = dispatcher.dispatch
+
+        impl = self._dispatch(type_)
+        self.cache[type_] = impl
+        return impl
+
+    def __call__(self, *args, **kwargs):
+        if args:
+            return self._c_resolve(type(args[0]))(*args, **kwargs)
+        else:
+            # no positional argument to dispatch
+            return self.default(**kwargs)
+
+# runtime function
+@cython.final
+cdef class _TreelizedFunc:
+    """
+    Overview:
+        Compiled callable object of the tree-supported function, the configuration is kept in \
+        the C fields, so the arguments will not be packed and unpacked for each call.
+    """
+
+    def __call__(self, *args, **kwargs):
+        if self.is_async:
+            return self._a_call(args, kwargs)
+        elif self.fusible and (_c_has_expression(args, kwargs) or _c_fused_get()):
+            return _c_new_expression(self, args, kwargs)
+        else:
+            return self._c_call(args, kwargs)
+
+    cdef object _c_call(self, tuple args, dict kwargs):
+        cdef list _a_args
+        cdef dict _a_kwargs
+        _a_args, _a_kwargs = _c_prepare_args(args, kwargs, self.subside, self.delayed)
+
+        if self.self_copy and not self.delayed and self.executor is None and not self.batched and \
+                self.subside is None and \
+                (self.mode == STRICT or self.mode == LEFT) and isinstance(args[0], TreeValue):
+            # the keys of self are kept in these modes, so the results can be written into self directly
+            writes = []
+            _c_func_treelize_run(self.leaf_func, _a_args, _a_kwargs, self.mode, self.inherit,
+                                 self.allow_missing, self.missing_func, False, None, _a_args[0], writes)
+            for _d_res, k, v in writes:
+                _d_res[k] = v
+            return args[0]
+
+        cdef _FuncPool pool
+        if self.batched:
+            pool = _FuncPool(None, True)
+        elif self.executor is not None:
+            pool = _FuncPool(self.executor)
+        else:
+            pool = None
+
+        cdef object _st_res
+        try:
+            _st_res = _c_func_treelize_run(self.leaf_func, _a_args, _a_kwargs, self.mode, self.inherit,
+                                           self.allow_missing, self.missing_func, self.delayed, pool)
+        except BaseException:
+            if pool is not None:
+                pool._c_cancel()
+            raise
+
+        if pool is not None:
+            pool._c_wait()
+
+        cdef object _o_res = _c_wrap_result(_st_res, args, self.return_type, self.rise)
+        if self.self_copy:
+            args[0]._detach().copy_from(_o_res._detach())
+            return args[0]
+        else:
+            return _o_res
+
+    async def _a_call(self, tuple args, dict kwargs):
+        cdef list _a_args
+        cdef dict _a_kwargs
+        _a_args, _a_kwargs = _c_prepare_args(args, kwargs, self.subside, False)
+
+        # the coroutines of the leaves are collected, and awaited after the whole structure is built
+        cdef _FuncPool pool = _FuncPool(None)
+        cdef object _st_res
+        try:
+            _st_res = _c_func_treelize_run(self.leaf_func, _a_args, _a_kwargs, self.mode, self.inherit,
+                                           self.allow_missing, self.missing_func, False, pool)
+        except BaseException:
+            pool._c_cancel()
+            raise
+
+        if isinstance(_st_res, TreeStorage):
+            await pool._a_wait(self.max_concurrency)
+        else:
+            _st_res = await _st_res
+            if isinstance(_st_res, TreeValue):
+                _st_res = _st_res._detach()
+
+        return _c_wrap_result(_st_res, args, self.return_type, self.rise)
+
+    def register(self, object type_, object impl=None):
+        """
+        Overview:
+            Register the implementation for the values of the given type, \
+            like ``register`` of :func:`functools.singledispatch`.
+            The implementation is selected by the type of the first positional argument of each value, \
+            and the original function is used when no registered type matches.
+
+        Arguments:
+            - type_ (:obj:`type`): Type of the first positional argument.
+            - impl: Implementation function, default is ``None`` which means return a decorator.
+
+        Returns:
+            - impl: The registered implementation, or a decorator when ``impl`` is not given.
+
+        Example:
+            >>> @func_treelize()
+            >>> def double(x):
+            >>>     return x * 2
+            >>>
+            >>> @double.register(str)
+            >>> def _(x):
+            >>>     return x.upper()
+            >>>
+            >>> double(TreeValue({'a': 1, 'b': 'b'}))  # TreeValue({'a': 2, 'b': 'B'})
+        """
+        if not isinstance(type_, type):
+            raise TypeError(f'Type expected but {type_!r} found.')
+        if impl is None:
+            return partial(self.register, type_)
+
+        if self.is_async and not iscoroutinefunction(impl):
+            raise TypeError(f'Coroutine function expected but {impl!r} found.')
+        if self.dispatcher is None:
+            self.dispatcher = _LeafDispatcher(self.func, self._registry)
+            self._c_update_leaf_func()
+
+        self._registry[type_] = impl
+        self.dispatcher._c_refresh()
+        return impl
+
+    def dispatch(self, object type_):
+        """
+        Overview:
+            Get the implementation for the values of the given type.
+
+        Arguments:
+            - type_ (:obj:`type`): Type of the first positional argument.
+
+        Returns:
+            - impl: Selected implementation.
+        """
+        if self.dispatcher is not None:
+            return self.dispatcher._c_resolve(type_)
+        else:
+            return self.func
+
+    @property
+    def registry(self):
+        """
+        Overview:
+            Read-only mapping of the registered implementations, like ``registry`` of \
+            :func:`functools.singledispatch`. The original function is registered as ``object``.
+        """
+        return MappingProxyType(self._registry)
+
+    cdef void _c_update_leaf_func(self):
+        cdef object func = self.dispatcher if self.dispatcher is not None else self.func
+        # the results of self copy mode are written into self, so they should not be shared with the cache
+        self.leaf_func = _CachedFunc(func, self.cache) if self.cache is not None and not self.self_copy else func
+
+    def cache_info(self):
+        """
+        Overview:
+            Get the statistics of the cache, like ``cache_info`` of :func:`functools.lru_cache`.
+
+        Returns:
+            - info: Statistics of the cache, ``None`` will be returned when the cache is not enabled.
+        """
+        return self.cache.info() if self.cache is not None else None
+
+    def cache_clear(self):
+        """
+        Overview:
+            Clear the cache, do nothing when the cache is not enabled.
+        """
+        if self.cache is not None:
+            self.cache.clear()
+
+    def __get__(self, instance, owner):
+        # bound like the python functions, so it can be used as method
+        if instance is None:
+            return self
+        else:
+            return MethodType(self, instance)
+
+    def __reduce__(self):
+        # pickled by name like the python functions, the name is assigned by wraps
+        cdef object name = getattr(self, '__qualname__', None)
+        if name is None:
+            raise TypeError(f'Unnamed tree-supported function {self!r} can not be pickled.')
+        return name
+
+cdef inline bool _c_has_expression(tuple args, dict kwargs):
+    cdef object item
+    for item in args:
+        if isinstance(item, TreeExpression):
+            return True
+    if kwargs:
+        for item in kwargs.values():
+            if isinstance(item, TreeExpression):
+                return True
+
+    return False
+
+cdef TreeExpression _c_new_expression(_TreelizedFunc func, tuple args, dict kwargs):
+    cdef object type_ = func.return_type
+    if not (isinstance(type_, type) and issubclass(type_, TreeValue)):
+        if isinstance(args[0], TreeExpression):
+            # the expression of self, the type of its result is used
+            type_ = (<TreeExpression>args[0]).type_
+        else:
+            type_ = type_(args[0])
+
+    cdef TreeExpression expr = TreeExpression.__new__(TreeExpression)
+    expr.func = func
+    expr.args = args
+    expr.kwargs = kwargs
+    expr.type_ = type_
+    expr.calculated = False
+    return expr
+
+@cython.final
+cdef class _ExprProgram:
+    """
+    Overview:
+        Calculation of the fused expression on one group of values, the operands are referred by \
+        the indices of the previous steps or the bitwise inverted indices of the values.
+    """
+
+    def __cinit__(self):
+        self.funcs = []
+        self.args = []
+        self.kwargs = []
+
+    def __call__(self, *values):
+        cdef Py_ssize_t n = len(self.funcs)
+        cdef list results = [None] * n
+        cdef Py_ssize_t i, ref
+        cdef list _a_args
+        cdef dict _d_kwargs, _a_kwargs
+        cdef str k
+        for i in range(n):
+            _a_args = []
+            for ref in <tuple>self.args[i]:
+                _a_args.append(results[ref] if ref >= 0 else values[~ref])
+
+            _d_kwargs = self.kwargs[i]
+            if _d_kwargs is None:
+                results[i] = self.funcs[i](*_a_args)
+            else:
+                _a_kwargs = {}
+                for k, ref in _d_kwargs.items():
+                    _a_kwargs[k] = results[ref] if ref >= 0 else values[~ref]
+                results[i] = self.funcs[i](*_a_args, **_a_kwargs)
+
+        return results[n - 1]
+
+cdef Py_ssize_t _c_expression_operand(object v, bool inherit, _ExprProgram program,
+                                      list values, dict value_ids, dict step_ids):
+    cdef TreeExpression expr
+    if isinstance(v, TreeExpression):
+        expr = <TreeExpression>v
+        if not expr.calculated and expr.func.mode == STRICT and expr.func.inherit == inherit:
+            return _c_expression_compile(expr, inherit, program, values, value_ids, step_ids)
+        else:
+            v = expr.value()
+
+    if isinstance(v, TreeValue):
+        v = v._detach()
+    cdef object key = id(v)
+    cdef Py_ssize_t index
+    if key in value_ids:
+        index = value_ids[key]
+    else:
+        index = len(values)
+        value_ids[key] = index
+        values.append(v)
+
+    return ~index
+
+cdef Py_ssize_t _c_expression_compile(TreeExpression expr, bool inherit, _ExprProgram program,
+                                      list values, dict value_ids, dict step_ids):
+    cdef object key = id(expr)
+    if key in step_ids:
+        # shared sub expression, only calculated once
+        return step_ids[key]
+
+    cdef list arg_refs = []
+    cdef object item
+    for item in expr.args:
+        arg_refs.append(_c_expression_operand(item, inherit, program, values, value_ids, step_ids))
+
+    cdef dict kwarg_refs = None
+    cdef str k
+    if expr.kwargs:
+        kwarg_refs = {}
+        for k, item in expr.kwargs.items():
+            kwarg_refs[k] = _c_expression_operand(item, inherit, program, values, value_ids, step_ids)
+
+    cdef Py_ssize_t index = len(program.funcs)
+    program.funcs.append(expr.func.leaf_func)
+    program.args.append(tuple(arg_refs))
+    program.kwargs.append(kwarg_refs)
+    step_ids[key] = index
+    return index
+
+cdef object _c_expression_value(TreeExpression expr):
+    cdef _TreelizedFunc func = expr.func
+    cdef object item
+    cdef str k
+    if func.mode != STRICT:
+        # can not be fused, the arguments are calculated before
+        return func._c_call(
+            tuple([(<TreeExpression>item).value() if isinstance(item, TreeExpression) else item
+                   for item in expr.args]),
+            {k: (<TreeExpression>item).value() if isinstance(item, TreeExpression) else item
+             for k, item in expr.kwargs.items()},
+        )
+
+    cdef _ExprProgram program = _ExprProgram()
+    cdef list values = []
+    _c_expression_compile(expr, func.inherit, program, values, {}, {})
+
+    cdef object _st_res = _c_func_treelize_run(program, values, {}, STRICT, func.inherit, False, None, False)
+    if isinstance(_st_res, TreeStorage):
+        return expr.type_(_st_res)
+    else:
+        return _st_res
+
+cdef inline object _c_expression_op(TreeExpression self, str name, tuple args):
+    cdef object op = getattr(self.type_, name, None)
+    if op is None:
+        return NotImplemented
+    else:
+        return op(self, *args)
+
+@cython.final
+cdef class TreeExpression:
+    """
+    Overview:
+        Lazy expression of the fusible tree-supported functions (such as the operators of \
+        :class:`treevalue.tree.general.FastTreeValue`), which is recorded inside :func:`fused` \
+        or when any of the arguments is an expression. The operators of the result type can be \
+        used on the expression to build a larger one.
+
+    .. note::
+        When :meth:`value` is called, the whole expression will be calculated in one traversal \
+        of the trees, and the functions are called one by one on each group of the values, \
+        so no intermediate trees will be created. The shared sub-expressions are calculated \
+        only once for each group of the values.
+
+    .. note::
+        Only the expressions in ``strict`` mode with the same ``inherit`` option are fused together, \
+        the other sub-expressions will be calculated to trees before.
+    """
+
+    def __init__(self, *args, **kwargs):
+        raise TypeError(f'{type(self).__name__} can not be created directly, please use fused instead.')
+
+    cpdef object value(self):
+        """
+        Overview:
+            Get the calculated value of this expression, it will be calculated only once.
+
+        Returns:
+            - value: Calculated tree (or value when no tree is used in this expression).
+        """
+        if not self.calculated:
+            self.val = _c_expression_value(self)
+            self.calculated = True
+            # the arguments are no longer needed
+            self.args = None
+            self.kwargs = None
+
+        return self.val
+
+    def __add__(self, other):
+        return _c_expression_op(self, '__add__', (other,))
+
+    def __radd__(self, other):
+        return _c_expression_op(self, '__radd__', (other,))
+
+    def __sub__(self, other):
+        return _c_expression_op(self, '__sub__', (other,))
+
+    def __rsub__(self, other):
+        return _c_expression_op(self, '__rsub__', (other,))
+
+    def __mul__(self, other):
+        return _c_expression_op(self, '__mul__', (other,))
+
+    def __rmul__(self, other):
+        return _c_expression_op(self, '__rmul__', (other,))
+
+    def __matmul__(self, other):
+        return _c_expression_op(self, '__matmul__', (other,))
+
+    def __rmatmul__(self, other):
+        return _c_expression_op(self, '__rmatmul__', (other,))
+
+    def __truediv__(self, other):
+        return _c_expression_op(self, '__truediv__', (other,))
+
+    def __rtruediv__(self, other):
+        return _c_expression_op(self, '__rtruediv__', (other,))
+
+    def __floordiv__(self, other):
+        return _c_expression_op(self, '__floordiv__', (other,))
+
+    def __rfloordiv__(self, other):
+        return _c_expression_op(self, '__rfloordiv__', (other,))
+
+    def __mod__(self, other):
+        return _c_expression_op(self, '__mod__', (other,))
+
+    def __rmod__(self, other):
+        return _c_expression_op(self, '__rmod__', (other,))
+
+    def __pow__(self, other, mod=None):
+        if mod is not None:
+            return NotImplemented
+        return _c_expression_op(self, '__pow__', (other,))
+
+    def __rpow__(self, other, mod=None):
+        if mod is not None:
+            return NotImplemented
+        return _c_expression_op(self, '__rpow__', (other,))
+
+    def __and__(self, other):
+        return _c_expression_op(self, '__and__', (other,))
+
+    def __rand__(self, other):
+        return _c_expression_op(self, '__rand__', (other,))
+
+    def __or__(self, other):
+        return _c_expression_op(self, '__or__', (other,))
+
+    def __ror__(self, other):
+        return _c_expression_op(self, '__ror__', (other,))
+
+    def __xor__(self, other):
+        return _c_expression_op(self, '__xor__', (other,))
+
+    def __rxor__(self, other):
+        return _c_expression_op(self, '__rxor__', (other,))
+
+    def __lshift__(self, other):
+        return _c_expression_op(self, '__lshift__', (other,))
+
+    def __rlshift__(self, other):
+        return _c_expression_op(self, '__rlshift__', (other,))
+
+    def __rshift__(self, other):
+        return _c_expression_op(self, '__rshift__', (other,))
+
+    def __rrshift__(self, other):
+        return _c_expression_op(self, '__rrshift__', (other,))
+
+    def __pos__(self):
+        return _c_expression_op(self, '__pos__', ())
+
+    def __neg__(self):
+        return _c_expression_op(self, '__neg__', ())
+
+    def __invert__(self):
+        return _c_expression_op(self, '__invert__', ())
+
+    def __repr__(self):
+        cdef str name = getattr(self.func.func, '__name__', repr(self.func.func))
+        return f'<{type(self).__name__} {name} of {self.type_.__name__}>'
+
+cdef inline object _c_arg_value(object item):
+    if isinstance(item, TreeExpression):
+        item = (<TreeExpression>item).value()
+        if isinstance(item, TreeValue):
+            item = item._detach()
+
+    return item
+
 cdef object _c_common_value(object item):
     return item
 
@@ -207,6 +1339,10 @@ cdef inline tuple _c_missing_process(object missing):
     if missing is MISSING_NOT_ALLOW:
         allow_missing = False
         missing_func = None
+    elif missing is MISSING_DROP or missing is MISSING_PASS:
+        # the missing values are not created, the mark is checked when calculating
+        allow_missing = True
+        missing_func = missing
     else:
         allow_missing = True
         missing_func = missing if callable(missing) else partial(_c_common_value, missing)
@@ -215,7 +1351,9 @@ cdef inline tuple _c_missing_process(object missing):
 
 # build-time function
 cpdef object _d_func_treelize(object func, object mode, object return_type, bool inherit, object missing,
-                              bool delayed, object subside, object rise):
+                              bool delayed, object subside, object rise, object executor=None,
+                              object max_concurrency=None, bool self_copy=False, bool fusible=False,
+                              bool batched=False, object cache=None):
     cdef _e_tree_mode _v_mode = _c_load_mode(mode)
     cdef bool allow_missing
     cdef object missing_func
@@ -232,14 +1370,54 @@ cpdef object _d_func_treelize(object func, object mode, object return_type, bool
         _v_rise = rise
 
     _c_check(_v_mode, return_type, inherit, allow_missing, missing_func)
-    return partial(_w_func_treelize_run, __w_func=func, __w_mode=_v_mode, __w_return_type=return_type,
-                   __w_inherit=inherit, __w_allow_missing=allow_missing, __w_missing_func=missing_func,
-                   __w_delayed=delayed, __w_subside=_v_subside, __w_rise=_v_rise)
+    cdef LeafCache _v_cache = _c_cache_process(cache)
+    if delayed and executor is not None:
+        raise ValueError('Executor can not be used in delayed mode.')
+    if batched and (delayed or executor is not None):
+        raise ValueError('Delayed mode and executor can not be used in batched mode.')
+    if batched and _v_cache is not None:
+        raise ValueError('Cache can not be used in batched mode.')
+    cdef bool is_async
+    if iscoroutinefunction(func):
+        if delayed or executor is not None or batched:
+            raise ValueError('Delayed mode, executor and batched mode can not be used with coroutine function.')
+        if _v_cache is not None:
+            raise ValueError('Cache can not be used with coroutine function.')
+        if self_copy:
+            raise ValueError('Self copy mode can not be used with coroutine function.')
+        is_async = True
+    else:
+        is_async = False
+
+    cdef _TreelizedFunc treelized = _TreelizedFunc.__new__(_TreelizedFunc)
+    treelized.func = func
+    treelized.dispatcher = None
+    treelized._registry = {object: func}
+    treelized.cache = _v_cache
+    treelized.mode = _v_mode
+    treelized.return_type = return_type
+    treelized.inherit = inherit
+    treelized.allow_missing = allow_missing
+    treelized.missing_func = missing_func
+    treelized.delayed = delayed
+    treelized.subside = _v_subside
+    treelized.rise = _v_rise
+    treelized.executor = executor
+    treelized.max_concurrency = max_concurrency
+    treelized.self_copy = self_copy
+    treelized.is_async = is_async
+    treelized.batched = batched
+    treelized.fusible = fusible and not is_async and not delayed and executor is None and \
+                        _v_subside is None and _v_rise is None and not self_copy and return_type is not None
+    treelized._c_update_leaf_func()
+    return treelized
 
 @cython.binding(True)
 cpdef object func_treelize(object mode='strict', object return_type=TreeValue,
                            bool inherit=True, object missing=MISSING_NOT_ALLOW,
-                           bool delayed=False, object subside=None, object rise=None):
+                           bool delayed=False, object subside=None, object rise=None,
+                           object executor=None, object max_concurrency=None, bool batched=False,
+                           object cache=None):
     """
     Overview:
         Wrap a common function to tree-supported function.
@@ -259,6 +1437,39 @@ cpdef object func_treelize(object mode='strict', object return_type=TreeValue,
             and rise configuration, default is `None` which means do not use rise. \
             When rise is `True`, it will use all the default arguments in `rise` function. \
             (Not recommend to use auto mode when your return structure is not so strict.)
+        - executor: Executor to run the calculations of the values, such as \
+            :class:`concurrent.futures.ThreadPoolExecutor`, default is ``None`` which means \
+            calculate them one by one in current thread. Can not be used in delayed mode.
+        - max_concurrency (:obj:`Optional[int]`): Max count of the running coroutines when the wrapped \
+            function is a coroutine function, default is ``None`` which means no limit.
+        - batched (:obj:`bool`): Batched mode, default is ``False``. When enabled, the values of the \
+            arrays (``numpy.ndarray`` or ``torch.Tensor``) with the same type, dtype, shape and device \
+            (and the same other arguments) are stacked, and the function is called once for each group. \
+            Can not be used with delayed mode or executor.
+        - cache (:obj:`Union[bool, int, LeafCache, None]`): Cache of the results of the values, default is \
+            ``None`` which means do not use cache. When it is ``True`` or an integer, a new :class:`LeafCache` \
+            will be created (with the integer as max size), and an existing :class:`LeafCache` can be shared \
+            with other functions. Can not be used with batched mode or coroutine function.
+
+    .. note::
+        When the wrapped function is a coroutine function, the tree-supported function will return an \
+        awaitable object, the coroutines of all the values are awaited concurrently.
+
+    .. note::
+        In batched mode, the function should process the stacked arrays along the first dimension \
+        independently (such as the element-wise functions), and return an array with the same length \
+        of the first dimension, which will be split back to the values.
+
+    .. note::
+        For the sparse trees in ``outer`` and ``left`` mode, ``missing`` can be :data:`MISSING_DROP`, which \
+        means the function is called with the present arguments only (so it should accept variable \
+        arguments), or :data:`MISSING_PASS`, which means the value is used as the result directly \
+        when only one argument is present. No missing values will be created in these modes.
+
+    .. note::
+        The implementations for the values of the specific types can be registered with \
+        ``register`` of the wrapped function, like :func:`functools.singledispatch`. The implementation \
+        is selected by the type of the first positional argument of each value, and cached for each exact type.
 
     Returns:
         - decorator (:obj:`Callable`): Wrapper for tree-supported function.
@@ -274,4 +1485,5 @@ cpdef object func_treelize(object mode='strict', object return_type=TreeValue,
         >>> ssum(t1, t2)  # TreeValue({'a': 12, 'b': 24, 'x': {'c': 36, 'd': 9}})
     """
     return partial(_d_func_treelize, mode=mode, return_type=return_type,
-                   inherit=inherit, missing=missing, delayed=delayed, subside=subside, rise=rise)
+                   inherit=inherit, missing=missing, delayed=delayed, subside=subside, rise=rise,
+                   executor=executor, max_concurrency=max_concurrency, batched=batched, cache=cache)
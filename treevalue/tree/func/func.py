@@ -1,10 +1,11 @@
 import warnings
 from functools import wraps
+from inspect import iscoroutinefunction
 from typing import Type, TypeVar, Optional, Mapping, Union, Callable, Any
 
 from hbutils.design import SingletonMark
 
-from .cfunc import MISSING_NOT_ALLOW
+from .cfunc import MISSING_NOT_ALLOW, MISSING_DROP, MISSING_PASS, LeafCache, _d_func_treelize
 from .cfunc import func_treelize as _c_func_treelize
 from ..tree import TreeValue
 
@@ -13,7 +14,9 @@ TreeClassType_ = TypeVar("TreeClassType_", bound=TreeValue)
 
 def func_treelize(mode: str = 'strict', return_type: Optional[Type[TreeClassType_]] = TreeValue,
                   inherit: bool = True, missing: Union[Any, Callable] = MISSING_NOT_ALLOW, delayed: bool = False,
-                  subside: Union[Mapping, bool, None] = None, rise: Union[Mapping, bool, None] = None):
+                  subside: Union[Mapping, bool, None] = None, rise: Union[Mapping, bool, None] = None,
+                  executor=None, max_concurrency: Optional[int] = None, batched: bool = False,
+                  cache: Union[bool, int, LeafCache, None] = None):
     """
     Overview:
         Wrap a common function to tree-supported function.
@@ -33,6 +36,39 @@ def func_treelize(mode: str = 'strict', return_type: Optional[Type[TreeClassType
             and rise configuration, default is `None` which means do not use rise. \
             When rise is `True`, it will use all the default arguments in `rise` function. \
             (Not recommend to use auto mode when your return structure is not so strict.)
+        - executor: Executor to run the calculations of the values, such as \
+            :class:`concurrent.futures.ThreadPoolExecutor`, default is ``None`` which means \
+            calculate them one by one in current thread. Can not be used in delayed mode.
+        - max_concurrency (:obj:`Optional[int]`): Max count of the running coroutines when the wrapped \
+            function is a coroutine function, default is ``None`` which means no limit.
+        - batched (:obj:`bool`): Batched mode, default is ``False``. When enabled, the values of the \
+            arrays (``numpy.ndarray`` or ``torch.Tensor``) with the same type, dtype, shape and device \
+            (and the same other arguments) are stacked, and the function is called once for each group. \
+            Can not be used with delayed mode or executor.
+        - cache (:obj:`Union[bool, int, LeafCache, None]`): Cache of the results of the values, default is \
+            ``None`` which means do not use cache. When it is ``True`` or an integer, a new :class:`LeafCache` \
+            will be created (with the integer as max size), and an existing :class:`LeafCache` can be shared \
+            with other functions. Can not be used with batched mode or coroutine function.
+
+    .. note::
+        When the wrapped function is a coroutine function, the tree-supported function will be a \
+        coroutine function too, the coroutines of all the values are awaited concurrently.
+
+    .. note::
+        In batched mode, the function should process the stacked arrays along the first dimension \
+        independently (such as the element-wise functions), and return an array with the same length \
+        of the first dimension, which will be split back to the values.
+
+    .. note::
+        For the sparse trees in ``outer`` and ``left`` mode, ``missing`` can be :data:`MISSING_DROP`, which \
+        means the function is called with the present arguments only (so it should accept variable \
+        arguments), or :data:`MISSING_PASS`, which means the value is used as the result directly \
+        when only one argument is present. No missing values will be created in these modes.
+
+    .. note::
+        The implementations for the values of the specific types can be registered with \
+        ``register`` of the wrapped function, like :func:`functools.singledispatch`. The implementation \
+        is selected by the type of the first positional argument of each value, and cached for each exact type.
 
     Returns:
         - decorator (:obj:`Callable`): Wrapper for tree-supported function.
@@ -46,16 +82,29 @@ def func_treelize(mode: str = 'strict', return_type: Optional[Type[TreeClassType
         >>> t2 = TreeValue({'a': 11, 'b': 22, 'x': {'c': 33, 'd': 5}})
         >>> ssum(1, 2)    # 3
         >>> ssum(t1, t2)  # TreeValue({'a': 12, 'b': 24, 'x': {'c': 36, 'd': 9}})
+        >>>
+        >>> @ssum.register(str)
+        >>> def _(a, b):
+        >>>     return a + ' ' + b
+        >>>
+        >>> ssum(TreeValue({'a': 1, 'b': 'x'}), TreeValue({'a': 2, 'b': 'y'}))  # TreeValue({'a': 3, 'b': 'x y'})
     """
 
     def _decorator(func):
-        _treelized = _c_func_treelize(mode, return_type, inherit, missing, delayed, subside, rise)(func)
+        _treelized = _c_func_treelize(mode, return_type, inherit, missing, delayed,
+                                      subside, rise, executor, max_concurrency, batched, cache)(func)
 
-        @wraps(func)
-        def _new_func(*args, **kwargs):
-            return _treelized(*args, **kwargs)
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def _new_func(*args, **kwargs):
+                return await _treelized(*args, **kwargs)
 
-        return _new_func
+            _new_func.register = _treelized.register
+            _new_func.dispatch = _treelized.dispatch
+            _new_func.registry = _treelized.registry
+            return _new_func
+        else:
+            return wraps(func)(_treelized)
 
     return _decorator
 
@@ -70,7 +119,8 @@ AUTO_DETECT_RETURN_TYPE = SingletonMark("auto_detect_return_type")
 def method_treelize(mode: str = 'strict', return_type: Optional[Type[TreeClassType_]] = AUTO_DETECT_RETURN_TYPE,
                     inherit: bool = True, missing: Union[Any, Callable] = MISSING_NOT_ALLOW, delayed: bool = False,
                     subside: Union[Mapping, bool, None] = None, rise: Union[Mapping, bool, None] = None,
-                    self_copy: bool = False):
+                    self_copy: bool = False, fusible: bool = False,
+                    cache: Union[bool, int, LeafCache, None] = None):
     """
     Overview:
         Wrap a common instance method to tree-supported method.
@@ -98,7 +148,17 @@ def method_treelize(mode: str = 'strict', return_type: Optional[Type[TreeClassTy
             (Not recommend to use auto mode when your return structure is not so strict.)
         - self_copy (:obj:`bool`): Self copy mode, if enabled, the result data will be copied to \
             ``self`` argument and ``self`` will be returned as result. Default is ``False``, \
-            which means do not do self copy.
+            which means do not do self copy. In ``strict`` and ``left`` mode (not delayed, without \
+            subside), the results are written into the nodes of ``self`` directly after calculating, \
+            so no temporary tree will be created, and no value of ``self`` is replaced when error occurs.
+        - fusible (:obj:`bool`): Fusible mode, if enabled, the calls inside :func:`fused` or with \
+            :class:`TreeExpression` arguments will be recorded as lazy expressions, which can be calculated \
+            in one traversal. Default is ``False``. It will be ignored in delayed mode, or when ``subside``, \
+            ``rise`` or ``self_copy`` is used.
+        - cache (:obj:`Union[bool, int, LeafCache, None]`): Cache of the results of the values, default is \
+            ``None`` which means do not use cache. When it is ``True`` or an integer, a new :class:`LeafCache` \
+            will be created (with the integer as max size), and an existing :class:`LeafCache` can be shared \
+            with other methods. It is not used in self copy mode.
 
     Returns:
         - decorator (:obj:`Callable`): Wrapper for tree-supported method.
@@ -127,18 +187,9 @@ def method_treelize(mode: str = 'strict', return_type: Optional[Type[TreeClassTy
         rise = None
 
     def _decorator(method):
-        _treelized = _c_func_treelize(mode, _get_self_class, inherit, missing, delayed, subside, rise)(method)
-
-        @wraps(method)
-        def _new_method(self, *args, **kwargs):
-            _result = _treelized(self, *args, **kwargs)
-            if self_copy:
-                self._detach().copy_from(_result._detach())
-                return self
-            else:
-                return _result
-
-        return _new_method
+        _treelized = _d_func_treelize(method, mode, _get_self_class, inherit, missing, delayed,
+                                      subside, rise, self_copy=self_copy, fusible=fusible, cache=cache)
+        return wraps(method)(_treelized)
 
     return _decorator
 
@@ -6,6 +6,7 @@ from itertools import chain
 
 from libcpp cimport bool
 
+from ..common.layout cimport KeyLayout, get_layout
 from ..common.storage cimport TreeStorage
 from ..tree.tree cimport TreeValue
 
@@ -35,29 +36,28 @@ cdef inline void _c_base_check(_e_tree_mode mode, object return_type,
                 type=repr(return_type.__name__)
             ))
 
-cdef inline set _c_strict_keyset(list args, dict kwargs):
+cdef inline KeyLayout _c_strict_keyset(list args, dict kwargs):
     cdef object k, v
-    cdef dict _d_v
 
     cdef object first_key
-    cdef set keys = None
-    cdef set curkeys
+    cdef KeyLayout layout = None
+    cdef KeyLayout curlayout
     for k, v in chain(enumerate(args), kwargs.items()):
         if isinstance(v, TreeStorage):
-            _d_v = v.detach()
-            curkeys = set(_d_v.keys())
-            if keys is None:
+            curlayout = (<TreeStorage>v).layout()
+            if layout is None:
                 first_key = k
-                keys = curkeys
+                layout = curlayout
             else:
-                if keys != curkeys:
+                # layouts are interned, so the same key set in the same order is the same object
+                if curlayout is not layout and curlayout._c_get_keyset() != layout._c_get_keyset():
                     raise KeyError(
                         "Argument keys not match in strict mode, key set of argument {a1} is {ks1} but {a2} in {ks2}.".format(
-                            a1=repr(first_key), ks1=repr(keys),
-                            a2=repr(k), ks2=repr(curkeys),
+                            a1=repr(first_key), ks1=repr(set(layout.keys)),
+                            a2=repr(k), ks2=repr(set(curlayout.keys)),
                         ))
 
-    return keys
+    return layout
 
 cdef inline void _c_strict_check(_e_tree_mode mode, object return_type,
                           bool inherit, bool allow_missing, object missing_func) except *:
@@ -65,45 +65,40 @@ cdef inline void _c_strict_check(_e_tree_mode mode, object return_type,
     if allow_missing:
         warnings.warn(RuntimeWarning("Allow missing detected, but cannot applied in strict mode."))
 
-cdef inline set _c_inner_keyset(list args, dict kwargs):
+cdef inline KeyLayout _c_inner_keyset(list args, dict kwargs):
     cdef object k, v
-    cdef dict _d_v
 
-    cdef object first_key
-    cdef set keys = None
-    cdef set curkeys
+    cdef KeyLayout layout = None
+    cdef KeyLayout curlayout
     for k, v in chain(enumerate(args), kwargs.items()):
         if isinstance(v, TreeStorage):
-            _d_v = v.detach()
-            curkeys = set(_d_v.keys())
-            if keys is None:
-                keys = curkeys
+            curlayout = (<TreeStorage>v).layout()
+            if layout is None:
+                layout = curlayout
             else:
-                keys &= curkeys
+                # combinations of layouts are cached, so only the first calculation costs
+                layout = layout.intersection(curlayout)
 
-    return keys
+    return layout
 
 cdef inline void _c_inner_check(_e_tree_mode mode, object return_type,
                          bool inherit, bool allow_missing, object missing_func) except *:
     _c_base_check(mode, return_type, inherit, allow_missing, missing_func)
 
-cdef inline set _c_outer_keyset(list args, dict kwargs):
+cdef inline KeyLayout _c_outer_keyset(list args, dict kwargs):
     cdef object k, v
-    cdef dict _d_v
 
-    cdef object first_key
-    cdef set keys = None
-    cdef set curkeys
+    cdef KeyLayout layout = None
+    cdef KeyLayout curlayout
     for k, v in chain(enumerate(args), kwargs.items()):
         if isinstance(v, TreeStorage):
-            _d_v = v.detach()
-            curkeys = set(_d_v.keys())
-            if keys is None:
-                keys = curkeys
+            curlayout = (<TreeStorage>v).layout()
+            if layout is None:
+                layout = curlayout
             else:
-                keys |= curkeys
+                layout = layout.union(curlayout)
 
-    return keys
+    return layout
 
 cdef inline void _c_outer_check(_e_tree_mode mode, object return_type,
                          bool inherit, bool allow_missing, object missing_func) except *:
@@ -111,23 +106,20 @@ cdef inline void _c_outer_check(_e_tree_mode mode, object return_type,
     if not allow_missing:
         warnings.warn(RuntimeWarning("Missing is still not allowed, but this may cause KeyError in outer mode."))
 
-cdef inline set _c_left_keyset(list args, dict kwargs):
+cdef inline KeyLayout _c_left_keyset(list args, dict kwargs):
     cdef object k, v
-    cdef dict _d_v
 
-    cdef object first_key
     for k, v in chain(enumerate(args), sorted(kwargs.items())):
         if isinstance(v, TreeStorage):
-            _d_v = v.detach()
-            return set(_d_v.keys())
+            return (<TreeStorage>v).layout()
 
-    return set()  # pragma: no cover
+    return get_layout(())  # pragma: no cover
 
 cdef inline void _c_left_check(_e_tree_mode mode, object return_type,
                         bool inherit, bool allow_missing, object missing_func) except *:
     _c_base_check(mode, return_type, inherit, allow_missing, missing_func)
 
-cdef inline set _c_keyset(_e_tree_mode mode, list args, dict kwargs):
+cdef inline KeyLayout _c_keyset(_e_tree_mode mode, list args, dict kwargs):
     if mode == STRICT:
         return _c_strict_keyset(args, kwargs)
     elif mode == INNER:
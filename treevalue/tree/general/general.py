@@ -5,8 +5,9 @@ from typing import Mapping, Optional, Any, Type, TypeVar, Union, Callable, Tuple
 from graphviz import Digraph
 from hbutils.reflection import dynamic_call, raising
 
-from ..func import method_treelize, MISSING_NOT_ALLOW, func_treelize
-from ..tree import TreeValue, jsonify, clone, typetrans, mapping, mask, filter_, reduce_, union, graphics, walk
+from ..func import method_treelize, MISSING_NOT_ALLOW, func_treelize, LeafCache
+from ..tree import TreeValue, jsonify, clone, typetrans, mapping, mask, filter_, reduce_, union, graphics, walk, \
+    materialize, materialize_async
 from ..tree import rise as rise_func
 from ..tree import subside as subside_func
 
@@ -57,6 +58,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
     _decorate_treelize = partial(_decorate, treelize=True)
     _decorate_method = partial(_decorate, treelize=False)
     _decorate_and_replace = partial(_decorate, treelize=True, ext_cfg=dict(self_copy=True))
+    _decorate_fusible = partial(_decorate, treelize=True, ext_cfg=dict(fusible=True))
 
     _TreeValue = TypeVar("_TreeValue", bound=TreeValue)
 
@@ -109,7 +111,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             return jsonify(self)
 
         @_decorate_method
-        def clone(self, copy_value: Union[None, bool, Callable, Any] = None):
+        def clone(self, copy_value: Union[None, bool, Callable, Any] = None, cow: bool = False):
             """
             Overview:
                 Create a fully clone of the current tree.
@@ -119,12 +121,15 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
                 - copy_value (:obj:`Union[None, bool, Callable, Any]`): Deep copy value or not, \
                     default is `None` which means do not deep copy the values. \
                     If deep copy is required, just set it to `True`.
+                - cow (:obj:`bool`): Use structural clone, only the nodes are copied and the values are shared \
+                    without being dumped, default is `False`.
 
             Example:
                 >>> t = FastTreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
                 >>> t.x.clone()  # FastTreeValue({'c': 3, 'd': 4})
+                >>> t.clone(cow=True)  # FastTreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
             """
-            return clone(self, copy_value)
+            return clone(self, copy_value, cow)
 
         @_decorate_method
         def type(self, clazz: Type[_TreeValue]) -> _TreeValue:
@@ -167,6 +172,27 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return mapping(self, mapper, delayed)
 
+        @_decorate_method
+        def vmap(self, func):
+            """
+            Overview:
+                Do mapping on every value in this tree in batched mode, the arrays (``numpy.ndarray`` or \
+                ``torch.Tensor``) with the same type, dtype, shape and device are stacked, and ``func`` is called \
+                once for each group, so the values should be processed along the first dimension independently.
+
+            Arguments:
+                - func (:obj:): Function for mapping, such as the element-wise functions.
+
+            Returns:
+                - tree (:obj:`_TreeValue`): Mapped tree value object.
+
+            Example:
+                >>> t = FastTreeValue({'a': np.array([1, 2]), 'b': np.array([3, 4]), 'x': {'c': np.array([5])}})
+                >>> t.vmap(lambda x: np.clip(x, 2, 4))  # np.clip is called twice, for 'a'/'b' and 'c'
+                >>> # FastTreeValue({'a': np.array([2, 2]), 'b': np.array([3, 4]), 'x': {'c': np.array([4])}})
+            """
+            return self.func(batched=True)(func)(self)
+
         @_decorate_method
         def mask(self, mask_: TreeValue, remove_empty: bool = True):
             """
@@ -242,6 +268,49 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return walk(self)
 
+        @_decorate_method
+        def materialize(self, executor=None):
+            """
+            Overview:
+                Calculate all the delayed values in the tree in place.
+
+            Arguments:
+                - executor: Executor to run the calculations, such as \
+                    :class:`concurrent.futures.ThreadPoolExecutor`, default is ``None`` which means \
+                    calculate them one by one in current thread.
+
+            Returns:
+                - tree (:obj:`_TreeValue`): Current tree itself.
+
+            Examples:
+                >>> from concurrent.futures import ThreadPoolExecutor
+                >>> from treevalue import FastTreeValue, delayed
+                >>> t = FastTreeValue({'a': delayed(lambda: 1), 'x': {'c': delayed(lambda: 3)}})
+                >>> with ThreadPoolExecutor() as pool:
+                ...     t.materialize(pool)  # FastTreeValue({'a': 1, 'x': {'c': 3}})
+            """
+            return materialize(self, executor)
+
+        @_decorate_method
+        def materialize_async(self):
+            """
+            Overview:
+                Calculate all the delayed values in the tree in place, in the event loop.
+
+            Returns:
+                - coroutine: Awaitable object, the result is current tree itself.
+
+            Examples:
+                >>> import asyncio
+                >>> from treevalue import FastTreeValue, delayed
+                >>> async def f(x):
+                ...     await asyncio.sleep(0.1)
+                ...     return x
+                >>> t = FastTreeValue({'a': delayed(f, 1), 'x': {'c': delayed(f, 3)}})
+                >>> await t.materialize_async()  # FastTreeValue({'a': 1, 'x': {'c': 3}})
+            """
+            return materialize_async(self)
+
         @_decorate_method
         def reduce(self, func):
             """
@@ -343,7 +412,9 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
         @_decorate_method
         def func(cls, mode: str = 'strict', inherit: bool = True,
                  missing: Union[Any, Callable] = MISSING_NOT_ALLOW, delayed: bool = False,
-                 subside: Union[Mapping, bool, None] = None, rise: Union[Mapping, bool, None] = None):
+                 subside: Union[Mapping, bool, None] = None, rise: Union[Mapping, bool, None] = None,
+                 executor=None, max_concurrency: Optional[int] = None, batched: bool = False,
+                 cache: Union[bool, int, LeafCache, None] = None):
             """
             Overview:
                 Wrap a common function to tree-supported function based on this type.
@@ -362,6 +433,15 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
                     and rise configuration, default is `None` which means do not use rise. \
                     When rise is `True`, it will use all the default arguments in `rise` function. \
                     (Not recommend to use auto mode when your return structure is not so strict.)
+                - executor: Executor to run the calculations of the values, such as \
+                    :class:`concurrent.futures.ThreadPoolExecutor`, default is ``None`` which means \
+                    calculate them one by one in current thread. Can not be used in delayed mode.
+                - max_concurrency (:obj:`Optional[int]`): Max count of the running coroutines when the wrapped \
+                    function is a coroutine function, default is ``None`` which means no limit.
+                - batched (:obj:`bool`): Batched mode, the arrays with the same type, dtype, shape and device \
+                    are stacked and calculated together, default is ``False``.
+                - cache (:obj:`Union[bool, int, LeafCache, None]`): Cache of the results of the values, \
+                    default is ``None`` which means do not use cache.
 
             Returns:
                 - decorator (:obj:`Callable`): Wrapper for tree-supported function.
@@ -378,7 +458,8 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
                 >>> ssum(1, 2)    # 3
                 >>> ssum(t1, t2)  # FastTreeValue({'a': 12, 'b': 24, 'x': {'c': 36, 'd': 9}})
             """
-            return func_treelize(mode, cls, inherit, missing, delayed, subside, rise)
+            return func_treelize(mode, cls, inherit, missing, delayed, subside, rise,
+                                 executor, max_concurrency, batched, cache)
 
         @classmethod
         @_decorate_method
@@ -486,7 +567,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
                 repr_gen=repr_gen, node_cfg_gen=node_cfg_gen, edge_cfg_gen=edge_cfg_gen,
             )
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __add__(self_, other):
             """
             Overview:
@@ -499,7 +580,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ + other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __radd__(self_, other):
             """
             Overview:
@@ -527,7 +608,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ += other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __sub__(self_, other):
             """
             Overview:
@@ -540,7 +621,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ - other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rsub__(self_, other):
             """
             Overview:
@@ -568,7 +649,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ -= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __mul__(self_, other):
             """
             Overview:
@@ -581,7 +662,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ * other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rmul__(self_, other):
             """
             Overview:
@@ -609,7 +690,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ *= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __matmul__(self_, other):
             """
             Overview:
@@ -617,7 +698,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ @ other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rmatmul__(self_, other):
             """
             Overview:
@@ -635,7 +716,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ @= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __truediv__(self_, other):
             """
             Overview:
@@ -648,7 +729,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ / other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rtruediv__(self_, other):
             """
             Overview:
@@ -676,7 +757,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ /= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __floordiv__(self_, other):
             """
             Overview:
@@ -689,7 +770,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ // other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rfloordiv__(self_, other):
             """
             Overview:
@@ -717,7 +798,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ //= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __mod__(self_, other):
             """
             Overview:
@@ -730,7 +811,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ % other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rmod__(self_, other):
             """
             Overview:
@@ -758,7 +839,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ %= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __pow__(self_, power):
             """
             Overview:
@@ -771,7 +852,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ ** power
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rpow__(self_, other):
             """
             Overview:
@@ -799,7 +880,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ **= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __and__(self_, other):
             """
             Overview:
@@ -812,7 +893,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ & other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rand__(self_, other):
             """
             Overview:
@@ -840,7 +921,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ &= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __or__(self_, other):
             """
             Overview:
@@ -853,7 +934,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ | other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __ror__(self_, other):
             """
             Overview:
@@ -881,7 +962,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ |= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __xor__(self_, other):
             """
             Overview:
@@ -894,7 +975,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ ^ other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rxor__(self_, other):
             """
             Overview:
@@ -922,7 +1003,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ ^= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __lshift__(self_, other):
             """
             Overview:
@@ -935,7 +1016,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ << other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rlshift__(self_, other):
             """
             Overview:
@@ -963,7 +1044,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ <<= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rshift__(self_, other):
             """
             Overview:
@@ -976,7 +1057,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return self_ >> other
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __rrshift__(self_, other):
             """
             Overview:
@@ -1004,7 +1085,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             self_ >>= other
             return self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __pos__(self_):
             """
             Overview:
@@ -1016,7 +1097,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return +self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __neg__(self_):
             """
             Overview:
@@ -1028,7 +1109,7 @@ def general_tree_value(base: Optional[Mapping[str, Any]] = None,
             """
             return -self_
 
-        @_decorate_treelize
+        @_decorate_fusible
         def __invert__(self_):
             """
             Overview:
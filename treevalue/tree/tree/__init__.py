@@ -3,6 +3,6 @@ from .flatten import flatten, unflatten, flatten_values, flatten_keys
 from .functional import mapping, filter_, mask, reduce_
 from .graph import graphics
 from .io import loads, load, dumps, dump
-from .service import jsonify, clone, typetrans, walk
+from .service import jsonify, clone, typetrans, walk, materialize, materialize_async
 from .structural import subside, union, rise
 from .tree import TreeValue, delayed, ValidationError, register_dict_type
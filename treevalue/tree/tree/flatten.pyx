@@ -6,21 +6,17 @@
 import cython
 
 from .tree cimport TreeValue
-from ..common.storage cimport TreeStorage, _c_undelay_data
+from ..common.storage cimport TreeStorage, StorageWalker, _e_walk_event, WALK_END, WALK_LEAF
 
 cdef inline void _c_flatten(TreeStorage st, tuple path, list res) except *:
-    cdef dict data = st.detach()
-    cdef tuple curpath
-
-    cdef str k
-    cdef object v, nv
-    for k, v in data.items():
-        v = _c_undelay_data(data, k, v)
-        curpath = path + (k,)
-        if isinstance(v, TreeStorage):
-            _c_flatten(v, curpath, res)
-        else:
-            res.append((curpath, v))
+    cdef StorageWalker walker = StorageWalker(st, True, False, path)
+    cdef _e_walk_event event
+    while True:
+        event = walker.c_next()
+        if event == WALK_LEAF:
+            res.append((walker.c_path(), walker.value))
+        elif event == WALK_END:
+            break
 
 @cython.binding(True)
 cpdef list flatten(TreeValue tree):
@@ -45,16 +41,14 @@ cpdef list flatten(TreeValue tree):
     return result
 
 cdef inline void _c_flatten_values(TreeStorage st, list res) except *:
-    cdef dict data = st.detach()
-
-    cdef str k
-    cdef object v, nv
-    for k, v in data.items():
-        v = _c_undelay_data(data, k, v)
-        if isinstance(v, TreeStorage):
-            _c_flatten_values(v, res)
-        else:
-            res.append(v)
+    cdef StorageWalker walker = StorageWalker(st, True, False, ())
+    cdef _e_walk_event event
+    while True:
+        event = walker.c_next()
+        if event == WALK_LEAF:
+            res.append(walker.value)
+        elif event == WALK_END:
+            break
 
 @cython.binding(True)
 cpdef list flatten_values(TreeValue tree):
@@ -73,18 +67,14 @@ cpdef list flatten_values(TreeValue tree):
     return result
 
 cdef inline void _c_flatten_keys(TreeStorage st, tuple path, list res) except *:
-    cdef dict data = st.detach()
-    cdef tuple curpath
-
-    cdef str k
-    cdef object v, nv
-    for k, v in data.items():
-        v = _c_undelay_data(data, k, v)
-        curpath = path + (k,)
-        if isinstance(v, TreeStorage):
-            _c_flatten_keys(v, curpath, res)
-        else:
-            res.append(curpath)
+    cdef StorageWalker walker = StorageWalker(st, True, False, path)
+    cdef _e_walk_event event
+    while True:
+        event = walker.c_next()
+        if event == WALK_LEAF:
+            res.append(walker.c_path())
+        elif event == WALK_END:
+            break
 
 @cython.binding(True)
 cpdef list flatten_keys(TreeValue tree):
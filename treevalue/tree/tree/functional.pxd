@@ -12,8 +12,10 @@ cdef object _c_no_arg(object func, object v, object p)
 cdef object _c_one_arg(object func, object v, object p)
 cdef object _c_two_args(object func, object v, object p)
 cdef object _c_wrap_mapping_func(object func)
-cdef object _c_delayed_mapping(object so, object func, tuple path, bool delayed)
-cdef TreeStorage _c_mapping(TreeStorage st, object func, tuple path, bool delayed)
+cdef tuple _c_stages_at(tuple stages, tuple subpath)
+cdef object _c_delayed_mapping(object so, tuple stages, tuple checkpoints, bool delayed)
+cdef object _c_fused_delayed_mapping(object v, tuple stages, bool delayed)
+cdef TreeStorage _c_mapping(TreeStorage st, tuple stages, bool delayed)
 cpdef TreeValue mapping(TreeValue tree, object func, bool delayed= *)
 cdef TreeStorage _c_filter_(TreeStorage st, object func, tuple path, bool remove_empty)
 cpdef TreeValue filter_(TreeValue tree, object func, bool remove_empty= *)
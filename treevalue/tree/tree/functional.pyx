@@ -8,9 +8,10 @@ from functools import partial
 from libcpp cimport bool
 
 from .tree cimport TreeValue
-from ..common.delay cimport undelay
+from ..common.delay cimport undelay, DelayedFuncProxy
 from ..common.delay import delayed_partial
-from ..common.storage cimport TreeStorage, _c_undelay_data
+from ..common.storage cimport TreeStorage, StorageWalker, _e_walk_event, WALK_ENTER, WALK_LEAF, WALK_EXIT, \
+    _c_undelay_data
 
 cdef inline object _c_no_arg(object func, object v, object p):
     return func()
@@ -35,37 +36,90 @@ cdef inline object _c_wrap_mapping_func(object func):
     else:
         return partial(_c_no_arg, func)
 
-cdef object _c_delayed_mapping(object so, object func, tuple path, bool delayed):
+cdef inline tuple _c_stages_at(tuple stages, tuple subpath):
+    # the stages are pairs of function and path, the paths are extended to the position of the value
+    cdef object func
+    cdef tuple path
+    return tuple([(func, path + subpath) for func, path in stages])
+
+cdef object _c_delayed_mapping(object so, tuple stages, tuple checkpoints, bool delayed):
+    # the checkpoints are pairs of the fused proxy and the count of its stages, the latest one first,
+    # the value of the calculated one is reused, so the stages before it will not be calculated again
+    cdef object proxy
+    cdef Py_ssize_t n
+    for proxy, n in checkpoints:
+        if (<DelayedFuncProxy>proxy).calculated:
+            so, stages = proxy.value(), stages[n:]
+            break
+
     cdef object nso = undelay(so)
-    if isinstance(nso, TreeValue):
-        nso = nso._detach()
+    cdef Py_ssize_t i
+    cdef object func
+    cdef tuple path
+    for i in range(len(stages)):
+        if isinstance(nso, TreeValue):
+            nso = nso._detach()
+
+        if isinstance(nso, TreeStorage):
+            # the rest of the stages are mapped to the sub tree
+            return _c_mapping(nso, stages[i:], delayed)
+        else:
+            func, path = stages[i]
+            nso = func(nso, path)
 
-    if isinstance(nso, TreeStorage):
-        return _c_mapping(nso, func, path, delayed)
-    else:
-        return func(nso, path)
+    return nso
 
-cdef TreeStorage _c_mapping(TreeStorage st, object func, tuple path, bool delayed):
-    cdef dict _d_st = st.detach()
-    cdef dict _d_res = {}
+def _w_delayed_mapping(object so, tuple stages, tuple checkpoints, bool delayed):
+    return _c_delayed_mapping(so, stages, checkpoints, delayed)
 
-    cdef str k
-    cdef object v, nv
-    cdef tuple curpath
-    for k, v in _d_st.items():
-        if not delayed:
-            v = _c_undelay_data(_d_st, k, v)
+cdef inline object _c_fused_delayed_mapping(object v, tuple stages, bool delayed):
+    cdef tuple args
+    if isinstance(v, DelayedFuncProxy) and (<DelayedFuncProxy>v).func is _w_delayed_mapping:
+        # the arguments are released after calculation
+        args = (<DelayedFuncProxy>v).args
+        if args is not None:
+            # not calculated yet, so fuse the stages into one proxy, each stage keeps its own path,
+            # and v is kept as a checkpoint, its value will be reused if it is calculated before this one
+            return delayed_partial(_w_delayed_mapping, args[0], args[1] + stages,
+                                   ((v, len(args[1])),) + args[2], delayed)
 
-        curpath = path + (k,)
-        if isinstance(v, TreeStorage):
-            _d_res[k] = _c_mapping(v, func, curpath, delayed)
-        else:
+    return delayed_partial(_w_delayed_mapping, v, stages, (), delayed)
+
+cdef TreeStorage _c_mapping(TreeStorage st, tuple stages, bool delayed):
+    cdef dict _d_res = {}
+    cdef TreeStorage _st_res = TreeStorage(_d_res)
+    # the keys are kept in the same order, so the layout can be shared
+    _st_res._layout = st._layout
+
+    cdef dict current = _d_res
+    cdef dict child
+    cdef list stack = []
+    cdef TreeStorage _st_child
+    cdef StorageWalker walker = StorageWalker(st, not delayed, False, ())
+
+    cdef _e_walk_event event
+    while True:
+        event = walker.c_next()
+        if event == WALK_LEAF:
             if delayed:
-                _d_res[k] = delayed_partial(_c_delayed_mapping, v, func, curpath, delayed)
+                current[walker.key] = _c_fused_delayed_mapping(walker.value, _c_stages_at(stages, walker.c_path()),
+                                                               delayed)
             else:
-                _d_res[k] = func(v, curpath)
+                current[walker.key] = _c_delayed_mapping(walker.value, _c_stages_at(stages, walker.c_path()), (),
+                                                         delayed)
+        elif event == WALK_ENTER:
+            child = {}
+            _st_child = TreeStorage(child)
+            _st_child._layout = (<TreeStorage>walker.value)._layout
+            current[walker.key] = _st_child
+            stack.append(current)
+            current = child
+        elif event == WALK_EXIT:
+            current = stack.pop()
+        else:
+            break
 
-    return TreeStorage(_d_res)
+    return _st_res
 
 @cython.binding(True)
 cpdef TreeValue mapping(TreeValue tree, object func, bool delayed=False):
@@ -89,6 +143,11 @@ cpdef TreeValue mapping(TreeValue tree, object func, bool delayed=False):
         be detected automatically, and use the correct way to call it when doing mapping, otherwise it will be \
         directly used with the pattern of ``lambda v: f(v)``.
 
+    .. note::
+        In delayed mode, when the values are not calculated delayed mappings, the functions will be fused \
+        into one delayed proxy, so the chained delayed mappings will be calculated in one call for each value. \
+        The fused values are not shared with the intermediate trees.
+
     Returns:
         - tree (:obj:`_TreeValue`): Mapped tree value object.
 
@@ -98,7 +157,7 @@ cpdef TreeValue mapping(TreeValue tree, object func, bool delayed=False):
         >>> mapping(t, lambda: 1)        # TreeValue({'a': 1, 'b': 1, 'x': {'c': 1, 'd': 1}})
         >>> mapping(t, lambda x, p: p)   # TreeValue({'a': ('a',), 'b': ('b',), 'x': {'c': ('x', 'c'), 'd': ('x', 'd')}})
     """
-    return type(tree)(_c_mapping(tree._detach(), _c_wrap_mapping_func(func), (), delayed))
+    return type(tree)(_c_mapping(tree._detach(), ((_c_wrap_mapping_func(func), ()),), delayed))
 
 cdef TreeStorage _c_filter_(TreeStorage st, object func, tuple path, bool remove_empty):
     cdef dict _d_st = st.detach()
@@ -1,14 +1,18 @@
 # distutils:language=c++
 # cython:language_level=3
 
-# jsonify, clone, typetrans, walk
+# jsonify, clone, typetrans, walk, materialize, materialize_async
 
 from libcpp cimport bool
 
 from .tree cimport TreeValue
+from ..common.storage cimport TreeStorage
 
 cdef object _keep_object(object obj)
 cpdef object jsonify(TreeValue val)
-cpdef TreeValue clone(TreeValue t, object copy_value= *)
+cpdef TreeValue clone(TreeValue t, object copy_value= *, bool cow= *)
 cpdef TreeValue typetrans(TreeValue t, object return_type)
 cpdef walk(TreeValue tree)
+
+cdef void _c_materialize_scan(TreeStorage st, list delays) except *
+cpdef TreeValue materialize(TreeValue tree, object executor= *)
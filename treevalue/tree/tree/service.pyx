@@ -1,14 +1,17 @@
 # distutils:language=c++
 # cython:language_level=3
 
-# jsonify, clone, typetrans, walk
+# jsonify, clone, typetrans, walk, materialize, materialize_async
 
+import asyncio
 import copy
 
 import cython
 from libcpp cimport bool
 
 from .tree cimport TreeValue
+from ..common.delay import undelay, async_undelay
+from ..common.delay cimport DelayedProxy
 from ..common.storage cimport TreeStorage, _c_undelay_data
 
 cdef object _keep_object(object obj):
@@ -32,7 +35,7 @@ cpdef object jsonify(TreeValue val):
     return val._detach().jsondumpx(_keep_object, False, False)
 
 @cython.binding(True)
-cpdef TreeValue clone(TreeValue t, object copy_value=None):
+cpdef TreeValue clone(TreeValue t, object copy_value=None, bool cow=False):
     """
     Overview:
         Create a fully clone of the given tree.
@@ -42,6 +45,8 @@ cpdef TreeValue clone(TreeValue t, object copy_value=None):
         - copy_value (:obj:`Union[None, bool, Callable, Any]`): Deep copy value or not, \
             default is `None` which means do not deep copy the values. \
             If deep copy is required, just set it to `True`.
+        - cow (:obj:`bool`): Use structural clone, only the nodes are copied and the values are shared \
+            without being dumped, default is `False`. Can not be used with ``copy_value``.
 
     Returns:
         - tree (:obj:`_TreeValue`): Cloned tree value object.
@@ -49,6 +54,7 @@ cpdef TreeValue clone(TreeValue t, object copy_value=None):
     Example:
         >>> t = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
         >>> clone(t.x)  # TreeValue({'c': 3, 'd': 4})
+        >>> clone(t, cow=True)  # TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}}), values are shared
     """
     cdef bool need_copy
     if not callable(copy_value):
@@ -61,7 +67,12 @@ cpdef TreeValue clone(TreeValue t, object copy_value=None):
     else:
         need_copy = True
 
-    return type(t)(t._detach().deepcopyx(copy_value, not need_copy))
+    if cow:
+        if need_copy:
+            raise ValueError('Copy-on-write clone can not be used when copy_value is enabled.')
+        return type(t)(t._detach().cowcopy())
+    else:
+        return type(t)(t._detach().deepcopyx(copy_value, not need_copy))
 
 @cython.binding(True)
 cpdef TreeValue typetrans(TreeValue t, object return_type):
@@ -92,12 +103,10 @@ cpdef TreeValue typetrans(TreeValue t, object return_type):
 def _p_walk(TreeStorage tree, object type_, tuple path):
     yield path, type_(tree)
 
-    cdef dict data = tree.detach()
     cdef str k
     cdef object v, nv
     cdef tuple curpath
-    for k, v in data.items():
-        v = _c_undelay_data(data, k, v)
+    for k, v in tree.iter_items():
         curpath = path + (k,)
         if isinstance(v, TreeStorage):
             yield from _p_walk(v, type_, curpath)
@@ -139,3 +148,143 @@ cpdef walk(TreeValue tree):
         ('c', 'y') 2
     """
     return _p_walk(tree._detach(), type(tree), ())
+
+cdef inline void _c_materialize_scan(TreeStorage st, list delays) except *:
+    cdef list stack = [st]
+    cdef dict data
+    cdef str k
+    cdef object v
+    while stack:
+        data = (<TreeStorage>stack.pop()).map
+        for k, v in data.items():
+            if isinstance(v, DelayedProxy):
+                delays.append((data, k, v))
+            elif isinstance(v, TreeStorage):
+                stack.append(v)
+
+@cython.binding(True)
+cpdef TreeValue materialize(TreeValue tree, object executor=None):
+    """
+    Overview:
+        Calculate all the delayed values in the tree, and replace them with the results in place.
+
+    Arguments:
+        - tree (:obj:`TreeValue`): Tree value object.
+        - executor: Executor to run the calculations, such as :class:`concurrent.futures.ThreadPoolExecutor`, \
+            the object with a ``submit`` method like :class:`concurrent.futures.Executor` is supported. \
+            Default is ``None`` which means calculate them one by one in current thread.
+
+    Returns:
+        - tree (:obj:`TreeValue`): The given ``tree`` itself, all the delayed values in it are calculated.
+
+    .. note::
+        The delayed values are submitted to ``executor`` all at once, and the delayed values \
+        appeared in the results (e.g. a delayed sub tree) will be submitted in the next round.
+        The same delayed object in different positions will be only submitted once.
+
+    .. note::
+        When a process pool is used, the functions and arguments of the delayed objects and their results \
+        should be picklable, and the delayed objects will be calculated again when they are accessed from \
+        the other trees.
+
+    Examples:
+        >>> from concurrent.futures import ThreadPoolExecutor
+        >>> from treevalue import TreeValue, delayed, materialize
+        >>> t = TreeValue({'a': delayed(lambda: 1), 'x': {'c': delayed(lambda: 3)}})
+        >>> with ThreadPoolExecutor() as pool:
+        ...     materialize(t, pool)  # TreeValue({'a': 1, 'x': {'c': 3}})
+    """
+    cdef list storages = [tree._detach()]
+    cdef list delays
+    cdef dict futures
+    cdef list results
+
+    cdef TreeStorage st
+    cdef dict data
+    cdef str k
+    cdef object v, key
+    while storages:
+        delays = []
+        for st in storages:
+            _c_materialize_scan(st, delays)
+        storages = []
+
+        if executor is None:
+            for data, k, v in delays:
+                v = _c_undelay_data(data, k, v)
+                if isinstance(v, TreeStorage):
+                    storages.append(v)
+        else:
+            futures = {}
+            for data, k, v in delays:
+                key = id(v)
+                if key not in futures:
+                    futures[key] = executor.submit(undelay, v)
+
+            results = []
+            for data, k, v in delays:
+                results.append((data, k, futures[id(v)].result()))
+            for data, k, v in results:
+                data[k] = v
+                if isinstance(v, TreeStorage):
+                    storages.append(v)
+
+    return tree
+
+@cython.binding(True)
+async def materialize_async(TreeValue tree):
+    """
+    Overview:
+        Calculate all the delayed values in the tree in the event loop, and replace them with the results in place.
+        The pending values are awaited concurrently with :func:`asyncio.gather`.
+
+    Arguments:
+        - tree (:obj:`TreeValue`): Tree value object.
+
+    Returns:
+        - tree (:obj:`TreeValue`): The given ``tree`` itself, all the delayed values in it are calculated.
+
+    .. note::
+        Just like :func:`materialize`, the delayed values appeared in the results will be awaited in the next \
+        round, and the same delayed object in different positions will be only awaited once.
+
+    Examples:
+        >>> import asyncio
+        >>> from treevalue import TreeValue, delayed, materialize_async
+        >>> async def f(x):
+        ...     await asyncio.sleep(0.1)
+        ...     return x
+        >>> t = TreeValue({'a': delayed(f, 1), 'x': {'c': delayed(f, 3)}})
+        >>> asyncio.run(materialize_async(t))  # TreeValue({'a': 1, 'x': {'c': 3}}), in about 0.1s
+    """
+    cdef list storages = [tree._detach()]
+    cdef list delays
+    cdef dict proxies
+    cdef dict results
+    cdef list values
+
+    cdef TreeStorage st
+    cdef dict data
+    cdef str k
+    cdef object v, key
+    while storages:
+        delays = []
+        for st in storages:
+            _c_materialize_scan(st, delays)
+        storages = []
+
+        proxies = {}
+        for data, k, v in delays:
+            key = id(v)
+            if key not in proxies:
+                proxies[key] = async_undelay(v)
+
+        values = await asyncio.gather(*proxies.values())
+        results = dict(zip(proxies.keys(), values))
+        for data, k, v in delays:
+            v = results[id(v)]
+            data[k] = v
+            if isinstance(v, TreeStorage):
+                storages.append(v)
+
+    return tree
@@ -27,9 +27,11 @@ cdef class TreeValue:
     cdef readonly Constraint constraint
     cdef readonly type _type
     cdef readonly dict _child_constraints
+    cdef dict _child_wrappers
 
     cpdef TreeStorage _detach(self)
     cdef object _unraw(self, object obj, str key)
+    cdef void _drop_child(self, str key)
     cdef object _raw(self, object obj)
     cpdef _attr_extern(self, str key)
     cpdef _getitem_extern(self, object key)
@@ -41,6 +43,9 @@ cdef class TreeValue:
     cpdef public popitem(self)
     cpdef public void clear(self)
     cpdef public object setdefault(self, str key, object default= *)
+    cpdef public list get_many(self, object paths)
+    cpdef public void set_many(self, object values) except*
+    cpdef public void del_many(self, object paths) except*
 
     cpdef public treevalue_keys keys(self)
     cpdef public treevalue_values values(self)
@@ -54,7 +59,7 @@ cdef class TreeValue:
 
 cdef str _prefix_fix(object text, object prefix)
 cdef str _title_repr(TreeStorage st, object type_)
-cdef object _build_tree(TreeStorage st, object type_, str prefix, dict id_pool, tuple path)
+cdef object _build_tree(TreeStorage st, object type_)
 
 # noinspection PyPep8Naming
 cdef class treevalue_keys(_CObject):
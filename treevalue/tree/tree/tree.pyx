@@ -3,6 +3,7 @@
 
 import os
 import shutil
+from inspect import iscoroutinefunction
 from collections.abc import Sized, Container, Reversible, Mapping
 from operator import itemgetter
 
@@ -10,8 +11,11 @@ import cython
 from hbutils.design import SingletonMark
 
 from .constraint cimport Constraint, to_constraint, transact, _EMPTY_CONSTRAINT
-from ..common.delay cimport undelay, _c_delayed_partial, DelayedProxy
-from ..common.storage cimport TreeStorage, create_storage, _c_undelay_data
+from ..common.base cimport unraw
+from ..common.delay cimport undelay, _c_delayed_partial, DelayedProxy, DelayedAsyncProxy
+from ..common.delay import async_undelay
+from ..common.storage cimport TreeStorage, StorageWalker, _e_walk_event, WALK_ENTER, WALK_LEAF, WALK_EXIT, \
+    create_storage, _c_undelay_data
 from ...utils import format_tree
 
 cdef class _CObject:
@@ -55,34 +59,40 @@ cpdef inline register_dict_type(object type_, object f_items):
 
 _DEFAULT_STORAGE = create_storage({})
 
-cdef inline TreeStorage _generic_dict_unpack(object d):
-    cdef str k
-    cdef object v
-    cdef dict result = {}
-
-    cdef object d_items = None
+cdef inline object _generic_dict_items(object d):
     if isinstance(d, dict):
-        d_items = d.items()
+        return d.items()
     else:
         for d_type, df_items in _KNOWN_DICT_TYPES.items():
             if isinstance(d, d_type):
-                d_items = df_items(d)
-                break
-        if d_items is None:
-            raise TypeError(f'Unknown dict type - {d!r}.')
-
-    for k, v in d_items:
-        if isinstance(v, dict):
-            result[k] = _generic_dict_unpack(v)
-        if isinstance(v, TreeValue):
-            result[k] = v._detach()
-        else:
-            try:
-                result[k] = _generic_dict_unpack(v)
-            except TypeError:
-                result[k] = v
+                return df_items(d)
+        raise TypeError(f'Unknown dict type - {d!r}.')
+
+cdef inline TreeStorage _generic_dict_unpack(object d):
+    cdef dict _map = {}
+    cdef TreeStorage result = TreeStorage(_map)
+    # pairs of (items of source dict, target map), the child storages are placed before filled to keep the order
+    cdef list stack = [(_generic_dict_items(d), _map)]
 
-    return create_storage(result)
+    cdef str k
+    cdef object v, d_items, v_items
+    cdef dict dst, newmap
+    while stack:
+        d_items, dst = stack.pop()
+        for k, v in d_items:
+            if isinstance(v, TreeValue):
+                dst[k] = v._detach()
+            else:
+                try:
+                    v_items = _generic_dict_items(v)
+                except TypeError:
+                    dst[k] = unraw(v)
+                else:
+                    newmap = {}
+                    dst[k] = TreeStorage(newmap)
+                    stack.append((v_items, newmap))
+
+    return result
 
 cdef class _SimplifiedConstraintProxy:
     def __cinit__(self, Constraint cons):
@@ -126,6 +136,7 @@ cdef class TreeValue:
         self.constraint = _EMPTY_CONSTRAINT
         self._type = type(self)
         self._child_constraints = {}
+        self._child_wrappers = {}
 
     @cython.binding(True)
     def __init__(self, object data, object constraint=None):
@@ -194,16 +205,28 @@ cdef class TreeValue:
 
     cdef inline object _unraw(self, object obj, str key):
         cdef _SimplifiedConstraintProxy child_constraint
+        cdef object child
         if isinstance(obj, TreeStorage):
+            # the wrapper is reused only when it still holds the same storage
+            child = self._child_wrappers.get(key)
+            if child is not None and (<TreeValue>child)._st is obj:
+                return child
+
             if key in self._child_constraints:
                 child_constraint = self._child_constraints[key]
             else:
                 child_constraint = _SimplifiedConstraintProxy(transact(self.constraint, key))
                 self._child_constraints[key] = child_constraint
-            return self._type(obj, constraint=child_constraint)
+            child = self._type(obj, constraint=child_constraint)
+            self._child_wrappers[key] = child
+            return child
         else:
             return obj
 
+    cdef inline void _drop_child(self, str key):
+        if self._child_wrappers:
+            self._child_wrappers.pop(key, None)
+
     cdef inline object _raw(self, object obj):
         if isinstance(obj, TreeValue):
             return obj._detach()
@@ -277,7 +300,9 @@ cdef class TreeValue:
         else:
             value = self._st.pop_or_default(key, default)
 
-        return self._unraw(value, key)
+        value = self._unraw(value, key)
+        self._drop_child(key)
+        return value
 
     @cython.binding(True)
     cpdef popitem(self):
@@ -310,7 +335,9 @@ cdef class TreeValue:
         cdef object v
         try:
             k, v = self._st.popitem()
-            return k, self._unraw(v, k)
+            v = self._unraw(v, k)
+            self._drop_child(k)
+            return k, v
         except KeyError:
             raise KeyError(f'popitem(): {self._type.__name__} is empty.')
 
@@ -334,6 +361,7 @@ cdef class TreeValue:
             <TreeValue 0x7fd2553f0048>
         """
         self._st.clear()
+        self._child_wrappers.clear()
 
     @cython.binding(True)
     cpdef object setdefault(self, str key, object default=None):
@@ -390,6 +418,111 @@ cdef class TreeValue:
         """
         return self._unraw(self._st.setdefault(key, self._raw(default)), key)
 
+    @cython.binding(True)
+    cpdef list get_many(self, object paths):
+        r"""
+        Get values of multiple paths at once.
+
+        :param paths: Paths of the items, should be an iterable object of tuples of strings.
+        :return: List of the values, in the order of ``paths``.
+        :raise KeyError: When any of the paths is not exist, raise ``KeyError``.
+
+        .. note::
+            The nodes on the common prefixes of the adjacent paths are only located once, \
+            and no intermediate :class:`TreeValue` objects will be created, so it is much faster \
+            than getting the values with attributes one by one.
+
+        Examples:
+            >>> from treevalue import TreeValue
+            >>> t = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+            >>> t.get_many([('a',), ('x', 'c'), ('x', 'd')])
+            [1, 3, 4]
+        """
+        cdef tuple _t_paths = tuple(paths)
+        cdef list result = self._st.get_many(_t_paths)
+
+        cdef int i
+        cdef tuple path
+        cdef Constraint cons
+        cdef str key
+        for i, path in enumerate(_t_paths):
+            if isinstance(result[i], TreeStorage):
+                cons = self.constraint
+                for key in path:
+                    cons = transact(cons, key)
+                result[i] = self._type(result[i], constraint=_SimplifiedConstraintProxy(cons))
+
+        return result
+
+    @cython.binding(True)
+    cpdef void set_many(self, object values) except*:
+        r"""
+        Set values of multiple paths at once, the missing nodes on the paths will be created.
+
+        :param values: Mapping of the paths and values, the paths should be non-empty tuples of strings.
+        :raise TypeError: When there is a non-tree value on the paths, raise ``TypeError``.
+
+        Examples:
+            >>> from treevalue import TreeValue
+            >>> t = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+            >>> t.set_many({('a',): 11, ('x', 'c'): 33, ('y', 'e'): 5})
+            >>> t
+            <TreeValue 0x7f2a1c9e6e50>
+            ├── 'a' --> 11
+            ├── 'b' --> 2
+            ├── 'x' --> <TreeValue 0x7f2a1c9e6f10>
+            │   ├── 'c' --> 33
+            │   └── 'd' --> 4
+            └── 'y' --> <TreeValue 0x7f2a1c9e6fd0>
+                └── 'e' --> 5
+        """
+        cdef dict _d_values = None
+        cdef object path, value
+        if isinstance(values, dict):
+            _d_values = values
+            for value in _d_values.values():
+                if isinstance(value, TreeValue):
+                    _d_values = None
+                    break
+
+        if _d_values is None:
+            _d_values = {}
+            for path, value in values.items():
+                _d_values[path] = self._raw(value)
+
+        self._st.set_many(_d_values)
+        if self._child_wrappers:
+            for path in _d_values.keys():
+                if len(path) == 1:
+                    self._drop_child(path[0])
+
+    @cython.binding(True)
+    cpdef void del_many(self, object paths) except*:
+        r"""
+        Delete the items of multiple paths at once.
+
+        :param paths: Paths of the items, should be an iterable object of non-empty tuples of strings.
+        :raise KeyError: When any of the paths is not exist, raise ``KeyError``.
+
+        Examples:
+            >>> from treevalue import TreeValue
+            >>> t = TreeValue({'a': 1, 'b': 2, 'x': {'c': 3, 'd': 4}})
+            >>> t.del_many([('a',), ('x', 'c')])
+            >>> t
+            <TreeValue 0x7f2a1c9e6e50>
+            ├── 'b' --> 2
+            └── 'x' --> <TreeValue 0x7f2a1c9e6f10>
+                └── 'd' --> 4
+        """
+        cdef tuple _t_paths = tuple(paths)
+        self._st.del_many(_t_paths)
+
+        cdef tuple path
+        if self._child_wrappers:
+            for path in _t_paths:
+                if len(path) == 1:
+                    self._drop_child(path[0])
+
     cdef inline void _update(self, object d, dict kwargs) except*:
         cdef object dt
         if d is None:
@@ -407,8 +540,10 @@ cdef class TreeValue:
         cdef object value
         for key, value in dt.items():
             self._st.set(key, self._raw(value))
+            self._drop_child(key)
         for key, value in kwargs.items():
             self._st.set(key, self._raw(value))
+            self._drop_child(key)
 
     @cython.binding(True)
     def update(self, __update_dict=None, **kwargs):
@@ -548,6 +683,7 @@ cdef class TreeValue:
                 └── 'd' --> 4
         """
         self._st.set(key, self._raw(value))
+        self._drop_child(key)
 
     @cython.binding(True)
     def __delattr__(self, str item):
@@ -577,6 +713,7 @@ cdef class TreeValue:
             self._st.del_(item)
         except KeyError:
             raise AttributeError(f"Unable to delete attribute {item!r}.")
+        self._drop_child(item)
 
     @cython.binding(True)
     cpdef _getitem_extern(self, object key):
@@ -647,6 +784,7 @@ cdef class TreeValue:
         """
         if isinstance(key, str):
             self._st.set(key, self._raw(value))
+            self._drop_child(key)
         else:
             self._setitem_extern(_item_unwrap(key), value)
 
@@ -680,6 +818,7 @@ cdef class TreeValue:
         """
         if isinstance(key, str):
             self._st.del_(key)
+            self._drop_child(key)
         else:
             self._delitem_extern(_item_unwrap(key))
 
@@ -795,7 +934,7 @@ cdef class TreeValue:
                 └── 'd' --> 4
         """
         return format_tree(
-            _build_tree(self._detach(), self._type, '', {}, ()),
+            _build_tree(self._detach(), self._type),
             itemgetter(0), itemgetter(1),
         )
 
@@ -851,6 +990,7 @@ cdef class TreeValue:
             >>> pickle.loads(bin_)      #  TreeValue({'a': 1, 'b': 2, 'x': {'c': 3}})
         """
         self._st, self.constraint = state
+        self._child_wrappers = {}
 
     @cython.binding(True)
     def __getstate__(self):
@@ -1054,32 +1194,55 @@ cdef str _prefix_fix(object text, object prefix):
 cdef inline str _title_repr(TreeStorage st, object type_):
     return f'<{type_.__name__} {hex(id(st))}>'
 
-cdef object _build_tree(TreeStorage st, object type_, str prefix, dict id_pool, tuple path):
-    cdef object nid = id(st)
-    cdef str self_repr = _title_repr(st, type_)
-    cdef list children = []
+cdef inline tuple _link_path(object link):
+    # links are in form of (parent_link, key), so the paths are only built when needed
+    cdef list keys = []
+    while link is not None:
+        link, k = link
+        keys.append(k)
+    return tuple(reversed(keys))
 
-    cdef str k, _t_prefix
-    cdef object v, nv
-    cdef dict data
-    cdef tuple curpath
-    if nid in id_pool:
-        self_repr = os.linesep.join([
-            self_repr, f'(The same address as {".".join(("<root>", *id_pool[nid]))})'])
-    else:
-        id_pool[nid] = path
-        data = st.detach()
-        for k, v in sorted(data.items()):
-            v = _c_undelay_data(data, k, v)
-            curpath = path + (k,)
-            _t_prefix = f'{repr(k)} --> '
-            if isinstance(v, TreeStorage):
-                children.append(_build_tree(v, type_, _t_prefix, id_pool, curpath))
+cdef object _build_tree(TreeStorage st, object type_):
+    cdef list children = []
+    cdef dict id_pool = {id(st): None}
+
+    cdef list stack = []
+    cdef list links = [None]
+    cdef StorageWalker walker = StorageWalker(st, True, True, ())
+
+    cdef _e_walk_event event
+    cdef str _t_prefix, self_repr
+    cdef object nid, link
+    cdef list _l_children
+    while True:
+        event = walker.c_next()
+        if event == WALK_LEAF:
+            _t_prefix = f'{repr(walker.key)} --> '
+            children.append((_prefix_fix(repr(walker.value), _t_prefix), []))
+        elif event == WALK_ENTER:
+            _t_prefix = f'{repr(walker.key)} --> '
+            nid = id(walker.value)
+            self_repr = _title_repr(walker.value, type_)
+            if nid in id_pool:
+                self_repr = os.linesep.join([
+                    self_repr, f'(The same address as {".".join(("<root>", *_link_path(id_pool[nid])))})'])
+                children.append((_prefix_fix(self_repr, _t_prefix), []))
+                walker.c_skip()
             else:
-                children.append((_prefix_fix(repr(v), _t_prefix), []))
+                link = (links[-1], walker.key)
+                id_pool[nid] = link
+                _l_children = []
+                children.append((_prefix_fix(self_repr, _t_prefix), _l_children))
+                stack.append(children)
+                links.append(link)
+                children = _l_children
+        elif event == WALK_EXIT:
+            children = stack.pop()
+            links.pop()
+        else:
+            break
 
-    self_repr = _prefix_fix(self_repr, prefix)
-    return self_repr, children
+    return _prefix_fix(_title_repr(st, type_), ''), children
 
 # noinspection PyPep8Naming
 cdef class treevalue_keys(_CObject, Sized, Container, Reversible):
@@ -1226,12 +1389,30 @@ cdef class DetachedDelayedProxy(DelayedProxy):
         self.val = None
 
     cpdef object value(self):
-        if not self.calculated:
-            self.val = undelay(self.proxy, False)
-            self.calculated = True
+        while not self.calculated:
+            if self._c_enter():
+                try:
+                    self.val = undelay(self.proxy, False)
+                    self.calculated = True
+                    self.proxy = None
+                finally:
+                    self._c_exit()
 
         return self.val
 
+    async def avalue(self):
+        if not self.calculated:
+            await self._c_async_run(self._acalc)
+        return self.val
+
+    async def _acalc(self):
+        try:
+            self.val = await async_undelay(self.proxy, False)
+            self.calculated = True
+            self.proxy = None
+        finally:
+            self._future = None
+
     cpdef object fvalue(self):
         cdef object v = self.value()
         if isinstance(v, TreeValue):
@@ -1246,10 +1427,14 @@ def delayed(func, *args, **kwargs):
         The given ``func`` will not be called until its value is accessed, and \
         it will be only called once, after that the delayed node will be replaced by the actual value.
 
-    :param func: Delayed function.
+    :param func: Delayed function, coroutine function is supported.
     :param args: Positional arguments.
     :param kwargs: Key-word arguments.
 
+    .. note::
+        When ``func`` is a coroutine function, it will be awaited in the event loop by \
+        :func:`treevalue.tree.tree.materialize_async` or :func:`treevalue.tree.common.async_undelay`.
+
     Examples:
         >>> from treevalue import TreeValue, delayed
         >>> def f(x):
@@ -1279,4 +1464,7 @@ def delayed(func, *args, **kwargs):
         ├── 'a' --> 4
         └── 'x' --> 27
     """
-    return DetachedDelayedProxy(_c_delayed_partial(func, args, kwargs))
+    if iscoroutinefunction(func):
+        return DetachedDelayedProxy(DelayedAsyncProxy(func, args, kwargs))
+    else:
+        return DetachedDelayedProxy(_c_delayed_partial(func, args, kwargs))